@@ -1,69 +1,272 @@
+import os
+import threading
+import time
+import weakref
 import streamlit as st
 import cv2
 import face_recognition
-import pickle
-import numpy as np
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
 import json
 from pathlib import Path
 import pandas as pd
+from attendance_journal import AttendanceJournal
+from detectors import make_detector
+from embedding_cache import EmbeddingCache
+from embedding_store import EmbeddingStore
+from encoder_pool import EncoderPool
+from face_index import build_index
+from face_matcher import enrollment_templates
+from metrics import LATENCY_BUCKETS, NULL_METRICS, metrics_from_env
+from punch_cooldown import PunchCooldown
+from record_store import RecordStore
+from report_export import export_path, prune_exports, write_archive, write_csv
+from roi import DetectionRegion
+from sqlite_store import SQLiteBackend
+from verifier import ACCEPTED, REJECTED, make_verifier
+from work_hours import work_hours
+
+# Rows shown on View Reports; larger ranges are exported instead of rendered
+REPORT_ROWS = 500
+# Exports above this size are left on disk: the download button holds the whole file in memory
+DOWNLOAD_BYTES = 50 * 1024 * 1024
 
 # --- SYSTEM LOGIC ---
 class FaceAttendanceSystem:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", index="exact", templates="mean", backend="files", encoder_workers=0,
+                 detector="hog", metrics=None, embedding_cache=None, cooldown=60):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
-        self.encodings_file = self.data_dir / "face_encodings.pkl"
-        self.attendance_file = self.data_dir / "attendance.json"
+        self.templates = templates
+        self.backend = backend
+        self.encoder = EncoderPool(encoder_workers) if encoder_workers else None
+        self.detector = make_detector(detector)
+        self.metrics = metrics or NULL_METRICS
+        self.embedding_cache = EmbeddingCache() if embedding_cache is True else embedding_cache
+        # Shared by every session, so two browser tabs cannot log the same punch twice
+        self.cooldown = PunchCooldown(cooldown)
         self.users_file = self.data_dir / "users.json"
         
-        self.known_face_encodings = []
-        self.known_face_names = []
+        self.db = None
+        self.embeddings = None
+        self.journal = None
         self.users = {}
-        self.attendance_records = []
+        self.attendance_records = RecordStore()
+        self.index = index
+        # Serializes refreshes and this process's writes to the shared state
+        self._lock = threading.RLock()
         self._load_data()
-        
+        # Released by close(), or when the system is garbage collected after being replaced
+        self._release = weakref.finalize(self, release_resources, self.encoder, self.db, self.journal)
+        self.matcher = build_index(self.embeddings.matrix, self.embeddings.ids, kind=index)
+        # (generation, rows) of the embedding store the matcher holds
+        self._gallery = (self.embeddings.generation, len(self.embeddings))
+        self.cooldown.rebuild_from(self.query_attendance)
+
     def _load_data(self):
-        if self.encodings_file.exists():
-            with open(self.encodings_file, 'rb') as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data['encodings']
-                self.known_face_names = data['names']
-        if self.users_file.exists():
+        if self.backend == 'sqlite':
+            self.db = SQLiteBackend.open(self.data_dir)
+            self.embeddings = self.db.embeddings
+            self.journal = self.db.attendance
+            self.users = self.db.load_users()
+            self._db_version = self._database_version()
+            return
+        self.embeddings = EmbeddingStore.open(self.data_dir)
+        self._load_users()
+        self.journal = AttendanceJournal(self.data_dir)
+        self.attendance_records = RecordStore.from_records(self.journal.iter_new_records())
+
+    def _users_file_version(self):
+        stat = self.users_file.stat() if self.users_file.exists() else None
+        return (stat.st_size, stat.st_mtime_ns) if stat else None
+
+    def _load_users(self):
+        self._users_version = self._users_file_version()
+        if self._users_version:
             with open(self.users_file, 'r') as f:
                 self.users = json.load(f)
-        if self.attendance_file.exists():
-            with open(self.attendance_file, 'r') as f:
-                self.attendance_records = json.load(f)
-    
-    def save_user(self, name, user_id, encoding):
-        self.known_face_encodings.append(encoding)
-        self.known_face_names.append(user_id)
-        self.users[user_id] = {'name': name, 'user_id': user_id, 'registered_at': datetime.now().isoformat()}
-        
-        with open(self.encodings_file, 'wb') as f:
-            pickle.dump({'encodings': self.known_face_encodings, 'names': self.known_face_names}, f)
-        with open(self.users_file, 'w') as f:
-            json.dump(self.users, f, indent=2)
+
+    def _database_version(self):
+        return self.db.data_version()
+
+    def refresh(self):
+        """
+        Apply what other processes (CLI kiosk, server, enroll.py) wrote since
+        the last call: new gallery rows are added to the matcher and new
+        journal lines to the records, reading only what changed. The index is
+        rebuilt only when templates were deleted.
+        """
+        with self._lock:
+            if self.db:
+                version = self._database_version()
+                if version == self._db_version:
+                    return
+                self._db_version = version
+                self.users = self.db.load_users()
+                self._refresh_gallery()
+                self.cooldown.rebuild_from(self.query_attendance)
+                return
+            if self._users_file_version() != self._users_version:
+                self._load_users()
+            self._refresh_gallery()
+            self._refresh_attendance()
+
+    def _refresh_gallery(self):
+        generation, rows = self._gallery
+        self.embeddings.refresh()
+        if self.embeddings.generation != generation:
+            self.matcher = build_index(self.embeddings.matrix, self.embeddings.ids, kind=self.index)
+        elif len(self.embeddings) > rows:
+            self.matcher.add_many(self.embeddings.matrix[rows:], self.embeddings.ids[rows:])
+        self._gallery = (self.embeddings.generation, len(self.embeddings))
+
+    def _refresh_attendance(self):
+        records = list(self.journal.iter_new_records())
+        self.attendance_records.extend(records)
+        self.cooldown.update(records)
+
+    def close(self):
+        self._release()
+
+    def encode_faces(self, rgb_frame, face_locations):
+        if self.encoder:
+            return self.encoder.encode(rgb_frame, face_locations)
+        return face_recognition.face_encodings(rgb_frame, face_locations)
+
+    def save_user(self, name, user_id, samples):
+        templates = enrollment_templates(samples, self.templates)
+        with self._lock:
+            self.embeddings.append([user_id] * len(templates), templates)
+            # Adds our rows and any another process appended before them
+            self._refresh_gallery()
+            self.users[user_id] = {'name': name, 'user_id': user_id, 'registered_at': datetime.now().isoformat()}
+
+            if self.db:
+                self.db.save_users(self.users)
+                self._db_version = self._database_version()
+            else:
+                with open(self.users_file, 'w') as f:
+                    json.dump(self.users, f, indent=2)
+                self._users_version = self._users_file_version()
 
     def log_attendance(self, user_id, confidence, action):
         now = datetime.now()
+        if not self.cooldown.claim(user_id, action, now):
+            return None
         record = {
             'user_id': user_id,
             'name': self.users[user_id]['name'],
             'action': action,
+            'timestamp': now.isoformat(),
             'confidence': round(float(confidence), 2),
             'date': now.strftime('%Y-%m-%d'),
             'time': now.strftime('%H:%M:%S')
         }
-        self.attendance_records.append(record)
-        with open(self.attendance_file, 'w') as f:
-            json.dump(self.attendance_records, f, indent=2)
+        with self.metrics.stage('persist'), self._lock:
+            self.journal.append(record)
+            if not self.db:
+                # Reads back our line together with any other process's
+                self._refresh_attendance()
         return record
 
+    def query_attendance(self, **filters):
+        if self.db:
+            return self.journal.query(**filters)
+        return self.attendance_records.query(**filters)
+
+    def select_attendance(self, **filters):
+        if self.db:
+            return RecordStore.from_records(self.journal.iter_query(**filters))
+        return self.attendance_records.subset(**filters)
+
+class SharedCamera:
+    """One camera handle shared by every session; reads are serialized"""
+
+    def __init__(self, index=0):
+        self.index = index
+        self.capture = cv2.VideoCapture(index)
+        self._lock = threading.Lock()
+
+    def read(self):
+        with self._lock:
+            if not self.capture.isOpened():
+                self.capture.open(self.index)
+            return self.capture.read()
+
+    def release(self):
+        with self._lock:
+            self.capture.release()
+
+
+def release_resources(encoder, db, journal):
+    if encoder:
+        encoder.close()
+    if db:
+        db.close()
+    else:
+        journal.close()
+
+
+# --- SHARED RESOURCES ---
+# Held across reruns and sessions; only rebuilt on explicit invalidation
+class SystemHolder:
+    """
+    The FaceAttendanceSystem all sessions share
+    A stale system is replaced, not closed: other sessions may be in the
+    middle of a rerun with it, and it releases its resources once the last
+    of them drops it.
+    """
+
+    def __init__(self):
+        self.system = None
+        self.options = None
+        self.lock = threading.Lock()
+
+
+@st.cache_resource
+def system_holder():
+    return SystemHolder()
+
+
+def load_system(backend, encoder_workers, detector, cache_encodings, cooldown):
+    return FaceAttendanceSystem(backend=backend, encoder_workers=encoder_workers, detector=detector,
+                                metrics=metrics_from_env(), embedding_cache=True if cache_encodings else None,
+                                cooldown=cooldown)
+
+
+@st.cache_resource
+def open_camera(index=0):
+    return SharedCamera(index)
+
+
+def get_system(reload=False):
+    options = (os.environ.get("ATTENDANCE_BACKEND", "files"), int(os.environ.get("ENCODER_WORKERS", "0")),
+               os.environ.get("FACE_DETECTOR", "hog"), os.environ.get("ENCODING_CACHE", "0") == "1",
+               float(os.environ.get("PUNCH_COOLDOWN", "60")))
+    holder = system_holder()
+    with holder.lock:
+        system = holder.system
+        # Users or attendance changed by another process (CLI kiosk, server, enroll.py)
+        if system is None or reload or options != holder.options:
+            system = holder.system = load_system(*options)
+            holder.options = options
+        else:
+            system.refresh()
+    return system
+
+
+def release_camera():
+    open_camera().release()
+    open_camera.clear()
+
+
 # --- STREAMLIT UI ---
 st.set_page_config(page_title="AI Face Attendance", layout="wide")
-system = FaceAttendanceSystem()
+if st.sidebar.button("Reload data"):
+    get_system(reload=True)
+if st.sidebar.button("Release camera"):
+    release_camera()
+system = get_system()
 
 st.title("AI Face Attendance System")
 st.markdown("---")
@@ -81,7 +284,8 @@ if choice == "User Registration":
         register_btn = st.button("Start Camera & Register")
 
     if register_btn and u_name and u_id:
-        cap = cv2.VideoCapture(0)
+        # Stays open between scans; 'Release camera' frees it for other programs
+        cap = open_camera()
         samples = []
         progress_bar = st.progress(0)
         status_text = st.empty()
@@ -91,84 +295,145 @@ if choice == "User Registration":
             if not ret: break
             
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locs = face_recognition.face_locations(rgb_frame)
+            face_locs = system.detector(rgb_frame)
             
             if len(face_locs) == 1:
-                enc = face_recognition.face_encodings(rgb_frame, face_locs)[0]
+                enc = system.encode_faces(rgb_frame, face_locs)[0]
                 samples.append(enc)
                 progress_bar.progress(len(samples) * 20)
                 status_text.text(f"Captured {len(samples)}/5 samples...")
         
-        cap.release()
         if len(samples) == 5:
-            system.save_user(u_name, u_id, np.mean(samples, axis=0))
+            system.save_user(u_name, u_id, samples)
             st.success(f"User {u_name} registered successfully!")
 
 elif choice == "Log Attendance":
     st.subheader("Punch In/Out System")
     action = st.radio("Select Action", ["Punch In", "Punch Out"], horizontal=True)
+    method = st.radio("Verification", ["Consecutive frames", "Sequential test (SPRT)"], horizontal=True)
+    follow_face = st.checkbox("Follow face (detect only around the last face, adaptive scale)")
     run_scanner = st.checkbox("Turn On Scanner")
     
     FRAME_WINDOW = st.image([]) # Placeholder for video
     
     if run_scanner:
-        cap = cv2.VideoCapture(0)
-        consecutive_count = 0
-        last_user = None
+        # Stays open between scans; 'Release camera' frees it for other programs
+        cap = open_camera()
+        # Without following, the region stays at the full frame and 1/4 scale
+        region = DetectionRegion() if follow_face else DetectionRegion(full_scan_every=1)
+        verifier = make_verifier('sprt' if method.startswith("Sequential") else 'consecutive', required_frames=3)
+        metrics = system.metrics
+        started = time.monotonic()
+        # Cached encodings are only reused within this scan, never another session's
+        cache_source = object()
         
         while True:
-            ret, frame = cap.read()
+            with metrics.stage('capture'):
+                ret, frame = cap.read()
             if not ret: break
+            metrics.inc('frames')
             
             # Optimization
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            with metrics.stage('preprocess'):
+                rgb_small, to_frame = region.crop(frame)
             
-            face_locs = face_recognition.face_locations(rgb_small)
-            face_encs = face_recognition.face_encodings(rgb_small, face_locs)
+            with metrics.stage('detect'):
+                face_locs = system.detector(rgb_small)
+            with metrics.stage('encode'):
+                if system.embedding_cache is not None:
+                    face_encs = system.embedding_cache.encode(rgb_small, face_locs, system.encode_faces,
+                                                              source=cache_source)
+                else:
+                    face_encs = system.encode_faces(rgb_small, face_locs)
+            face_locs = [to_frame(loc) for loc in face_locs]
+            region.update(face_locs)
+            metrics.observe('faces_per_frame', len(face_locs))
             
-            current_user = None
-            conf = 0
+            with metrics.stage('match'):
+                matches = system.matcher.best_match(face_encs, tolerance=0.5)
             
-            for (top, right, bottom, left), enc in zip(face_locs, face_encs):
-                matches = face_recognition.compare_faces(system.known_face_encodings, enc, tolerance=0.5)
-                dist = face_recognition.face_distance(system.known_face_encodings, enc)
-                
-                if True in matches:
-                    idx = np.argmin(dist)
-                    current_user = system.known_face_names[idx]
-                    conf = 1 - dist[idx]
-                    
-                    # Draw UI on frame
-                    top*=4; right*=4; bottom*=4; left*=4
-                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                    cv2.putText(frame, system.users[current_user]['name'], (left, top-10), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
             # Verification Logic
-            if current_user and current_user == last_user:
-                consecutive_count += 1
-            else:
-                consecutive_count = 0
-                last_user = current_user
-            
-            # Display frame in Streamlit
-            FRAME_WINDOW.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            status, current_user, conf = verifier.update([(loc, user_id, dist) for loc, (user_id, dist) in zip(face_locs, matches)])
+
+            # One draw sample per frame: labels plus the Streamlit display
+            with metrics.stage('draw'):
+                for (top, right, bottom, left), (user_id, dist) in zip(face_locs, matches):
+                    if user_id is not None:
+                        # Draw UI on frame
+                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                        cv2.putText(frame, system.users[user_id]['name'], (left, top-10), 
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                FRAME_WINDOW.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
             
-            if consecutive_count >= 3:
+            if status == ACCEPTED:
+                metrics.observe('time_to_punch_seconds', time.monotonic() - started, LATENCY_BUCKETS)
                 rec = system.log_attendance(current_user, conf, action.lower().replace(" ", "_"))
+                if rec is None:
+                    st.warning(f"{system.users[current_user]['name']} already did {action.lower()} "
+                               f"in the last {system.cooldown.window:g}s")
+                    break
                 st.balloons()
-                st.success(f"Verified: {rec['name']} logged at {rec['time']}")
+                st.success(f"Verified: {rec['name']} logged at {rec['time']} ({verifier.frames} frames)")
+                if system.embedding_cache is not None:
+                    st.caption(f"Encoding cache hit rate: {system.embedding_cache.hit_rate:.0%}")
+                break
+            if status == REJECTED:
+                st.error(f"Face not recognized after {verifier.frames} frames")
                 break
                 
-        cap.release()
 
 elif choice == "View Reports":
     st.subheader("Attendance Records")
-    if system.attendance_records:
-        df = pd.DataFrame(system.attendance_records)
-        # Reverse to show newest at top
-        st.dataframe(df.iloc[::-1], use_container_width=True)
-        st.download_button("Download CSV", df.to_csv(index=False), "attendance.csv", "text/csv")
+    today = datetime.now().date()
+    date_range = st.date_input("Date Range", (today - timedelta(days=30), today))
+    # A range picker returns one date while the second end is still being chosen
+    dates = date_range if isinstance(date_range, tuple) else (date_range,)
+    start, end = (dates[0], dates[-1]) if dates else (today, today)
+    user_filter = st.selectbox("User", ["All"] + sorted(system.users))
+    filters = {'start_date': start.strftime('%Y-%m-%d'), 'end_date': end.strftime('%Y-%m-%d'),
+               'user_id': None if user_filter == "All" else user_filter}
+    # Streamed from the store; only the newest rows are kept for display
+    newest, total = deque(maxlen=REPORT_ROWS), 0
+    for record in system.journal.iter_query(**filters):
+        newest.append(record)
+        total += 1
+    if total:
+        st.dataframe(pd.DataFrame(list(newest)[::-1]), use_container_width=True)
+        if total > REPORT_ROWS:
+            st.caption(f"Showing the newest {REPORT_ROWS} of {total} records; export for the rest.")
+        fmt = st.radio("Export format", ["CSV", "Columnar archive (.npz)"], horizontal=True)
+        if st.button("Prepare export"):
+            export_dir = system.data_dir / "exports"
+            export_dir.mkdir(exist_ok=True)
+            prune_exports(export_dir)
+            if fmt == "CSV":
+                path, mime = export_path(export_dir, "csv", **filters), "text/csv"
+                write_csv(system.journal.iter_query(**filters), path)
+            else:
+                path, mime = export_path(export_dir, "npz", **filters), "application/octet-stream"
+                write_archive(system.journal.iter_query(**filters), path)
+            st.caption(f"Written to {path}")
+            if path.stat().st_size <= DOWNLOAD_BYTES:
+                with open(path, 'rb') as f:
+                    st.download_button("Download", f, path.name, mime)
+            else:
+                st.info("Too large to download in the browser; copy the file from the path above.")
+    else:
+        st.info("No records found yet.")
+
+    st.subheader("Work Hours")
+    split = st.checkbox("Split overnight shifts at midnight")
+    sessions = work_hours(system.select_attendance, start.isoformat(), end.isoformat(), split_midnight=split)
+    totals = sessions.totals(start.isoformat(), end.isoformat())
+    if totals:
+        hours = pd.DataFrame([{'user_id': user_id, 'name': system.users.get(user_id, {}).get('name', user_id), **t}
+                              for user_id, t in sorted(totals.items())])
+        st.dataframe(hours, use_container_width=True)
+        daily = pd.DataFrame(sessions.daily(start.isoformat(), end.isoformat()))
+        st.download_button("Download daily hours", daily.to_csv(index=False), "work_hours.csv", "text/csv")
     else:
-        st.info("No records found yet.")
\ No newline at end of file
+        st.info("No complete punch_in / punch_out pairs in this range.")
+    exceptions = sessions.exceptions(start.isoformat(), end.isoformat())
+    if exceptions:
+        st.caption(f"{len(exceptions)} unpaired punch(es)")
+        st.dataframe(pd.DataFrame(exceptions), use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+Append-Only Attendance Journal
+Punches are appended as JSON Lines to one segment per day:
+
+    data/attendance/2024-01-15.jsonl
+
+Each punch costs one small write regardless of history size. fsync is
+batched (every N records or T seconds; a timer syncs a quiet journal T
+seconds after its first unsynced record), and readers stream segments
+lazily instead of loading one big JSON document.
+"""
+
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+
+def _close_segment(handles):
+    """Sync and close the open segment of a journal that was never closed (exit or garbage collection)"""
+    segment = handles.pop('segment', None)
+    if segment is not None and not segment.closed:
+        segment.flush()
+        os.fsync(segment.fileno())
+        segment.close()
+
+
+class AttendanceJournal:
+    """Date-segmented JSON Lines journal for attendance records"""
+
+    def __init__(self, data_dir, fsync_every=32, fsync_interval=1.0):
+        self.data_dir = Path(data_dir)
+        self.journal_dir = self.data_dir / "attendance"
+        self.legacy_file = self.data_dir / "attendance.json"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._segment_date = None
+        self._segment = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._timer = None
+        self._lock = threading.RLock()
+        # segment file name -> bytes already returned by iter_new_records
+        self._read_offsets = {}
+        # The open segment, shared with the finalizer; a weak reference so
+        # dropped journals do not pile up until exit
+        self._handles = {}
+        weakref.finalize(self, _close_segment, self._handles)
+
+        self._migrate_legacy()
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+
+    def _migrate_legacy(self):
+        """Split a legacy attendance.json into day segments (once)"""
+        if self.journal_dir.exists() or not self.legacy_file.exists():
+            return
+        with open(self.legacy_file, 'r') as f:
+            records = json.load(f)
+
+        staging = self.data_dir / "attendance.migrating"
+        staging.mkdir(exist_ok=True)
+        for path in staging.glob("*.jsonl"):
+            path.unlink()
+        handles = {}
+        try:
+            for record in records:
+                date = record['date']
+                if date not in handles:
+                    handles[date] = open(staging / f"{date}.jsonl", 'a')
+                handles[date].write(json.dumps(record) + "\n")
+        finally:
+            for handle in handles.values():
+                handle.flush(); os.fsync(handle.fileno()); handle.close()
+
+        os.replace(staging, self.journal_dir)
+        # Keep the original file around instead of deleting user data
+        os.replace(self.legacy_file, self.legacy_file.with_suffix('.json.migrated'))
+
+    def segment_path(self, date):
+        return self.journal_dir / f"{date}.jsonl"
+
+    def segments(self, start_date=None, end_date=None):
+        """Segment files in date order, optionally limited to [start_date, end_date]"""
+        paths = sorted(self.journal_dir.glob("*.jsonl"))
+        return [p for p in paths
+                if (start_date is None or p.stem >= start_date)
+                and (end_date is None or p.stem <= end_date)]
+
+    # --- writing ---
+
+    def append(self, record):
+        """Append one record to its day's segment; it reaches disk within fsync_interval seconds"""
+        date = record['date']
+        with self._lock:
+            if date != self._segment_date:
+                self._rotate(date)
+            self._segment.write(json.dumps(record) + "\n")
+            self._segment.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            elif self._timer is None:
+                # No further append may come to trigger the sync
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _rotate(self, date):
+        self.close()
+        path = self.segment_path(date)
+        if path.exists():
+            self._drop_torn_tail(path)
+        self._segment = self._handles['segment'] = open(path, 'a')
+        self._segment_date = date
+
+    @staticmethod
+    def _drop_torn_tail(path):
+        """Truncate a partial last line so new appends start on a clean line"""
+        with open(path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                step = min(4096, end)
+                f.seek(end - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    end = end - step + newline + 1
+                    break
+                end -= step
+            if end != size:
+                f.truncate(end)
+
+    def sync(self):
+        """Force buffered records to disk"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._segment is not None and self._unsynced:
+                os.fsync(self._segment.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self.sync()
+                self._segment.close()
+            self._handles.clear()
+            self._segment = None
+            self._segment_date = None
+
+    # --- reading ---
+
+    def iter_records(self, start_date=None, end_date=None):
+        """Stream records segment by segment; a torn last line from a crash is skipped"""
+        for path in self.segments(start_date, end_date):
+            with open(path, 'r') as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    yield json.loads(line)
+
+    def load_records(self, start_date=None, end_date=None):
+        return list(self.iter_records(start_date, end_date))
+
+    def iter_new_records(self):
+        """
+        Records appended to any segment since the previous call, by this or
+        another process; the first call returns the whole history. Only the
+        new bytes of each segment are read.
+        """
+        for entry in sorted(os.scandir(self.journal_dir), key=lambda entry: entry.name):
+            if not entry.name.endswith(".jsonl"):
+                continue
+            offset = self._read_offsets.get(entry.name, 0)
+            size = entry.stat().st_size
+            if size <= offset:
+                continue
+            with open(entry.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            # A line still being written is left for the next call
+            end = data.rfind(b"\n") + 1
+            self._read_offsets[entry.name] = offset + end
+            for line in data[:end].splitlines():
+                yield json.loads(line)
+
+    def query(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """Records matching the filters; date filters only open the matching segments"""
+        if date is not None:
+            start_date = end_date = date
+        return filter_records(self.iter_records(start_date, end_date),
+                              user_id=user_id, action=action, since=since)
+
+    def iter_query(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """query() as a generator, reading one segment at a time"""
+        if date is not None:
+            start_date = end_date = date
+        return iter_filter_records(self.iter_records(start_date, end_date),
+                                   user_id=user_id, action=action, since=since)
+
+
+def filter_records(records, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+    """Filter attendance records by day, date range, user, action and minimum timestamp"""
+    return list(iter_filter_records(records, date, start_date, end_date, user_id, action, since))
+
+
+def iter_filter_records(records, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+    """filter_records() as a generator"""
+    if date is not None:
+        start_date = end_date = date
+    return (r for r in records
+            if (start_date is None or r['date'] >= start_date)
+            and (end_date is None or r['date'] <= end_date)
+            and (user_id is None or r['user_id'] == user_id)
+            and (action is None or r['action'] == action)
+            and (since is None or r.get('timestamp', '') >= since))
@@ -1,53 +1,179 @@
 import cv2
 import face_recognition
-import pickle
 import numpy as np
 from datetime import datetime
 import json
+import os
+import time
 from pathlib import Path
+from attendance_journal import AttendanceJournal
+from detectors import make_detector
+from embedding_cache import EmbeddingCache
+from embedding_store import EmbeddingStore
+from enroll import encode_image
+from encoder_pool import EncoderPool
+from face_index import build_index
+from face_matcher import enrollment_templates
+from metrics import LATENCY_BUCKETS, NULL_METRICS, metrics_from_env
+from pipeline import FramePipeline
+from punch_cooldown import PunchCooldown
+from recognition_service import RecognitionClient
+from record_store import RecordStore
+from roi import DetectionRegion
+from sqlite_store import SQLiteBackend
+from tracker import FaceTracker
+from verifier import ACCEPTED, PENDING, DecisionStats, make_verifier
 
 class FaceAttendanceSystem:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", index="exact", templates="mean", backend="files", encoder_workers=0,
+                 detector="hog", metrics=None, embedding_cache=None, cooldown=60):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        # 'mean', 'all' or an int k: how registration samples are stored per user
+        self.templates = templates
+        self.index = index
+        # 'files' (embedding store + JSON) or 'sqlite' (data/attendance.db)
+        self.backend = backend
+        # >0: dlib encoding runs in that many worker processes
+        self.encoder = EncoderPool(encoder_workers) if encoder_workers else None
+        # 'hog', 'haar', 'yunet', 'ssd' or a callable(rgb) -> boxes; encoding is always dlib
+        self.detector = make_detector(detector)
+        # Frames each scan needed before it was accepted or rejected
+        self.decision_stats = DecisionStats()
+        # Per-stage timings; NULL_METRICS records nothing
+        self.metrics = metrics or NULL_METRICS
+        # True or an EmbeddingCache: reuse encodings of near-identical face crops while scanning
+        self.embedding_cache = EmbeddingCache() if embedding_cache is True else embedding_cache
+        # Same person and action within `cooldown` seconds is not logged again
+        self.cooldown = PunchCooldown(cooldown)
         
-        self.encodings_file = self.data_dir / "face_encodings.pkl"
-        self.attendance_file = self.data_dir / "attendance.json"
         self.users_file = self.data_dir / "users.json"
         
-        self.known_face_encodings = []
-        self.known_face_names = []
+        self.db = None
+        self.embeddings = None
+        self.journal = None
         self.users = {}
-        self.attendance_records = []
+        # Columnar, list-like; indexed queries return record dicts
+        self.attendance_records = RecordStore()
         
         self._load_data()
+        self.matcher = build_index(self.embeddings.matrix, self.embeddings.ids, kind=index)
+        # (generation, rows) of the embedding store the matcher holds
+        self._gallery = (self.embeddings.generation, len(self.embeddings))
+        self.cooldown.rebuild_from(self.query_attendance)
         
     def _load_data(self):
-        if self.encodings_file.exists():
-            with open(self.encodings_file, 'rb') as f:
-                data = pickle.load(f)
-                self.known_face_encodings = data['encodings']
-                self.known_face_names = data['names']
+        if self.backend == 'sqlite':
+            # Reports query the indexed table, so history is not loaded into memory
+            self.db = SQLiteBackend.open(self.data_dir)
+            self.embeddings = self.db.embeddings
+            self.journal = self.db.attendance
+            self.users = self.db.load_users()
+            return
+        # Memory-mapped; imports face_encodings.pkl on first run
+        self.embeddings = EmbeddingStore.open(self.data_dir)
         if self.users_file.exists():
             with open(self.users_file, 'r') as f:
                 self.users = json.load(f)
-        if self.attendance_file.exists():
-            with open(self.attendance_file, 'r') as f:
-                self.attendance_records = json.load(f)
-    
-    def _save_encodings(self):
-        with open(self.encodings_file, 'wb') as f:
-            pickle.dump({'encodings': self.known_face_encodings, 'names': self.known_face_names}, f)
+        # Day-segmented JSON Lines; migrates attendance.json on first run
+        self.journal = AttendanceJournal(self.data_dir)
+        self.attendance_records = RecordStore.from_records(self.journal.iter_records())
     
+    def close(self):
+        self.journal.close()
+        if self.encoder: self.encoder.close()
+
+    def _encode_faces(self, rgb_frame, face_locations):
+        if self.encoder:
+            return self.encoder.encode(rgb_frame, face_locations)
+        return face_recognition.face_encodings(rgb_frame, face_locations)
+
     def _save_users(self):
+        if self.db:
+            self.db.save_users(self.users)
+            return
         with open(self.users_file, 'w') as f:
             json.dump(self.users, f, indent=2)
     
-    def _save_attendance(self):
-        with open(self.attendance_file, 'w') as f:
-            json.dump(self.attendance_records, f, indent=2)
+    def _save_attendance(self, record):
+        with self.metrics.stage('persist'):
+            if not self.db:
+                self.attendance_records.append(record)
+            self.journal.append(record)
+
+    def query_attendance(self, **filters):
+        """Attendance records filtered by date, start_date, end_date, user_id, action or since"""
+        if self.db:
+            return self.journal.query(**filters)
+        return self.attendance_records.query(**filters)
+
+    def select_attendance(self, **filters):
+        """query_attendance() as a RecordStore, for vectorized reports"""
+        if self.db:
+            return RecordStore.from_records(self.journal.iter_query(**filters))
+        return self.attendance_records.subset(**filters)
+
+    def enroll(self, entries, replace=False):
+        """
+        Add users from (user_id, name, samples) entries, writing the gallery once
+        With replace=True, templates of users already registered are swapped
+        for the new ones in the same write. Returns the number of users enrolled.
+        """
+        ids, rows, users = [], [], {}
+        now = datetime.now().isoformat()
+        for user_id, name, samples in entries:
+            if len(samples) == 0: continue
+            templates = enrollment_templates(samples, self.templates)
+            ids += [user_id] * len(templates)
+            rows.append(templates)
+            users[user_id] = {'name': name, 'user_id': user_id, 'registered_at': now}
+        if not users: return 0
+
+        matrix = np.concatenate(rows)
+        replaced = [user_id for user_id in users if user_id in self.users] if replace else []
+        self._sync_matcher()
+        if self.db:
+            self.db.enroll(users, ids, matrix, replace=replaced)
+            self.users.update(users)
+        else:
+            if replaced: self.embeddings.replace(replaced, ids, matrix)
+            else: self.embeddings.append(ids, matrix)
+            self.users.update(users)
+            self._save_users()
+        self._sync_matcher(removed=replaced)
+        return len(users)
+
+    def _sync_matcher(self, removed=()):
+        """
+        Apply embedding store changes to the matcher instead of rebuilding it:
+        templates of `removed` users (just deleted by this process) are dropped
+        in place and rows past those already indexed are added. The index is
+        rebuilt only when another process compacted the store.
+        """
+        generation, rows = self._gallery
+        self.embeddings.refresh()
+        if removed:
+            # Our own compaction: the surviving rows keep their order, new rows follow
+            rows -= self.matcher.remove(removed)
+            generation = self.embeddings.generation
+        if self.embeddings.generation != generation or rows > len(self.embeddings):
+            self.matcher = build_index(self.embeddings.matrix, self.embeddings.ids, kind=self.index)
+        elif len(self.embeddings) > rows:
+            self.matcher.add_many(self.embeddings.matrix[rows:], self.embeddings.ids[rows:])
+        self._gallery = (self.embeddings.generation, len(self.embeddings))
+
+    def register_user(self, name, user_id, image_paths=None):
+        """Enroll from 5 webcam samples, or from photos when image_paths is given"""
+        if image_paths is not None:
+            samples = []
+            for path in image_paths:
+                encoding, reason = encode_image(path, self.detector, self._encode_faces)
+                if encoding is None: print(f"  Skipped {path}: {reason}")
+                else: samples.append(encoding)
+            if not self.enroll([(user_id, name, samples)]): return False
+            print(f"✓ Registered {name} from {len(samples)} photo(s)")
+            return True
 
-    def register_user(self, name, user_id):
         video_capture = cv2.VideoCapture(0)
         # SPEED FIX: Lower Capture Resolution
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -65,10 +191,10 @@ class FaceAttendanceSystem:
             cv2.imshow('Registration', frame)
 
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
+            face_locations = self.detector(rgb_frame)
             
             if len(face_locations) == 1:
-                encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
+                encoding = self._encode_faces(rgb_frame, face_locations)[0]
                 samples.append(encoding)
             
             if cv2.waitKey(1) & 0xFF == ord('q'): break
@@ -77,121 +203,263 @@ class FaceAttendanceSystem:
         cv2.destroyAllWindows()
 
         if len(samples) >= 5:
-            self.known_face_encodings.append(np.mean(samples, axis=0))
-            self.known_face_names.append(user_id)
+            templates = enrollment_templates(samples, self.templates)
+            self._sync_matcher()
+            self.embeddings.append([user_id] * len(templates), templates)
+            self._sync_matcher()
             self.users[user_id] = {'name': name, 'user_id': user_id, 'registered_at': datetime.now().isoformat()}
-            self._save_encodings(); self._save_users()
+            self._save_users()
             print(f"✓ Registered {name}")
             return True
         return False
 
-    def identify_face_realtime(self, tolerance=0.5, required_frames=3):
+    def delete_user(self, user_id):
+        if user_id not in self.users: return False
+        del self.users[user_id]
+        self._sync_matcher()
+        if self.db:
+            self.db.delete_user(user_id)
+        else:
+            self.embeddings.delete([user_id])
+            self._save_users()
+        self._sync_matcher(removed=[user_id])
+        print(f"✓ Deleted {user_id}")
+        return True
+
+    def _detect(self, rgb_frame):
+        with self.metrics.stage('detect'):
+            return self.detector(rgb_frame)
+
+    def _identify_faces(self, rgb_frame, face_locations, tolerance=0.5, source=None):
+        with self.metrics.stage('encode'):
+            if self.embedding_cache is not None:
+                face_encodings = self.embedding_cache.encode(rgb_frame, face_locations, self._encode_faces,
+                                                             source=source)
+            else:
+                face_encodings = self._encode_faces(rgb_frame, face_locations)
+        # All faces in the frame are scored against the gallery in one pass
+        with self.metrics.stage('match'):
+            return self.matcher.best_match(face_encodings, tolerance=tolerance)
+
+    def _recognize_frame(self, frame, tolerance=0.5, tracker=None, region=None, source=None):
+        """
+        Detect, encode and match every face in a BGR frame; boxes are in frame coordinates
+        `source` names the camera, so cached encodings are only reused for it
+        """
+        if region:
+            # Search window and scale follow the last face seen
+            with self.metrics.stage('preprocess'):
+                rgb, to_frame = region.crop(frame)
+            face_locations = self._detect(rgb)
+            matches = self._identify_faces(rgb, face_locations, tolerance, source)
+            faces = [(to_frame(location), user_id, distance)
+                     for location, (user_id, distance) in zip(face_locations, matches)]
+            region.update([box for box, _, _ in faces])
+            return faces
+
+        # Resize to 1/4 for processing speed
+        with self.metrics.stage('preprocess'):
+            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+        if tracker:
+            # Detection and encoding only where the tracker asks for them
+            tracks = tracker.step(rgb_small_frame, self._detect,
+                                  lambda rgb, locations: self._identify_faces(rgb, locations, tolerance, source))
+            return [((t.box[0] * 4, t.box[1] * 4, t.box[2] * 4, t.box[3] * 4), t.user_id, t.distance)
+                    for t in tracks]
+
+        face_locations = self._detect(rgb_small_frame)
+        matches = self._identify_faces(rgb_small_frame, face_locations, tolerance, source)
+        return [((top * 4, right * 4, bottom * 4, left * 4), user_id, distance)
+                for (top, right, bottom, left), (user_id, distance) in zip(face_locations, matches)]
+
+    def _draw_faces(self, frame, faces):
+        for (top, right, bottom, left), user_id, _ in faces:
+            if user_id is not None:
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                # A recognition service may know users enrolled after this process loaded
+                cv2.putText(frame, self.users.get(user_id, {}).get('name', user_id), (left, top - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    def identify_face_realtime(self, tolerance=0.5, required_frames=3, threaded=False, workers=2, track=False,
+                               verifier='consecutive', roi=False, service=None):
         """
         ULTRA-FAST VERSION:
         - Forced 640x480 resolution
         - Frame skipping (process every 2nd frame)
         - Reduced required_frames to 3
+        - threaded=True: capture, recognition workers and display run as
+          separate pipeline stages, so the preview keeps camera FPS
+        - track=True: instead of skipping every other frame, a face tracker
+          re-detects every few frames and re-encodes only unconfirmed or
+          moved faces; the verifier advances on fresh encodings only, so
+          faces keep being encoded until it has decided.
+          Pass a FaceTracker instance to tune it (e.g. optical_flow=True)
+        - verifier='sprt': confirm as soon as the match distances give enough
+          evidence instead of a fixed run of frames, and give up early on
+          faces that are not enrolled. A verifier instance can be passed too
+        - roi=True: detect only around the last face (plus margin) at a scale
+          picked from its size; pass a DetectionRegion to restrict the
+          search to a kiosk zone
+        - service: URL of a running recognition_service (or a
+          RecognitionClient); frames are sent there instead of being
+          detected and encoded in this process
         """
+        if service and (track or roi):
+            raise ValueError("service= sends whole frames; use it without track or roi")
+        if track and threaded:
+            raise ValueError("track=True runs in the serial scanner loop")
+        if track and roi:
+            raise ValueError("track=True keeps its own detection geometry; use roi without it")
+        region = roi if isinstance(roi, DetectionRegion) else (DetectionRegion() if roi else None)
+        if service:
+            client = service if isinstance(service, RecognitionClient) else RecognitionClient(service)
+            recognize = lambda f: client.recognize_frame(f, tolerance)
+        else:
+            recognize = lambda f: self._recognize_frame(f, tolerance, region=region)
+
         video_capture = cv2.VideoCapture(0)
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
-        consecutive_count = 0
-        last_user_id = None
-        final_confidence = 0
+        if isinstance(verifier, str): verifier = make_verifier(verifier, required_frames)
+        verifier.reset()
+        status, user_id, final_confidence = PENDING, None, 0
         process_this_frame = True # For frame skipping
+        faces = []
+        metrics = self.metrics
+        started = time.monotonic()
+        # Tracks stop re-encoding once confirmed; keep them unconfirmed for as many frames as the verifier may need
+        frames_to_decide = getattr(verifier, 'max_frames', required_frames) + 1
+        if isinstance(track, FaceTracker):
+            tracker = track
+            tracker.confirm_hits = max(tracker.confirm_hits, frames_to_decide)
+        else: tracker = FaceTracker(confirm_hits=frames_to_decide) if track else None
+
+        pipeline = None
+        if threaded:
+            pipeline = FramePipeline(video_capture, recognize, workers=workers)
+            pipeline.start()
 
         print("System Active: Scanning...")
 
         while True:
-            ret, frame = video_capture.read()
-            if not ret: break
+            if pipeline:
+                item = pipeline.next_frame()
+                if item is None:
+                    if pipeline.running: continue
+                    break
+                # Workers may still be reading the captured frame; draw on a copy
+                frame = item[2].copy()
+                result = pipeline.poll_result()
+                new_result = result is not None
+                if new_result: faces = result[1]
+            else:
+                with metrics.stage('capture'):
+                    ret, frame = video_capture.read()
+                if not ret: break
 
-            # SPEED FIX: Only process every other frame
-            if process_this_frame:
-                # Resize to 1/4 for processing speed
-                small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-                face_locations = face_recognition.face_locations(rgb_small_frame)
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-
-                current_frame_user = None
-
-                for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                    matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding, tolerance=tolerance)
-                    face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                    
-                    if True in matches:
-                        best_match_index = np.argmin(face_distances)
-                        current_frame_user = self.known_face_names[best_match_index]
-                        final_confidence = 1 - face_distances[best_match_index]
-                        
-                        # Draw label on original frame
-                        top *= 4; right *= 4; bottom *= 4; left *= 4
-                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                        cv2.putText(frame, self.users[current_frame_user]['name'], (left, top - 10), 
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                if tracker:
+                    faces = self._recognize_frame(frame, tolerance, tracker)
+                    # Carried identities are not new evidence for the confirm counter
+                    new_result = tracker.encoded > 0 or not faces
+                else:
+                    # SPEED FIX: Only process every other frame
+                    new_result = process_this_frame
+                    if new_result: faces = recognize(frame)
+                    else: metrics.inc('frames_skipped')
+                    process_this_frame = not process_this_frame
 
+            metrics.inc('frames')
+            if new_result:
+                metrics.observe('faces_per_frame', len(faces))
                 # Auto-confirm logic
-                if current_frame_user and current_frame_user == last_user_id:
-                    consecutive_count += 1
-                else:
-                    consecutive_count = 0
-                    last_user_id = current_frame_user
+                status, user_id, final_confidence = verifier.update(faces)
 
-            process_this_frame = not process_this_frame
+            with metrics.stage('draw'):
+                # Draw labels of the latest recognition result on the original frame
+                self._draw_faces(frame, faces)
 
-            # Visual progress bar
-            progress = (consecutive_count / required_frames)
-            cv2.rectangle(frame, (150, 440), (490, 455), (50, 50, 50), -1)
-            cv2.rectangle(frame, (150, 440), (150 + int(340 * progress), 455), (0, 255, 0), -1)
-            
-            cv2.imshow('Fast Scanner - Q to Cancel', frame)
+                # Visual progress bar
+                progress = verifier.progress
+                cv2.rectangle(frame, (150, 440), (490, 455), (50, 50, 50), -1)
+                cv2.rectangle(frame, (150, 440), (150 + int(340 * progress), 455), (0, 255, 0), -1)
+                
+                cv2.imshow('Fast Scanner - Q to Cancel', frame)
 
-            if consecutive_count >= required_frames:
+            if status != PENDING:
+                self.decision_stats.record(status, verifier.frames)
+                if status == ACCEPTED: metrics.observe('time_to_punch_seconds', time.monotonic() - started, LATENCY_BUCKETS)
+                print(f"Decision ({status}) after {verifier.frames} frames")
                 break
             if cv2.waitKey(1) & 0xFF == ord('q'):
-                last_user_id = None
                 break
 
+        if pipeline:
+            pipeline.stop()
+            metrics.inc('frames_dropped', pipeline.frames_dropped)
+            if pipeline.error: raise pipeline.error
         video_capture.release()
         cv2.destroyAllWindows()
-        return last_user_id, final_confidence
+        if self.embedding_cache is not None:
+            cache = self.embedding_cache.stats()
+            print(f"Encoding cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)")
+        if status != ACCEPTED: return None, 0
+        return user_id, final_confidence
 
-    def mark_attendance(self, action='punch_in'):
-        user_id, confidence = self.identify_face_realtime()
-        if not user_id: return False
-
-        now = datetime.now()
+    def record_attendance(self, user_id, confidence, action='punch_in', when=None):
+        """Persist a punch and return its record, or None if it repeats one inside the cooldown"""
+        now = when or datetime.now()
+        if not self.cooldown.claim(user_id, action, now): return None
         record = {
             'user_id': user_id, 'name': self.users[user_id]['name'],
             'action': action, 'timestamp': now.isoformat(),
             'confidence': float(confidence), 'date': now.strftime('%Y-%m-%d'),
             'time': now.strftime('%H:%M:%S')
         }
-        self.attendance_records.append(record)
-        self._save_attendance()
+        self._save_attendance(record)
+        return record
+
+    def mark_attendance(self, action='punch_in', **scan_options):
+        user_id, confidence = self.identify_face_realtime(**scan_options)
+        if not user_id: return False
+        # Only possible with a recognition service whose gallery is newer than this process
+        if user_id not in self.users:
+            print(f"⚠ {user_id} is not in this kiosk's users yet; restart it to load them")
+            return False
+
+        record = self.record_attendance(user_id, confidence, action)
+        if record is None:
+            print(f"⚠ {self.users[user_id]['name']} already did {action.replace('_', ' ')} "
+                  f"in the last {self.cooldown.window:g}s")
+            return False
         print(f"\n✓ {action.upper()} SUCCESS: {record['name']} @ {record['time']}")
         return True
 
     def display_report(self):
         date = datetime.now().strftime('%Y-%m-%d')
-        records = [r for r in self.attendance_records if r['date'] == date]
+        records = self.query_attendance(date=date)
         print(f"\n--- TODAY'S ATTENDANCE ({date}) ---")
         for r in records:
             print(f"{r['time']} - {r['name']} ({r['action']})")
 
 def main():
-    sys = FaceAttendanceSystem()
+    # METRICS_PORT / METRICS_FILE switch on stage timing export
+    # ENCODING_CACHE=1 reuses encodings of a face standing still
+    sys = FaceAttendanceSystem(metrics=metrics_from_env(),
+                               embedding_cache=True if os.environ.get("ENCODING_CACHE") == "1" else None)
+    # RECOGNITION_SERVICE=http://127.0.0.1:8765 recognizes through a running recognition_service.py
+    scan = {'service': os.environ["RECOGNITION_SERVICE"]} if os.environ.get("RECOGNITION_SERVICE") else {}
     while True:
         print("\n1. Register | 2. Punch In | 3. Punch Out | 4. Report | 5. Exit")
         c = input("Choice: ")
         if c == '1': sys.register_user(input("Name: "), input("ID: "))
-        elif c == '2': sys.mark_attendance('punch_in')
-        elif c == '3': sys.mark_attendance('punch_out')
+        elif c == '2': sys.mark_attendance('punch_in', **scan)
+        elif c == '3': sys.mark_attendance('punch_out', **scan)
         elif c == '4': sys.display_report()
         elif c == '5': break
+    sys.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -7,7 +7,12 @@ Uses OpenCV for camera verification and manual ID entry
 import cv2
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from attendance_journal import AttendanceJournal
+from punch_cooldown import PunchCooldown
+from record_store import RecordStore
+from sqlite_store import SQLiteBackend
 
 
 class SimpleAttendanceSystem:
@@ -16,19 +21,26 @@ class SimpleAttendanceSystem:
     Users enter ID, system verifies they're present via camera
     """
     
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", backend="files", cooldown=60):
         self.data_dir = data_dir
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
         
         self.users_file = os.path.join(data_dir, "users.json")
-        self.attendance_file = os.path.join(data_dir, "attendance.json")
+        # 'files' (users.json + journal) or 'sqlite' (attendance.db)
+        self.db = SQLiteBackend.open(data_dir) if backend == 'sqlite' else None
+        self.journal = self.db.attendance if self.db else AttendanceJournal(data_dir)
         
         self.users = self.load_users()
         self.attendance_records = self.load_attendance()
+        # Last punch per (user_id, action); repeats within `cooldown` seconds are refused
+        self.cooldown = PunchCooldown(cooldown)
+        self.cooldown.rebuild_from(self.query_attendance)
     
     def load_users(self):
         """Load registered users"""
+        if self.db:
+            return self.db.load_users()
         if os.path.exists(self.users_file):
             with open(self.users_file, 'r') as f:
                 return json.load(f)
@@ -36,20 +48,30 @@ class SimpleAttendanceSystem:
     
     def save_users(self):
         """Save users to file"""
+        if self.db:
+            self.db.save_users(self.users)
+            return
         with open(self.users_file, 'w') as f:
             json.dump(self.users, f, indent=2)
     
     def load_attendance(self):
-        """Load attendance records"""
-        if os.path.exists(self.attendance_file):
-            with open(self.attendance_file, 'r') as f:
-                return json.load(f)
-        return []
+        """Load attendance records from the journal segments into columnar storage"""
+        if self.db:
+            # Queried from the indexed table on demand instead
+            return RecordStore()
+        return RecordStore.from_records(self.journal.iter_records())
+    
+    def save_attendance(self, record):
+        """Append one attendance record to the index and the journal"""
+        if not self.db:
+            self.attendance_records.append(record)
+        self.journal.append(record)
     
-    def save_attendance(self):
-        """Save attendance records"""
-        with open(self.attendance_file, 'w') as f:
-            json.dump(self.attendance_records, f, indent=2)
+    def query_attendance(self, **filters):
+        """Filter attendance by date, start_date, end_date, user_id, action or since"""
+        if self.db:
+            return self.journal.query(**filters)
+        return self.attendance_records.query(**filters)
     
     def register_user(self, user_id, name, department=""):
         """Register a new user"""
@@ -118,16 +140,9 @@ class SimpleAttendanceSystem:
         user = self.users[user_id]
         
         # Check for recent duplicate
-        now = datetime.now()
-        recent_cutoff = now - timedelta(seconds=60)
-        
-        for record in reversed(self.attendance_records[-10:]):
-            record_time = datetime.fromisoformat(record['timestamp'])
-            if (record['user_id'] == user_id and 
-                record['action'] == action and 
-                record_time > recent_cutoff):
-                print(f"⚠ You already {action.replace('_', ' ')} less than a minute ago!")
-                return False
+        if self.cooldown.remaining(user_id, action) > 0:
+            print(f"⚠ You already {action.replace('_', ' ')} less than {self.cooldown.window:g} seconds ago!")
+            return False
         
         # Verify presence
         print(f"\n{'='*60}")
@@ -137,6 +152,10 @@ class SimpleAttendanceSystem:
         print(f"ID: {user_id}")
         
         if self.verify_presence(user['name']):
+            now = datetime.now()
+            if not self.cooldown.claim(user_id, action, now):
+                print(f"⚠ You already {action.replace('_', ' ')} less than {self.cooldown.window:g} seconds ago!")
+                return False
             record = {
                 'user_id': user_id,
                 'name': user['name'],
@@ -146,8 +165,7 @@ class SimpleAttendanceSystem:
                 'time': now.strftime('%H:%M:%S')
             }
             
-            self.attendance_records.append(record)
-            self.save_attendance()
+            self.save_attendance(record)
             
             print(f"\n✓ {action.upper().replace('_', ' ')} successful!")
             print(f"  Name: {user['name']}")
@@ -162,10 +180,7 @@ class SimpleAttendanceSystem:
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
         
-        records = [r for r in self.attendance_records if r['date'] == date]
-        
-        if user_id:
-            records = [r for r in records if r['user_id'] == user_id]
+        records = self.query_attendance(date=date, user_id=user_id or None)
         
         print(f"\n{'='*70}")
         print(f"  ATTENDANCE REPORT - {date}")
@@ -265,6 +280,7 @@ def main():
         
         elif choice == '7':
             print("\nThank you for using the Attendance System!")
+            system.journal.close()
             break
         
         else:
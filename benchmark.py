@@ -0,0 +1,278 @@
+"""
+Recognition Benchmark Suite
+Measures the hot path on synthetic data so results can be compared across
+releases on the same hardware:
+
+- detection ms/frame per detector backend
+- encoding ms/face (dlib ResNet)
+- matching ms/query against 1k / 10k / 100k synthetic identities
+- attendance write latency vs. history size
+- FaceAttendanceSystem startup time vs. gallery and history size
+
+Frames come from a recording (--video) or are synthetic noise; encoding
+cost does not depend on image content, so synthetic frames still time it.
+Results are printed (or written) as JSON.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --video entrance.mp4 --sizes 1000 10000 --skip startup
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+SUITES = ('detection', 'encoding', 'matching', 'writes', 'startup')
+
+
+def _summary(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'n': int(len(samples)),
+    }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def synthetic_gallery(size, dim=128, seed=0):
+    """Random unit-scale encodings and ids user0..user{size-1}"""
+    rng = np.random.default_rng(seed)
+    matrix = (rng.normal(size=(size, dim)) / np.sqrt(dim)).astype(np.float32)
+    return matrix, [f"user{i}" for i in range(size)]
+
+
+def synthetic_records(count, user_ids, days=30, seed=0):
+    """Punch records spread over the last `days` days"""
+    rng = np.random.default_rng(seed)
+    start = datetime.now() - timedelta(days=days)
+    offsets = np.sort(rng.uniform(0, days * 86400, size=count))
+    users = rng.integers(0, len(user_ids), size=count)
+    for offset, user in zip(offsets, users):
+        when = start + timedelta(seconds=float(offset))
+        yield {
+            'user_id': user_ids[user], 'name': user_ids[user],
+            'action': 'punch_in' if rng.random() < 0.5 else 'punch_out',
+            'timestamp': when.isoformat(), 'confidence': 0.6,
+            'date': when.strftime('%Y-%m-%d'), 'time': when.strftime('%H:%M:%S'),
+        }
+
+
+def load_frames(video=None, count=30, size=(480, 640), scale=0.25, seed=0):
+    """RGB frames at scanner resolution, from a recording or synthetic noise"""
+    import cv2
+
+    frames = []
+    if video:
+        capture = cv2.VideoCapture(str(video))
+        while len(frames) < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        rng = np.random.default_rng(seed)
+        frames = [rng.integers(0, 255, size=size + (3,), dtype=np.uint8) for _ in range(count)]
+    return [cv2.cvtColor(cv2.resize(f, (0, 0), fx=scale, fy=scale), cv2.COLOR_BGR2RGB) for f in frames]
+
+
+def bench_detection(frames, backends=('hog', 'haar')):
+    from detectors import make_detector
+
+    results = {}
+    for kind in backends:
+        try:
+            detector = make_detector(kind)
+        except (FileNotFoundError, ImportError, AttributeError) as e:
+            results[kind] = {'skipped': str(e)}
+            continue
+        detector(frames[0])  # warm-up
+        times, faces = [], 0
+        for frame in frames:
+            ms, boxes = _timed(detector, frame)
+            times.append(ms)
+            faces += len(boxes)
+        results[kind] = dict(_summary(times), faces=faces)
+    return results
+
+
+def bench_encoding(frames, faces_per_frame=1):
+    """dlib encoding of a fixed central box; cost is independent of content"""
+    import face_recognition
+
+    height, width = frames[0].shape[:2]
+    side = min(height, width) // 2
+    top, left = (height - side) // 2, (width - side) // 2
+    locations = [(top, left + side, top + side, left)] * faces_per_frame
+    face_recognition.face_encodings(frames[0], locations)  # warm-up (model load)
+    times = [_timed(face_recognition.face_encodings, frame, locations)[0] / faces_per_frame for frame in frames]
+    return _summary(times)
+
+
+def bench_matching(sizes=(1000, 10000, 100000), queries=200, kinds=('exact', 'ivf'), tolerance=0.5):
+    """Per-frame lookups (one query per call), as in the scanner"""
+    from face_index import build_index
+
+    results = {}
+    rng = np.random.default_rng(1)
+    for size in sizes:
+        gallery, ids = synthetic_gallery(size)
+        picks = rng.choice(size, min(queries, size), replace=False)
+        probes = gallery[picks] + rng.normal(scale=0.01, size=(len(picks), gallery.shape[1])).astype(np.float32)
+        results[str(size)] = {}
+        for kind in kinds:
+            build_ms, index = _timed(build_index, gallery, ids, kind)
+            times = [_timed(index.best_match, probe[None, :], tolerance)[0] for probe in probes]
+            results[str(size)][kind] = dict(_summary(times), build_ms=build_ms)
+    return results
+
+
+def _seed_data_dir(data_dir, gallery_size, history, backend):
+    """Populate a data directory with a synthetic gallery, users and attendance history"""
+    from attendance_journal import AttendanceJournal
+    from embedding_store import EmbeddingStore
+    from sqlite_store import SQLiteBackend
+
+    matrix, ids = synthetic_gallery(gallery_size)
+    users = {user_id: {'name': user_id, 'user_id': user_id, 'registered_at': datetime.now().isoformat()}
+             for user_id in ids}
+    if backend == 'sqlite':
+        db = SQLiteBackend.open(data_dir)
+        db.enroll(users, ids, matrix)
+        db.attendance.append_many(synthetic_records(history, ids))
+        db.close()
+        return ids
+    EmbeddingStore.open(data_dir).append(ids, matrix)
+    with open(Path(data_dir) / "users.json", 'w') as f:
+        json.dump(users, f)
+    # Seeding only: sync once at the end instead of every few records
+    journal = AttendanceJournal(data_dir, fsync_every=10 ** 9, fsync_interval=10 ** 9)
+    for record in synthetic_records(history, ids):
+        journal.append(record)
+    journal.close()
+    return ids
+
+
+def bench_writes(histories=(0, 10000, 100000), writes=200, backends=('files', 'sqlite'), gallery_size=1000):
+    """Latency of record_attendance with growing history"""
+    from attendance_system import FaceAttendanceSystem
+
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for history in histories:
+            data_dir = tempfile.mkdtemp(prefix="bench-writes-")
+            try:
+                ids = _seed_data_dir(data_dir, gallery_size, history, backend)
+                # No cooldown: every write reaches the store
+                system = FaceAttendanceSystem(data_dir=data_dir, backend=backend, cooldown=0)
+                times = [_timed(system.record_attendance, ids[i % len(ids)], 0.6, 'punch_in')[0]
+                         for i in range(writes)]
+                system.close()
+                results[backend][str(history)] = _summary(times)
+            finally:
+                shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def bench_startup(sizes=(1000, 10000, 100000), history=10000, backends=('files', 'sqlite'), repeat=3):
+    """FaceAttendanceSystem.__init__ wall time (gallery load + index build + history)"""
+    from attendance_system import FaceAttendanceSystem
+
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for size in sizes:
+            data_dir = tempfile.mkdtemp(prefix="bench-startup-")
+            try:
+                _seed_data_dir(data_dir, size, history, backend)
+                times = []
+                for _ in range(repeat):
+                    ms, system = _timed(lambda: FaceAttendanceSystem(data_dir=data_dir, backend=backend))
+                    system.close()
+                    times.append(ms)
+                results[backend][str(size)] = _summary(times)
+            finally:
+                shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def environment():
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+
+
+def run(suites=SUITES, sizes=(1000, 10000, 100000), video=None, frames=30, queries=200,
+        histories=(0, 10000, 100000), writes=200, backends=('files', 'sqlite'), detectors=('hog', 'haar')):
+    """Run the selected suites; a suite whose dependency is missing reports why it was skipped"""
+    report = {'environment': environment(), 'results': {}}
+    images = load_frames(video, frames) if {'detection', 'encoding'} & set(suites) else None
+    jobs = {
+        'detection': lambda: bench_detection(images, detectors),
+        'encoding': lambda: bench_encoding(images),
+        'matching': lambda: bench_matching(sizes, queries),
+        'writes': lambda: bench_writes(histories, writes, backends),
+        'startup': lambda: bench_startup(sizes, backends=backends),
+    }
+    for suite in suites:
+        # Progress goes to stderr so stdout stays valid JSON
+        print(f"Running {suite}...", file=sys.stderr, flush=True)
+        try:
+            report['results'][suite] = jobs[suite]()
+        except ImportError as e:
+            report['results'][suite] = {'skipped': str(e)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognition hot-path benchmark (JSON output)")
+    parser.add_argument('--suites', nargs='+', default=list(SUITES), choices=SUITES)
+    parser.add_argument('--skip', nargs='+', default=[], choices=SUITES)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000], help="gallery sizes")
+    parser.add_argument('--histories', nargs='+', type=int, default=[0, 10000, 100000],
+                        help="attendance history sizes for the write benchmark")
+    parser.add_argument('--backends', nargs='+', default=['files', 'sqlite'], choices=['files', 'sqlite'])
+    parser.add_argument('--detectors', nargs='+', default=['hog', 'haar'],
+                        choices=['hog', 'haar', 'yunet', 'ssd'])
+    parser.add_argument('--video', help="recorded footage for detection/encoding (default: synthetic frames)")
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    suites = [s for s in args.suites if s not in args.skip]
+    report = run(suites, sizes=args.sizes, video=args.video, frames=args.frames, queries=args.queries,
+                 histories=args.histories, writes=args.writes, backends=args.backends, detectors=args.detectors)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+        print(f"✓ Results written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -95,11 +95,9 @@ def demo_without_camera():
             'time': event['time']
         }
         
-        system.attendance_records.append(record)
+        system._save_attendance(record)
         print(f"  {user['name']}: {event['action'].upper()} at {event['time']} (Confidence: 95%)")
     
-    system._save_attendance()
-    
     # Demo 4: Display attendance report
     print("\n--- ATTENDANCE REPORT ---")
     system.display_attendance_report()
@@ -157,9 +155,9 @@ def demo_without_camera():
     
     print("\n--- DATA STORAGE ---")
     print(f"\nData files created in: {system.data_dir}")
-    print("  - face_encodings.pkl: Face embeddings")
+    print("  - face_encodings.f32/.ids: Face embeddings (memory-mapped)")
     print("  - users.json: User information")
-    print("  - attendance.json: Attendance records")
+    print("  - attendance/YYYY-MM-DD.jsonl: Attendance journal (one file per day)")
     
     # Show sample data
     print("\nSample User Data:")
@@ -176,7 +174,8 @@ def demo_without_camera():
     print("\nTo run the actual system with camera:")
     print("  python attendance_system.py")
     print("\nTo test with your own images:")
-    print("  Modify the register_user() function to use image_path parameter")
+    print("  system.register_user(name, user_id, image_paths=[...])")
+    print("  python enroll.py photos/   # one folder per user_id")
     
     return system
 
@@ -0,0 +1,181 @@
+"""
+Face Detector Backends
+Interchangeable detectors with the face_recognition.face_locations
+interface: called with an RGB image, they return (top, right, bottom, left)
+boxes. Only detection changes; encodings still come from dlib's ResNet.
+
+- hog:   dlib HOG via face_recognition (default, slowest)
+- haar:  OpenCV Haar cascade shipped with opencv-python
+- yunet: OpenCV DNN YuNet model (cv2.FaceDetectorYN), loaded from disk
+- ssd:   OpenCV DNN ResNet-10 SSD Caffe model, loaded from disk
+
+Usage:
+    python detectors.py --camera 0 --frames 100
+    python detectors.py --images samples/ --backends hog haar yunet
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+MODELS_DIR = Path("models")
+
+
+def _require(path):
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Detector model not found: {path} (download it into {path.parent}/)")
+    return str(path)
+
+
+def _clip(boxes, shape):
+    """(x, y, w, h) boxes to (top, right, bottom, left) inside the image"""
+    height, width = shape[:2]
+    return [(max(int(y), 0), min(int(x + w), width), min(int(y + h), height), max(int(x), 0))
+            for x, y, w, h in boxes]
+
+
+class HOGDetector:
+    """dlib HOG detector, as used by face_recognition.face_locations"""
+
+    def __init__(self, upsample=1):
+        import face_recognition
+        self._face_locations = face_recognition.face_locations
+        self.upsample = upsample
+
+    def __call__(self, rgb_image):
+        return self._face_locations(rgb_image, self.upsample, model='hog')
+
+
+class HaarDetector:
+    """OpenCV Viola-Jones cascade; fastest, but frontal faces only and more false positives"""
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=20):
+        cascade_path = cascade_path or Path(cv2.data.haarcascades) / "haarcascade_frontalface_default.xml"
+        self.cascade = cv2.CascadeClassifier(_require(cascade_path))
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+
+    def __call__(self, rgb_image):
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        boxes = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                              minNeighbors=self.min_neighbors, minSize=self.min_size)
+        return _clip(boxes, rgb_image.shape)
+
+
+class YuNetDetector:
+    """OpenCV DNN YuNet (face_detection_yunet_*.onnx from the OpenCV model zoo)"""
+
+    def __init__(self, model_path=MODELS_DIR / "face_detection_yunet_2023mar.onnx",
+                 score_threshold=0.8, nms_threshold=0.3):
+        self.net = cv2.FaceDetectorYN.create(_require(model_path), "", (320, 320),
+                                             score_threshold, nms_threshold)
+        # The network keeps per-input state; recognition threads take turns
+        self._lock = threading.Lock()
+
+    def __call__(self, rgb_image):
+        bgr = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
+        with self._lock:
+            self.net.setInputSize((bgr.shape[1], bgr.shape[0]))
+            _, faces = self.net.detect(bgr)
+        if faces is None:
+            return []
+        return _clip(faces[:, :4], rgb_image.shape)
+
+
+class SSDDetector:
+    """OpenCV DNN ResNet-10 SSD (deploy.prototxt + res10_300x300_ssd_iter_140000.caffemodel)"""
+
+    def __init__(self, prototxt=MODELS_DIR / "deploy.prototxt",
+                 model_path=MODELS_DIR / "res10_300x300_ssd_iter_140000.caffemodel", confidence=0.5):
+        self.net = cv2.dnn.readNetFromCaffe(_require(prototxt), _require(model_path))
+        self.confidence = confidence
+        self._lock = threading.Lock()
+
+    def __call__(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        # The model was trained on BGR input with these channel means
+        blob = cv2.dnn.blobFromImage(cv2.resize(rgb_image, (300, 300)), 1.0, (300, 300),
+                                     (104.0, 177.0, 123.0), swapRB=True)
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = detections[:, 3:7] * np.array([width, height, width, height])
+        return _clip([(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes], rgb_image.shape)
+
+
+DETECTORS = {
+    'hog': HOGDetector,
+    'haar': HaarDetector,
+    'yunet': YuNetDetector,
+    'ssd': SSDDetector,
+}
+
+
+def make_detector(kind='hog', **options):
+    """Detector by name; an already constructed detector is returned unchanged"""
+    if callable(kind):
+        return kind
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown detector '{kind}', expected one of {sorted(DETECTORS)}")
+    return DETECTORS[kind](**options)
+
+
+def benchmark(detector, frames, repeat=1):
+    """Mean milliseconds per frame and total faces found"""
+    detector(frames[0])  # warm-up (model load, allocations)
+    faces = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            faces += len(detector(frame))
+    elapsed = time.perf_counter() - start
+    return {'ms_per_frame': elapsed * 1000 / (len(frames) * repeat), 'faces': faces // repeat}
+
+
+def main():
+    """Compare detector backends on camera frames or a folder of images"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Face detector benchmark")
+    parser.add_argument('--backends', nargs='+', default=sorted(DETECTORS), choices=sorted(DETECTORS))
+    parser.add_argument('--images', help="folder of .jpg/.png images")
+    parser.add_argument('--camera', type=int, default=0)
+    parser.add_argument('--frames', type=int, default=50, help="camera frames to capture")
+    parser.add_argument('--scale', type=float, default=0.25, help="downscale applied before detection, as in the scanner")
+    args = parser.parse_args()
+
+    frames = []
+    if args.images:
+        paths = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        frames = [cv2.imread(str(p)) for p in paths]
+    else:
+        capture = cv2.VideoCapture(args.camera)
+        while len(frames) < args.frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+    frames = [cv2.cvtColor(cv2.resize(f, (0, 0), fx=args.scale, fy=args.scale), cv2.COLOR_BGR2RGB)
+              for f in frames if f is not None]
+    if not frames:
+        parser.error("no frames to benchmark")
+
+    print(f"{len(frames)} frames at {frames[0].shape[1]}x{frames[0].shape[0]}")
+    for kind in args.backends:
+        try:
+            report = benchmark(make_detector(kind), frames)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"{kind:<6} skipped: {e}")
+            continue
+        print(f"{kind:<6} {report['ms_per_frame']:8.2f} ms/frame  faces={report['faces']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Encoding Cache
+Skips dlib encoding when a face crop is nearly identical to one encoded a
+moment ago (a person standing still at the kiosk).
+
+Entries are keyed by (source, track_id): one per face per camera, so a
+crop from one camera or session never reuses another one's encoding. A
+face keeps its track id while its box overlaps the cached box of the same
+source by at least `min_iou` (or the caller passes its tracker's ids).
+
+A crop is fingerprinted with a 64-bit difference hash (dHash) of its
+grayscale thumbnail. The track's cached encoding is reused when the new
+crop's hash is within `max_hamming` bits and its box still overlaps by
+`min_iou`. Entries expire after `ttl` seconds and the least recently used
+entry is evicted beyond `capacity`.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from tracker import iou
+
+
+def dhash(image, box, hash_size=8):
+    """64-bit difference hash of the (top, right, bottom, left) crop of an RGB image"""
+    top, right, bottom, left = box
+    crop = image[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)]
+    if crop.size == 0:
+        return None
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY) if crop.ndim == 3 else crop
+    thumb = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of (source, track_id) -> (box, crop hash, encoding) with TTL"""
+
+    def __init__(self, capacity=64, ttl=2.0, max_hamming=3, min_iou=0.8):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_hamming = max_hamming
+        self.min_iou = min_iou
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._track_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate, 'entries': len(self)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key, box, fingerprint, now=None):
+        """Cached encoding of the (source, track_id) key if its crop is unchanged, or None"""
+        if fingerprint is None:
+            return None
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[3] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                cached_box, cached_hash, encoding, _ = entry
+                if bin(cached_hash ^ fingerprint).count('1') <= self.max_hamming and \
+                        iou(cached_box, box) >= self.min_iou:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return encoding
+            self.misses += 1
+            return None
+
+    def put(self, key, box, fingerprint, encoding, now=None):
+        if fingerprint is None or encoding is None:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (tuple(box), fingerprint, encoding, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def track_ids(self, source, locations):
+        """
+        A track id per box: the id of the cached box of `source` it overlaps
+        most (at least min_iou), or a new id
+        """
+        with self._lock:
+            cached = [(key[1], entry[0]) for key, entry in self._entries.items() if key[0] == source]
+            ids = []
+            for box in locations:
+                best, best_iou = None, self.min_iou
+                for track_id, cached_box in cached:
+                    overlap = iou(cached_box, box)
+                    if overlap >= best_iou and track_id not in ids:
+                        best, best_iou = track_id, overlap
+                ids.append(next(self._track_ids) if best is None else best)
+            return ids
+
+    def encode(self, image, locations, encode, source=None, track_ids=None):
+        """
+        Encodings for `locations`, calling encode(image, missing_locations)
+        only for crops not found in the cache. `source` names the camera or
+        session; track_ids defaults to matching boxes by overlap.
+        """
+        if track_ids is None:
+            track_ids = self.track_ids(source, locations)
+        keys = [(source, track_id) for track_id in track_ids]
+        fingerprints = [dhash(image, box) for box in locations]
+        encodings = [self.get(key, box, fp) for key, box, fp in zip(keys, locations, fingerprints)]
+        missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+        if missing:
+            fresh = encode(image, [locations[i] for i in missing])
+            for i, encoding in zip(missing, fresh):
+                encodings[i] = encoding
+                self.put(keys[i], locations[i], fingerprints[i], encoding)
+        return encodings
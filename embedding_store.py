@@ -0,0 +1,269 @@
+"""
+Memory-Mapped Embedding Store
+Face encodings live in a fixed-width float32 matrix file opened with
+np.memmap, next to a small sidecar holding one user id per row.
+
+face_encodings.f32:  64-byte header (magic, format version, dim, generation)
+                     followed by float32 rows of `dim` values
+face_encodings.ids:  header line with the generation, then one JSON id per line
+
+New users are appended to both files; deletions and re-enrollments
+rewrite them into temporary files that are swapped in with os.replace. Several kiosk
+processes can open the same store and share the page-cached matrix;
+appends, compaction and repair hold an exclusive lock on
+face_encodings.lock, so each process writes after the rows the others
+have added. A process reads only the ids lines past the byte offset it
+has already read (and re-maps the matrix), so appends and refreshes cost
+I/O for the new rows only; a compaction bumps the generation, which makes
+every reader re-read both files.
+"""
+
+import json
+import os
+import pickle
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b'FACEEMB\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIQ')
+HEADER_SIZE = 64
+
+
+class EmbeddingStore:
+    """Append-only float32 embedding matrix with an ids sidecar"""
+
+    def __init__(self, path, dim=128):
+        self.path = Path(path)
+        self.ids_path = self.path.with_suffix('.ids')
+        self.lock_path = self.path.with_suffix('.lock')
+        self.dim = dim
+        self.row_bytes = dim * 4
+        self.generation = None
+        self.ids = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        # Bytes of the ids sidecar already read into self.ids
+        self._ids_offset = 0
+
+        with self._locked():
+            self._recover()
+            if not self.path.exists():
+                self._write_files(self.path, self.ids_path, self.matrix, [], generation=0)
+            self._repair()
+        self.refresh()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock shared by every process using this store"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a+b') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # --- file layout ---
+
+    def _header_bytes(self, generation):
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self.dim, generation).ljust(HEADER_SIZE, b'\0')
+
+    def _read_header(self, path):
+        with open(path, 'rb') as f:
+            magic, version, dim, generation = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an embedding store")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {version}")
+        if dim != self.dim:
+            raise ValueError(f"{path} stores {dim}-d encodings, expected {self.dim}")
+        return generation
+
+    @staticmethod
+    def _read_ids_generation(path):
+        with open(path, 'r') as f:
+            return int(f.readline().split('=')[1])
+
+    def _write_files(self, matrix_path, ids_path, matrix, ids, generation):
+        with open(matrix_path, 'wb') as f:
+            f.write(self._header_bytes(generation))
+            f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            f.flush(); os.fsync(f.fileno())
+        with open(ids_path, 'w') as f:
+            f.write(f"# face-ids generation={generation}\n")
+            f.writelines(json.dumps(user_id) + "\n" for user_id in ids)
+            f.flush(); os.fsync(f.fileno())
+
+    def _recover(self):
+        """Finish or discard a compaction interrupted between the two file swaps"""
+        tmp_matrix = self.path.with_suffix('.f32.tmp')
+        tmp_ids = self.ids_path.with_suffix('.ids.tmp')
+        if tmp_matrix.exists():
+            tmp_matrix.unlink()
+        if tmp_ids.exists():
+            if self.path.exists() and self._read_header(self.path) == self._read_ids_generation(tmp_ids):
+                os.replace(tmp_ids, self.ids_path)
+            else:
+                tmp_ids.unlink()
+
+    def _repair(self):
+        """
+        Drop a torn trailing row or id left by a crash during append; call
+        with the lock held, so no other process is mid-append. Returns the
+        number of complete rows.
+        """
+        with open(self.ids_path, 'r') as f:
+            lines = f.readlines()
+        complete = lines[:1] + [line for line in lines[1:] if line.endswith("\n")]
+        rows = (self.path.stat().st_size - HEADER_SIZE) // self.row_bytes
+        count = min(rows, len(complete) - 1)
+        expected = HEADER_SIZE + count * self.row_bytes
+        if self.path.stat().st_size != expected:
+            with open(self.path, 'r+b') as f:
+                f.truncate(expected)
+        if len(lines) != count + 1 or not lines[-1].endswith("\n"):
+            self._write_ids(complete[:count + 1])
+        return count
+
+    def _write_ids(self, lines):
+        tmp_ids = self.ids_path.with_suffix('.ids.tmp')
+        with open(tmp_ids, 'w') as f:
+            f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_ids, self.ids_path)
+
+    # --- reading ---
+
+    def refresh(self):
+        """
+        Pick up writes from other processes: rows appended since the last
+        read are added to ids and the matrix view; after a compaction (new
+        generation) both files are re-read
+        """
+        generation = self._read_header(self.path)
+        if generation != self.generation:
+            self.generation, self.ids, self._ids_offset = generation, [], 0
+        with open(self.ids_path, 'rb') as f:
+            if not self._ids_offset:
+                self._ids_offset = len(f.readline())
+            f.seek(self._ids_offset)
+            lines = f.read().split(b"\n")[:-1]
+
+        rows = (self.path.stat().st_size - HEADER_SIZE) // self.row_bytes
+        lines = lines[:max(rows - len(self.ids), 0)]
+        if lines:
+            self.ids.extend(json.loads(line) for line in lines)
+            self._ids_offset += sum(len(line) + 1 for line in lines)
+        count = len(self.ids)
+        if count and count != len(self.matrix):
+            self.matrix = np.memmap(self.path, dtype=np.float32, mode='r',
+                                    offset=HEADER_SIZE, shape=(count, self.dim))
+        elif not count:
+            self.matrix = np.empty((0, self.dim), dtype=np.float32)
+
+    # --- writing ---
+
+    def append(self, ids, encodings):
+        """
+        Append rows for new templates; I/O is proportional to the new rows
+        only. Rows other processes appended in the meantime are picked up too
+        """
+        rows = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(rows) != len(ids):
+            raise ValueError("encodings and ids must have the same length")
+        if len(rows) == 0:
+            return
+
+        with self._locked():
+            # Other processes may have appended since we last read: start after their rows
+            self._repair()
+            self._write_rows(ids, rows)
+        self.refresh()
+
+    def _write_rows(self, ids, rows):
+        # Matrix rows first: a crash before the ids land leaves rows that are ignored
+        with open(self.path, 'ab') as f:
+            f.write(rows.tobytes())
+            f.flush(); os.fsync(f.fileno())
+        with open(self.ids_path, 'a') as f:
+            f.writelines(json.dumps(user_id) + "\n" for user_id in ids)
+            f.flush(); os.fsync(f.fileno())
+
+    def delete(self, user_ids):
+        """Remove every row owned by the given users and compact both files"""
+        return self.replace(user_ids, [], np.empty((0, self.dim), dtype=np.float32))
+
+    def replace(self, user_ids, ids, encodings):
+        """
+        Remove every row owned by user_ids and add the given rows in one
+        compaction, so readers see either the old or the new templates.
+        Returns the number of rows removed.
+        """
+        rows = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(rows) != len(ids):
+            raise ValueError("encodings and ids must have the same length")
+        user_ids = set(user_ids)
+        with self._locked():
+            self._repair()
+            # Compact what is on disk now, including rows other processes added
+            self.refresh()
+            keep = np.array([user_id not in user_ids for user_id in self.ids], dtype=bool)
+            if keep.all():
+                # Nothing to remove: a plain append keeps the generation
+                if len(rows):
+                    self._write_rows(ids, rows)
+                    self.refresh()
+                return 0
+
+            matrix = np.concatenate([self.matrix[keep], rows])
+            ids = [user_id for user_id, kept in zip(self.ids, keep) if kept] + list(ids)
+            generation = self.generation + 1
+            tmp_matrix = self.path.with_suffix('.f32.tmp')
+            tmp_ids = self.ids_path.with_suffix('.ids.tmp')
+            self._write_files(tmp_matrix, tmp_ids, matrix, ids, generation)
+
+            # Release the mapping before swapping files (required on Windows)
+            self.matrix = np.empty((0, self.dim), dtype=np.float32)
+            os.replace(tmp_matrix, self.path)
+            os.replace(tmp_ids, self.ids_path)
+            self.refresh()
+        return int((~keep).sum())
+
+    # --- migration ---
+
+    @classmethod
+    def open(cls, data_dir, dim=128):
+        """
+        Open data_dir/face_encodings.f32, importing the legacy
+        face_encodings.pkl the first time the store is created
+        """
+        data_dir = Path(data_dir)
+        path = data_dir / "face_encodings.f32"
+        legacy = data_dir / "face_encodings.pkl"
+        fresh = not path.exists()
+        store = cls(path, dim=dim)
+        if fresh and legacy.exists():
+            with open(legacy, 'rb') as f:
+                data = pickle.load(f)
+            store.append(list(data['names']), np.asarray(data['encodings'], dtype=np.float32).reshape(-1, dim))
+        return store
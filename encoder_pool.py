@@ -0,0 +1,109 @@
+"""
+Process-Pool Face Encoder
+Runs dlib's ResNet encoder in worker processes so a multi-core kiosk is
+not limited to the one core the GIL allows.
+
+Only face crops travel to the workers, through preallocated shared-memory
+slots; full frames are never pickled.
+"""
+
+import queue
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+_face_recognition = None
+
+
+def _init_worker():
+    global _face_recognition
+    import face_recognition
+    _face_recognition = face_recognition
+
+
+def _encode_crop(shm_name, shape, location):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        crop = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        encodings = _face_recognition.face_encodings(crop, [location])
+        return encodings[0] if encodings else None
+    finally:
+        shm.close()
+
+
+class EncoderPool:
+    """
+    N worker processes computing 128-d encodings for face crops
+    encode(image, locations) is thread-safe, so several recognition
+    threads can keep all workers busy.
+    """
+
+    def __init__(self, workers=4, slot_bytes=1 << 20, margin=0.25):
+        self.workers = workers
+        self.margin = margin
+        self.slot_bytes = slot_bytes
+        self._pool = get_context('spawn').Pool(workers, initializer=_init_worker)
+        # Two slots per worker so the next crop can be staged while one is encoding
+        self._slots = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(workers * 2)]
+        self._free = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+
+    def _crop(self, image, location):
+        """Face box plus margin, and the box location relative to the crop"""
+        top, right, bottom, left = location
+        pad_y = int((bottom - top) * self.margin)
+        pad_x = int((right - left) * self.margin)
+        y0, x0 = max(top - pad_y, 0), max(left - pad_x, 0)
+        y1, x1 = min(bottom + pad_y, image.shape[0]), min(right + pad_x, image.shape[1])
+        crop = np.ascontiguousarray(image[y0:y1, x0:x1], dtype=np.uint8)
+        return crop, (top - y0, right - x0, bottom - y0, left - x0)
+
+    def encode(self, image, locations):
+        """Encodings for each (top, right, bottom, left) location of an RGB image, in order"""
+        return self.encode_many([(image, locations)])[0]
+
+    def encode_many(self, jobs):
+        """
+        encode() for several (image, locations) pairs with every crop in flight
+        at once; returns one list of encodings per job
+        """
+        pending = []
+        try:
+            for image, locations in jobs:
+                for location in locations:
+                    crop, local = self._crop(image, location)
+                    shm, owned = None, False
+                    if crop.nbytes <= self.slot_bytes:
+                        # Wait for a slot only while none of ours is in flight, or we would wait on ourselves
+                        try:
+                            shm = self._free.get(block=not pending)
+                        except queue.Empty:
+                            pass
+                    if shm is None:
+                        shm, owned = shared_memory.SharedMemory(create=True, size=max(crop.nbytes, 1)), True
+                    np.ndarray(crop.shape, dtype=np.uint8, buffer=shm.buf)[:] = crop
+                    task = self._pool.apply_async(_encode_crop, (shm.name, crop.shape, local))
+                    pending.append((task, shm, owned))
+            encodings = iter([task.get() for task, _, _ in pending])
+            return [[next(encodings) for _ in locations] for _, locations in jobs]
+        finally:
+            for _, shm, owned in pending:
+                if owned:
+                    shm.close(); shm.unlink()
+                else:
+                    self._free.put(shm)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
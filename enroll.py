@@ -0,0 +1,149 @@
+"""
+Batch Enrollment
+Registers many users from photos instead of the webcam.
+
+Input is either a directory with one folder per user_id:
+
+    photos/EMP001/a.jpg, photos/EMP001/b.jpg, photos/EMP002/...
+
+or a CSV with columns user_id, name, image_path (name optional; relative
+paths are resolved against the CSV's folder). Images are decoded, detected
+and encoded in worker processes; images with no face or several faces are
+rejected. All accepted users are written to the gallery in one go.
+
+Usage:
+    python enroll.py photos/ --workers 8
+    python enroll.py staff.csv --backend sqlite --templates all
+"""
+
+import argparse
+import csv
+from collections import defaultdict
+from multiprocessing import get_context
+from pathlib import Path
+
+import cv2
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp')
+
+_detector = None
+_max_side = None
+
+
+def collect_images(source):
+    """{user_id: {'name': str, 'paths': [Path]}} from a folder tree or a CSV file"""
+    source = Path(source)
+    users = defaultdict(lambda: {'name': None, 'paths': []})
+    if source.is_dir():
+        for folder in sorted(p for p in source.iterdir() if p.is_dir()):
+            paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+            if paths:
+                users[folder.name]['paths'] = paths
+    else:
+        with open(source, newline='') as f:
+            for row in csv.DictReader(f):
+                user = users[row['user_id'].strip()]
+                user['name'] = (row.get('name') or '').strip() or user['name']
+                path = Path(row['image_path'].strip())
+                user['paths'].append(path if path.is_absolute() else source.parent / path)
+    for user_id, user in users.items():
+        user['name'] = user['name'] or user_id
+    return dict(users)
+
+
+def load_image(path, max_side=1024):
+    """RGB image, downscaled so its longer side is at most max_side; None if unreadable"""
+    image = cv2.imread(str(path))
+    if image is None:
+        return None
+    scale = max_side / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def encode_image(path, detector, encode, max_side=1024):
+    """(encoding, None) for a photo with exactly one face, else (None, reason)"""
+    image = load_image(path, max_side)
+    if image is None:
+        return None, "unreadable"
+    locations = detector(image)
+    if not locations:
+        return None, "no face"
+    if len(locations) > 1:
+        return None, "multiple faces"
+    return encode(image, locations)[0], None
+
+
+def _init_worker(detector, max_side):
+    global _detector, _max_side
+    from detectors import make_detector
+    _detector = make_detector(detector)
+    _max_side = max_side
+
+
+def _encode_task(task):
+    import face_recognition
+    user_id, path = task
+    encoding, reason = encode_image(path, _detector, face_recognition.face_encodings, _max_side)
+    return user_id, str(path), encoding, reason
+
+
+def encode_users(users, workers=4, detector='hog', max_side=1024):
+    """
+    Encode every listed image across a process pool
+    Returns ({user_id: [encodings]}, [(path, reason)] for rejected images)
+    """
+    tasks = [(user_id, path) for user_id, user in users.items() for path in user['paths']]
+    samples, rejected = defaultdict(list), []
+    with get_context('spawn').Pool(workers, initializer=_init_worker, initargs=(detector, max_side)) as pool:
+        for done, (user_id, path, encoding, reason) in enumerate(
+                pool.imap_unordered(_encode_task, tasks, chunksize=8), 1):
+            if encoding is None:
+                rejected.append((path, reason))
+            else:
+                samples[user_id].append(encoding)
+            if done % 100 == 0 or done == len(tasks):
+                print(f"  {done}/{len(tasks)} images")
+    return dict(samples), rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll users from photo folders or a CSV")
+    parser.add_argument('source', help="folder with one sub-folder per user_id, or CSV (user_id,name,image_path)")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--backend', default="files", choices=["files", "sqlite"])
+    parser.add_argument('--templates', default="mean", help="'mean', 'all' or a number of clustered templates")
+    parser.add_argument('--detector', default="hog", choices=["hog", "haar", "yunet", "ssd"])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-side', type=int, default=1024, help="downscale larger photos before detection")
+    parser.add_argument('--replace', action='store_true', help="re-enroll users that are already registered")
+    args = parser.parse_args()
+
+    from attendance_system import FaceAttendanceSystem
+
+    templates = int(args.templates) if args.templates.isdigit() else args.templates
+    system = FaceAttendanceSystem(data_dir=args.data_dir, backend=args.backend, templates=templates)
+    users = collect_images(args.source)
+    existing = [user_id for user_id in users if user_id in system.users]
+    if existing and not args.replace:
+        print(f"Skipping {len(existing)} already registered user(s); use --replace to re-enroll")
+        users = {user_id: user for user_id, user in users.items() if user_id not in system.users}
+    print(f"Encoding {sum(len(u['paths']) for u in users.values())} images of {len(users)} users...")
+
+    samples, rejected = encode_users(users, workers=args.workers, detector=args.detector, max_side=args.max_side)
+    # With --replace, old templates are swapped for the new ones in one write
+    enrolled = system.enroll([(user_id, users[user_id]['name'], samples[user_id]) for user_id in samples],
+                             replace=args.replace)
+
+    for path, reason in rejected:
+        print(f"  rejected {path}: {reason}")
+    missing = sorted(set(users) - set(samples))
+    print(f"✓ Enrolled {enrolled} users, rejected {len(rejected)} images")
+    if missing:
+        print(f"No usable photo for: {', '.join(missing)}")
+    system.close()
+
+
+if __name__ == "__main__":
+    main()
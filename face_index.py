@@ -0,0 +1,205 @@
+"""
+Gallery Index Layer
+Pluggable nearest-neighbour indexes over enrolled face encodings:
+- exact: brute-force FaceMatcher scan (default)
+- ivf:   inverted-file index with a NumPy k-means coarse quantizer
+"""
+
+import time
+
+import numpy as np
+
+from face_matcher import FaceMatcher, best_from_search, kmeans
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index
+    Encodings are bucketed by their nearest k-means centroid and a query
+    only scans the nprobe closest buckets, so lookup cost tracks bucket
+    size instead of gallery size. Until enough encodings are present to
+    train the quantizer the index behaves as an exact scan.
+    """
+
+    def __init__(self, dim=128, nlist=None, nprobe=8, min_points_per_list=39, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_points_per_list = min_points_per_list
+        self.seed = seed
+        self.centroids = None
+        self.lists = []
+        self._pending = FaceMatcher(dim=dim)
+
+    def __len__(self):
+        """Number of stored templates"""
+        if self.centroids is None:
+            return len(self._pending)
+        return sum(len(bucket) for bucket in self.lists)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _target_nlist(self, n):
+        if self.nlist:
+            return self.nlist
+        return max(1, int(np.sqrt(n)))
+
+    def _ready_to_train(self, n):
+        return n >= self._target_nlist(n) * self.min_points_per_list and self._target_nlist(n) > 1
+
+    def train(self, iterations=10):
+        """Fit the coarse quantizer on the pending encodings and bucket them"""
+        vectors = self._pending.matrix.copy()
+        ids = list(self._pending.ids)
+        nlist = min(self._target_nlist(len(vectors)), len(vectors))
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(len(vectors), nlist * 256)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = kmeans(sample, nlist, iterations=iterations, seed=self.seed)[0]
+
+        self.centroids = centroids
+        self._quantizer = FaceMatcher.from_encodings(centroids, list(range(nlist)))
+        self.lists = [FaceMatcher(dim=self.dim) for _ in range(nlist)]
+        self._pending = FaceMatcher(dim=self.dim)
+        self.add_many(vectors, ids)
+
+    def add(self, user_id, encoding):
+        """Insert one encoding (or a (k, 128) template set) into the nearest buckets"""
+        rows = np.asarray(encoding, dtype=np.float32).reshape(-1, self.dim)
+        self.add_many(rows, [user_id] * len(rows))
+
+    def add_many(self, encodings, ids):
+        """Insert encodings, training the quantizer once the gallery is large enough"""
+        if len(ids) == 0:
+            return
+        if self.centroids is None:
+            self._pending.add_many(encodings, ids)
+            if self._ready_to_train(len(self._pending)):
+                self.train()
+            return
+
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(rows) != len(ids):
+            raise ValueError("encodings and ids must have the same length")
+        assign = self._quantizer.distances(rows).argmin(axis=1)
+        for bucket in np.unique(assign):
+            members = np.flatnonzero(assign == bucket)
+            self.lists[bucket].add_many(rows[members], [ids[i] for i in members])
+
+    def remove(self, user_ids):
+        """Drop every template of the given users from their buckets; returns the number removed"""
+        user_ids = set(user_ids)
+        if self.centroids is None:
+            return self._pending.remove(user_ids)
+        return sum(bucket.remove(user_ids) for bucket in self.lists)
+
+    def search(self, face_encodings, k=1):
+        """Approximate top-k matches, same return shape as FaceMatcher.search"""
+        if self.centroids is None:
+            return self._pending.search(face_encodings, k)
+
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dim)
+        nprobe = min(self.nprobe, len(self.lists))
+        probes = self._quantizer.search(queries, k=nprobe)[0]
+
+        # Per query: identity -> best distance over all probed buckets
+        candidates = [{} for _ in range(len(queries))]
+        # Group queries by bucket so each bucket is scanned with one matmul
+        by_bucket = {}
+        for qi, buckets in enumerate(probes):
+            for bucket in buckets:
+                by_bucket.setdefault(bucket, []).append(qi)
+        for bucket, members in by_bucket.items():
+            ids, dist = self.lists[bucket].search(queries[members], k)
+            for qi, row_ids, row_dist in zip(members, ids, dist):
+                best = candidates[qi]
+                for user_id, d in zip(row_ids, row_dist):
+                    if d < best.get(user_id, np.inf):
+                        best[user_id] = d
+
+        k_out = min(k, max((len(c) for c in candidates), default=0))
+        out_ids = []
+        out_dist = np.full((len(queries), k_out), np.inf, dtype=np.float32)
+        for qi, best in enumerate(candidates):
+            top = sorted(best.items(), key=lambda item: item[1])[:k_out]
+            out_ids.append([user_id for user_id, _ in top])
+            out_dist[qi, :len(top)] = [d for _, d in top]
+        return out_ids, out_dist
+
+    def best_match(self, face_encodings, tolerance=0.5):
+        """Best match per query face as (user_id, distance), None when out of tolerance"""
+        ids, dist = self.search(face_encodings, k=1)
+        return best_from_search(ids, dist, tolerance)
+
+
+INDEX_TYPES = {
+    'exact': FaceMatcher,
+    'ivf': IVFIndex,
+}
+
+
+def build_index(encodings, ids, kind='exact', **options):
+    """Create an index of the given kind and load the gallery into it"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    if kind == 'exact' and not options:
+        # Adopt the gallery matrix as-is so a memory-mapped store is not copied
+        return FaceMatcher.from_matrix(np.asarray(encodings, dtype=np.float32).reshape(-1, 128), ids)
+    index = INDEX_TYPES[kind](**options)
+    index.add_many(encodings, ids)
+    return index
+
+
+def measure_recall(index, exact, queries, k=1):
+    """
+    Compare an approximate index against exact search on the same queries
+    Returns recall@k and mean per-query latency (ms) of both indexes
+    """
+    start = time.perf_counter()
+    approx_ids, _ = index.search(queries, k)
+    approx_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    start = time.perf_counter()
+    exact_ids, _ = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx_ids, exact_ids))
+    total = sum(len(e) for e in exact_ids)
+    return {
+        'recall': hits / total if total else 1.0,
+        'approx_ms_per_query': approx_ms,
+        'exact_ms_per_query': exact_ms,
+    }
+
+
+def main():
+    """Report IVF recall and latency against exact search on a synthetic gallery"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="IVF index recall report")
+    parser.add_argument('--size', type=int, default=50000, help="number of synthetic identities")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--k', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery = rng.normal(size=(args.size, 128)).astype(np.float32)
+    ids = [f"user{i}" for i in range(args.size)]
+    picks = rng.choice(args.size, args.queries, replace=False)
+    queries = gallery[picks] + rng.normal(scale=0.05, size=(args.queries, 128)).astype(np.float32)
+
+    exact = build_index(gallery, ids, kind='exact')
+    ivf = build_index(gallery, ids, kind='ivf', nprobe=args.nprobe)
+    report = measure_recall(ivf, exact, queries, k=args.k)
+    print(f"Gallery: {args.size} | lists: {len(ivf.lists)} | nprobe: {args.nprobe}")
+    print(f"Recall@{args.k}: {report['recall']:.3f}")
+    print(f"IVF:   {report['approx_ms_per_query']:.3f} ms/query")
+    print(f"Exact: {report['exact_ms_per_query']:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
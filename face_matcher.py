@@ -0,0 +1,256 @@
+"""
+Vectorized Face Matcher
+Keeps the enrolled gallery in one contiguous float32 matrix and
+scores every face found in a frame with a single matrix product
+"""
+
+import numpy as np
+
+
+class FaceMatcher:
+    """
+    Gallery of face encodings stored as a preallocated (N, 128) float32 matrix
+    Squared norms are cached so a frame costs one batched matmul.
+    An identity may own several rows (templates); an int32 owner column
+    maps each row to its identity and results are reduced per identity
+    by minimum distance.
+    """
+
+    def __init__(self, dim=128, capacity=64):
+        self.dim = dim
+        self.identities = []
+        self._owner_of = {}
+        self._size = 0
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._owners = np.zeros(capacity, dtype=np.int32)
+        self._grouping = None
+        # False while _matrix is a caller's array adopted by from_matrix
+        self._owns_matrix = True
+
+    @classmethod
+    def from_encodings(cls, encodings, ids, dim=128):
+        """Build a matcher from parallel lists of encodings and user ids"""
+        matcher = cls(dim=dim, capacity=max(len(ids), 64))
+        matcher.add_many(encodings, ids)
+        return matcher
+
+    @classmethod
+    def from_matrix(cls, matrix, ids):
+        """
+        Wrap an existing (N, dim) float32 matrix (e.g. a read-only memmap)
+        without copying it; the first insert moves the gallery into an
+        owned, growable buffer
+        """
+        matrix = np.asarray(matrix)
+        if matrix.dtype != np.float32 or not matrix.flags.c_contiguous:
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        matcher = cls(dim=matrix.shape[1], capacity=0)
+        matcher._matrix = matrix
+        matcher._owns_matrix = False
+        matcher._sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        matcher._owners = np.array([matcher._owner_index(user_id) for user_id in ids], dtype=np.int32)
+        matcher._size = len(ids)
+        return matcher
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def matrix(self):
+        """View of the filled part of the gallery matrix"""
+        return self._matrix[:self._size]
+
+    @property
+    def owners(self):
+        """Identity index of every gallery row"""
+        return self._owners[:self._size]
+
+    @property
+    def ids(self):
+        """User id of every gallery row"""
+        return [self.identities[o] for o in self.owners]
+
+    def _reserve(self, needed):
+        capacity = len(self._matrix)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        owners = np.zeros(capacity, dtype=np.int32)
+        n = self._size
+        matrix[:n] = self._matrix[:n]
+        sq_norms[:n] = self._sq_norms[:n]
+        owners[:n] = self._owners[:n]
+        self._matrix, self._sq_norms, self._owners = matrix, sq_norms, owners
+        self._owns_matrix = True
+
+    def _owner_index(self, user_id):
+        if user_id not in self._owner_of:
+            self._owner_of[user_id] = len(self.identities)
+            self.identities.append(user_id)
+        return self._owner_of[user_id]
+
+    def add(self, user_id, encoding):
+        """Append one encoding (or a (k, 128) template set) for a user"""
+        rows = np.asarray(encoding, dtype=np.float32).reshape(-1, self.dim)
+        self.add_many(rows, [user_id] * len(rows))
+
+    def add_many(self, encodings, ids):
+        """Append several encodings to the gallery in one copy"""
+        if len(ids) == 0:
+            return
+        rows = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(rows) != len(ids):
+            raise ValueError("encodings and ids must have the same length")
+        start = self._size
+        end = start + len(rows)
+        self._reserve(end)
+        self._matrix[start:end] = rows
+        self._sq_norms[start:end] = np.einsum('ij,ij->i', rows, rows)
+        self._owners[start:end] = [self._owner_index(user_id) for user_id in ids]
+        self._size = end
+        self._grouping = None
+
+    def remove(self, user_ids):
+        """
+        Drop every template of the given users, compacting the gallery in
+        place; cached norms of the remaining rows are kept. Returns the
+        number of rows removed.
+        """
+        gone = {self._owner_of[user_id] for user_id in user_ids if user_id in self._owner_of}
+        if not gone:
+            return 0
+        n = self._size
+        keep = ~np.isin(self._owners[:n], list(gone))
+        kept = int(keep.sum())
+        if self._owns_matrix:
+            self._matrix[:kept] = self._matrix[:n][keep]
+        else:
+            # Never write into an adopted matrix (e.g. the store's memmap): the survivors move into a copy
+            self._matrix = self._matrix[:n][keep]
+            self._owns_matrix = True
+        self._sq_norms[:kept] = self._sq_norms[:n][keep]
+
+        # Renumber identities so owner indices stay contiguous and in first-seen order
+        survivors = [i for i in range(len(self.identities)) if i not in gone]
+        remap = np.full(len(self.identities), -1, dtype=np.int32)
+        remap[survivors] = np.arange(len(survivors), dtype=np.int32)
+        self._owners[:kept] = remap[self._owners[:n][keep]]
+        self.identities = [self.identities[i] for i in survivors]
+        self._owner_of = {user_id: i for i, user_id in enumerate(self.identities)}
+        self._size = kept
+        self._grouping = None
+        return n - kept
+
+    def distances(self, face_encodings):
+        """Euclidean distance from each query face (rows) to each gallery row (columns)"""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dim)
+        n = self._size
+        if n == 0 or len(queries) == 0:
+            return np.empty((len(queries), n), dtype=np.float32)
+
+        sq_dist = queries @ self._matrix[:n].T
+        sq_dist *= -2.0
+        sq_dist += self._sq_norms[:n]
+        sq_dist += np.einsum('ij,ij->i', queries, queries)[:, None]
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        return np.sqrt(sq_dist, out=sq_dist)
+
+    def identity_distances(self, face_encodings):
+        """
+        Distance from each query face to each identity, taking the
+        closest template. Columns follow self.identities.
+        """
+        dist = self.distances(face_encodings)
+        if len(self.identities) == self._size:
+            # One template per identity: owners are assigned in row order
+            return dist
+
+        if self._grouping is None:
+            order = np.argsort(self.owners, kind='stable')
+            starts = np.flatnonzero(np.r_[True, np.diff(self.owners[order]) != 0])
+            self._grouping = (order, starts)
+        order, starts = self._grouping
+        return np.minimum.reduceat(dist[:, order], starts, axis=1)
+
+    def search(self, face_encodings, k=1):
+        """
+        Top-k identities for every query face, nearest first
+        Returns (ids, distances): a list of id lists and a (Q, k) array
+        """
+        dist = self.identity_distances(face_encodings)
+        k = min(k, dist.shape[1])
+        if k == 0:
+            return [[] for _ in range(len(dist))], np.empty((len(dist), 0), dtype=np.float32)
+
+        if k < dist.shape[1]:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(k), dist.shape).copy()
+        top = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(top, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return [[self.identities[j] for j in row] for row in idx], top
+
+    def best_match(self, face_encodings, tolerance=0.5):
+        """
+        Best gallery match for every query face as (user_id, distance)
+        user_id is None when nothing lies within tolerance
+        """
+        ids, dist = self.search(face_encodings, k=1)
+        return best_from_search(ids, dist, tolerance)
+
+
+def best_from_search(ids, dist, tolerance):
+    """Reduce top-k search results to (user_id, distance) pairs within tolerance"""
+    results = []
+    for row_ids, row_dist in zip(ids, dist):
+        if row_ids and row_dist[0] <= tolerance:
+            results.append((row_ids[0], float(row_dist[0])))
+        else:
+            results.append((None, float(row_dist[0]) if row_ids else None))
+    return results
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Plain Lloyd's k-means; returns (centroids, assignment)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    labels = list(range(k))
+
+    for _ in range(iterations):
+        assign = FaceMatcher.from_encodings(centroids, labels, dim=vectors.shape[1]).distances(vectors).argmin(axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points
+        centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+
+    assign = FaceMatcher.from_encodings(centroids, labels, dim=vectors.shape[1]).distances(vectors).argmin(axis=1)
+    return centroids, assign
+
+
+def enrollment_templates(samples, templates='mean'):
+    """
+    Reduce registration samples to the encodings stored for a user
+    - 'mean': one averaged encoding (original behaviour)
+    - 'all':  every sample is kept as its own template
+    - int k:  k clustered representatives
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if templates == 'mean':
+        return samples.mean(axis=0, keepdims=True)
+    if templates == 'all':
+        return samples
+    if isinstance(templates, int) and templates > 0:
+        if templates >= len(samples):
+            return samples
+        return kmeans(samples, templates)[0]
+    raise ValueError(f"Unknown template mode: {templates!r}")
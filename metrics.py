@@ -0,0 +1,268 @@
+"""
+Stage Timing Metrics
+Histograms of per-stage latency (capture, preprocess, detect, encode,
+match, draw, persist) and of other per-frame values (faces per frame,
+time to punch), plus counters such as dropped frames.
+
+Exported as Prometheus text on http://host:port/metrics and/or as a JSON
+file rewritten every few seconds. When metrics are off the scanners use
+NULL_METRICS, whose timers and counters do nothing.
+
+Environment (used by metrics_from_env):
+    METRICS_PORT=9100        serve Prometheus text
+    METRICS_FILE=metrics.json    periodic JSON dump
+    METRICS_INTERVAL=10      seconds between dumps
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 0.1 ms .. 100 s, 20 buckets per decade (quantiles within ~6%)
+LATENCY_BUCKETS = tuple(round(10 ** (e / 20 - 4), 7) for e in range(121))
+COUNT_BUCKETS = tuple(float(n) for n in range(11))
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram
+    Quantiles are interpolated inside a bucket for continuous values; for
+    whole counts (COUNT_BUCKETS, the default when interpolate is None) a
+    bucket holds one value, so its upper bound is returned.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, interpolate=None):
+        self.buckets = buckets
+        self.interpolate = buckets is not COUNT_BUCKETS if interpolate is None else interpolate
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                if not self.interpolate:
+                    return upper
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.quantile(0.50), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+        }
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms, value histograms and counters"""
+
+    def __init__(self, prefix="attendance"):
+        self.prefix = prefix
+        self.stages = {}
+        self.values = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return True
+
+    def stage(self, name):
+        """Context manager timing one stage, in seconds"""
+        return _StageTimer(self, name)
+
+    def observe_stage(self, name, seconds):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe(self, name, value, buckets=COUNT_BUCKETS):
+        with self._lock:
+            histogram = self.values.get(name)
+            if histogram is None:
+                histogram = self.values[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # --- export ---
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'stages_seconds': {name: h.summary() for name, h in self.stages.items()},
+                'values': {name: h.summary() for name, h in self.values.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            metric = f"{self.prefix}_stage_seconds"
+            lines += [f"# HELP {metric} Time spent per pipeline stage", f"# TYPE {metric} histogram"]
+            for name, h in sorted(self.stages.items()):
+                lines += _histogram_lines(metric, f'stage="{name}"', h)
+            for name, h in sorted(self.values.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                lines += _histogram_lines(metric, "", h)
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """Write the current snapshot atomically"""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+
+def _histogram_lines(metric, labels, histogram):
+    sep = "," if labels else ""
+    lines, cumulative = [], 0
+    for bound, n in zip(histogram.buckets, histogram.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines += [f"{metric}_sum{suffix} {histogram.total}", f"{metric}_count{suffix} {histogram.count}"]
+    return lines
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    """Metrics switched off: same interface, nothing recorded"""
+
+    _timer = _NullTimer()
+
+    def __bool__(self):
+        return False
+
+    def stage(self, name):
+        return self._timer
+
+    def observe_stage(self, name, seconds):
+        pass
+
+    def observe(self, name, value, buckets=None):
+        pass
+
+    def inc(self, name, amount=1):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+_registry = None
+_servers = {}
+_dumpers = {}
+
+
+def registry():
+    """Process-wide Metrics shared by every system instance (e.g. across Streamlit reruns)"""
+    global _registry
+    if _registry is None:
+        _registry = Metrics()
+    return _registry
+
+
+def serve_http(metrics, port, host="127.0.0.1"):
+    """Serve metrics.to_prometheus() on /metrics from a daemon thread (once per port)"""
+    if port in _servers:
+        return _servers[port]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('/metrics', ''):
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    _servers[port] = server
+    return server
+
+
+def start_json_dump(metrics, path, interval=10.0):
+    """Rewrite `path` with a JSON snapshot every `interval` seconds (once per path)"""
+    path = str(path)
+    if path in _dumpers:
+        return _dumpers[path]
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            metrics.dump_json(path)
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    thread.start()
+    _dumpers[path] = thread
+    return thread
+
+
+def metrics_from_env(environ=os.environ):
+    """The shared registry with exporters started per METRICS_* variables, or NULL_METRICS"""
+    port, path = environ.get("METRICS_PORT"), environ.get("METRICS_FILE")
+    if not port and not path:
+        return NULL_METRICS
+    metrics = registry()
+    if port:
+        serve_http(metrics, int(port))
+    if path:
+        start_json_dump(metrics, path, float(environ.get("METRICS_INTERVAL", "10")))
+    return metrics
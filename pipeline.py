@@ -0,0 +1,153 @@
+"""
+Threaded Capture / Recognition Pipeline
+Decouples the camera from face recognition:
+
+    capture thread --> display buffer (latest frame) --> display stage (caller)
+                   \\-> recognition buffer (bounded) --> recognition workers --> latest result
+
+Buffers drop the oldest frame when full, so a slow recognizer never
+stalls capture and the preview keeps the camera frame rate.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class LatestFrameBuffer:
+    """Bounded ring buffer of frames with drop-oldest backpressure"""
+
+    def __init__(self, capacity=1):
+        self.capacity = capacity
+        self.dropped = 0
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._frames) >= self.capacity:
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest buffered frame, or None on timeout / close"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self._closed, timeout):
+                return None
+            return self._frames.popleft() if self._frames else None
+
+    def get_latest(self, timeout=None):
+        """Newest buffered frame, discarding older ones, or None on timeout / close"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self._closed, timeout):
+                return None
+            if not self._frames:
+                return None
+            item = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FramePipeline:
+    """
+    Runs capture and recognition on background threads
+    `recognize(frame)` is called on worker threads; its return value is
+    published as the latest result, tagged with the frame's sequence number.
+    """
+
+    def __init__(self, capture, recognize, workers=2, queue_size=2):
+        self.capture = capture
+        self.recognize = recognize
+        self.workers = workers
+        self.display_buffer = LatestFrameBuffer(capacity=1)
+        self.recognition_buffer = LatestFrameBuffer(capacity=queue_size)
+        self.frames_captured = 0
+        self.frames_recognized = 0
+        self.error = None
+
+        self._running = threading.Event()
+        self._threads = []
+        self._result_lock = threading.Lock()
+        self._result = None
+        self._result_seq = -1
+        self._polled_seq = -1
+
+    def start(self):
+        self._running.set()
+        self._threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        self._threads += [threading.Thread(target=self._recognition_loop, name=f"recognition-{i}", daemon=True)
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        self.display_buffer.close()
+        self.recognition_buffer.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    @property
+    def frames_dropped(self):
+        return self.recognition_buffer.dropped
+
+    def _capture_loop(self):
+        seq = 0
+        while self._running.is_set():
+            ret, frame = self.capture.read()
+            if not ret:
+                break
+            item = (seq, time.monotonic(), frame)
+            self.display_buffer.put(item)
+            self.recognition_buffer.put(item)
+            seq += 1
+            self.frames_captured = seq
+        # Camera closed or stopped: wake up everyone waiting on frames
+        self._running.clear()
+        self.display_buffer.close()
+        self.recognition_buffer.close()
+
+    def _recognition_loop(self):
+        while self._running.is_set():
+            item = self.recognition_buffer.get_latest(timeout=0.5)
+            if item is None:
+                continue
+            seq, captured_at, frame = item
+            try:
+                result = self.recognize(frame)
+            except Exception as e:
+                self.error = e
+                self._running.clear()
+                break
+            with self._result_lock:
+                self.frames_recognized += 1
+                # Workers can finish out of order; never publish an older frame's result
+                if seq > self._result_seq:
+                    self._result_seq, self._result = seq, result
+
+    def next_frame(self, timeout=1.0):
+        """Newest captured frame for display as (seq, captured_at, frame), or None"""
+        return self.display_buffer.get_latest(timeout=timeout)
+
+    def poll_result(self):
+        """(seq, result) if a newer recognition result is available since the last poll, else None"""
+        with self._result_lock:
+            if self._result_seq <= self._polled_seq:
+                return None
+            self._polled_seq = self._result_seq
+            return self._result_seq, self._result
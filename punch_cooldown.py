@@ -0,0 +1,80 @@
+"""
+Duplicate Punch Suppression
+Remembers the last punch time per (user_id, action) so a scanner loop
+that recognizes the same person again, or a second scan at the door, is
+dropped before anything is written. Each check is one dict lookup instead
+of a query over recent history.
+
+The index is rebuilt from the store on startup (only punches inside the
+cooldown window matter), and updated by every accepted punch.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from record_store import record_timestamp
+
+
+class PunchCooldown:
+    """Last punch per (user_id, action); punches within `window` seconds of it are duplicates"""
+
+    def __init__(self, window=60):
+        # 0 disables suppression
+        self.window = window
+        self.suppressed = 0
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._last)
+
+    def since(self, now=None):
+        """Oldest timestamp that can still block a punch"""
+        return (now or datetime.now()) - timedelta(seconds=self.window)
+
+    def rebuild(self, records):
+        """Replace the index with the latest punch of each (user_id, action) in records"""
+        last = {}
+        self._fold(last, records)
+        with self._lock:
+            self._last = last
+
+    def update(self, records):
+        """Fold in punches written elsewhere (e.g. by another process) since the last rebuild"""
+        with self._lock:
+            self._fold(self._last, records)
+
+    @staticmethod
+    def _fold(last, records):
+        for record in records:
+            key = (record['user_id'], record['action'])
+            when = datetime.fromisoformat(record_timestamp(record))
+            if key not in last or when > last[key]:
+                last[key] = when
+
+    def rebuild_from(self, query, now=None):
+        """Rebuild from query(start_date=..., since=...) over the cooldown window"""
+        cutoff = self.since(now)
+        self.rebuild(query(start_date=cutoff.strftime('%Y-%m-%d'), since=cutoff.isoformat()))
+
+    def remaining(self, user_id, action, when=None):
+        """Seconds until this punch would be accepted; 0.0 when it is accepted now"""
+        last = self._last.get((user_id, action))
+        if last is None or not self.window:
+            return 0.0
+        # Backfilled punches can be older than the last one, so compare both ways
+        gap = abs(((when or datetime.now()) - last).total_seconds())
+        return max(self.window - gap, 0.0)
+
+    def claim(self, user_id, action, when=None):
+        """Record the punch and return True, or return False if it is a duplicate"""
+        when = when or datetime.now()
+        key = (user_id, action)
+        with self._lock:
+            if self.remaining(user_id, action, when) > 0:
+                self.suppressed += 1
+                return False
+            last = self._last.get(key)
+            if last is None or when > last:
+                self._last[key] = when
+            return True
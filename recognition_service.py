@@ -0,0 +1,348 @@
+"""
+Local Recognition Service
+Holds the dlib models and the gallery in one process and answers
+recognition requests from any number of local clients (kiosks, Streamlit
+sessions, scripts) over HTTP on localhost.
+
+Requests that arrive together are micro-batched: a batch closes when it
+holds `max_batch` requests or `max_wait` seconds after its first request,
+and is then matched against the gallery with a single search. Encoding
+gains from batching only with --encoder-workers, where every face of the
+batch is in flight on the pool at once; in-process, dlib encodes one face
+per descriptor call either way. Detection runs in each request's own
+handler thread.
+
+Endpoints:
+    POST /recognize?kind=frame|face&tolerance=0.5   body: JPEG/PNG image
+         -> {"faces": [{"box": [t, r, b, l], "user_id", "name", "distance"}]}
+    GET  /stats      queue depth, batch sizes, stage timings (JSON)
+    GET  /metrics    the same as Prometheus text
+
+kind=face means the image is already a face crop, so detection is skipped.
+
+Usage:
+    python recognition_service.py serve --port 8765 --encoder-workers 4
+    python recognition_service.py simulate --clients 8 --requests 50 --video entrance.mp4
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import cv2
+import numpy as np
+
+from face_matcher import best_from_search
+from metrics import Metrics
+
+BATCH_BUCKETS = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+QUEUE_BUCKETS = (0.0, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0)
+
+
+class MicroBatcher:
+    """
+    Collects submitted items into batches for process(items) -> results,
+    run on one worker thread; submit() returns a Future per item.
+    """
+
+    def __init__(self, process, max_batch=16, max_wait=0.01, metrics=None):
+        self.process = process
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = metrics or Metrics()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, item):
+        future = Future()
+        self.metrics.observe('queue_depth', self._queue.qsize(), QUEUE_BUCKETS)
+        self._queue.put((time.perf_counter(), item, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for queued_at, _, _ in batch:
+                self.metrics.observe_stage('queue_wait', started - queued_at)
+            self.metrics.observe('batch_size', len(batch), BATCH_BUCKETS)
+            try:
+                results = self.process([item for _, item, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class RecognitionService:
+    """Detect per request, encode and match per micro-batch, against one system's gallery"""
+
+    def __init__(self, system, max_batch=16, max_wait=0.01, metrics=None):
+        self.system = system
+        self.metrics = metrics or Metrics()
+        self.batcher = MicroBatcher(self._process, max_batch, max_wait, self.metrics)
+
+    def recognize(self, rgb, kind='frame', tolerance=0.5):
+        """[(box, user_id, distance)] for an RGB frame (or a single face crop with kind='face')"""
+        if kind == 'face':
+            locations = [(0, rgb.shape[1], rgb.shape[0], 0)]
+        else:
+            with self.metrics.stage('detect'):
+                locations = self.system.detector(rgb)
+        if not locations:
+            return []
+        matches = self.batcher.submit((rgb, locations, tolerance)).result()
+        return [(location, user_id, distance) for location, (user_id, distance) in zip(locations, matches)]
+
+    def _encode(self, jobs):
+        if self.system.encoder:
+            return self.system.encoder.encode_many(jobs)
+        # face_encodings computes one descriptor per face even for several locations,
+        # so merging the requests' images into one call would save nothing
+        return [self.system._encode_faces(rgb, locations) for rgb, locations in jobs]
+
+    def _process(self, requests):
+        with self.metrics.stage('encode'):
+            per_request = self._encode([(rgb, locations) for rgb, locations, _ in requests])
+        with self.metrics.stage('match'):
+            # One gallery search for every face in the batch
+            ids, dist = self.system.matcher.search([e for encodings in per_request for e in encodings], k=1)
+        results, offset = [], 0
+        for encodings, (_, _, tolerance) in zip(per_request, requests):
+            end = offset + len(encodings)
+            results.append(best_from_search(ids[offset:end], dist[offset:end], tolerance))
+            offset = end
+        self.metrics.inc('requests', len(requests))
+        self.metrics.inc('faces', offset)
+        return results
+
+    def stats(self):
+        stats = self.metrics.to_dict()
+        stats['queue_depth_now'] = self.batcher.depth
+        return stats
+
+
+def decode_image(body):
+    """RGB array from JPEG/PNG bytes"""
+    image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("body is not a decodable image")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    """ThreadingHTTPServer exposing the service; call serve_forever() on it"""
+    users = service.system.users
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body, content_type="application/json"):
+            data = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip('/')
+            if path == '/stats':
+                self._reply(200, json.dumps(service.stats()))
+            elif path == '/metrics':
+                self._reply(200, service.metrics.to_prometheus(), "text/plain; version=0.0.4")
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip('/') != '/recognize':
+                self.send_error(404)
+                return
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                rgb = decode_image(body)
+                faces = service.recognize(rgb, params.get('kind', 'frame'), float(params.get('tolerance', 0.5)))
+            except ValueError as e:
+                self._reply(400, json.dumps({'error': str(e)}))
+                return
+            except Exception as e:
+                # e.g. an encoder worker died: the client gets an answer instead of a dropped connection
+                service.metrics.inc('errors')
+                self._reply(500, json.dumps({'error': f"{type(e).__name__}: {e}"}))
+                return
+            self._reply(200, json.dumps({'faces': [
+                {'box': [int(v) for v in box], 'user_id': user_id,
+                 'name': users[user_id]['name'] if user_id in users else None, 'distance': distance}
+                for box, user_id, distance in faces]}))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+class RecognitionClient:
+    """Client for a running service; frames are sent JPEG-encoded"""
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=10.0, quality=90):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.quality = quality
+
+    def recognize(self, bgr, kind='frame', tolerance=0.5):
+        """Faces in a BGR image as [(box, user_id, distance)], boxes in that image's coordinates"""
+        ok, encoded = cv2.imencode('.jpg', bgr, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("could not encode image")
+        request = urllib.request.Request(f"{self.url}/recognize?{urlencode({'kind': kind, 'tolerance': tolerance})}",
+                                         data=encoded.tobytes(), headers={'Content-Type': 'image/jpeg'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            faces = json.load(response)['faces']
+        return [(tuple(face['box']), face['user_id'], face['distance']) for face in faces]
+
+    def recognize_frame(self, frame, tolerance=0.5, scale=0.25):
+        """Drop-in for FaceAttendanceSystem._recognize_frame: downscale, send, map boxes back"""
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        return [(tuple(int(v / scale) for v in box), user_id, distance)
+                for box, user_id, distance in self.recognize(small, tolerance=tolerance)]
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=self.timeout) as response:
+            return json.load(response)
+
+
+def simulate(url, frames, clients=4, requests=50, kind='frame', interval=0.0):
+    """
+    Run `clients` threads each sending `requests` frames (cycled) and return
+    client-side latency percentiles plus the service's own stats
+    """
+    client = RecognitionClient(url)
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def run(offset):
+        for i in range(requests):
+            frame = frames[(offset + i) % len(frames)]
+            start = time.perf_counter()
+            try:
+                client.recognize(frame, kind)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            if interval:
+                time.sleep(interval)
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    samples = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    server = client.stats()
+    return {
+        'clients': clients, 'requests': len(latencies), 'errors': len(errors),
+        'wall_seconds': elapsed, 'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': {'p50': float(np.percentile(samples, 50)), 'p95': float(np.percentile(samples, 95)),
+                       'p99': float(np.percentile(samples, 99))},
+        'batch_size': server['values'].get('batch_size'),
+        'queue_depth': server['values'].get('queue_depth'),
+    }
+
+
+def load_frames(video=None, count=30, scale=0.25):
+    """BGR frames at scanner resolution from a recording, or synthetic noise"""
+    if video:
+        frames = []
+        capture = cv2.VideoCapture(str(video))
+        while len(frames) < count:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, (0, 0), fx=scale, fy=scale))
+        capture.release()
+        return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, size=(120, 160, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared recognition service with request micro-batching")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="load the gallery and answer requests")
+    serve.add_argument('--host', default="127.0.0.1")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--data-dir', default="data")
+    serve.add_argument('--backend', default="files", choices=["files", "sqlite"])
+    serve.add_argument('--index', default="exact", choices=["exact", "ivf"])
+    serve.add_argument('--detector', default="hog", choices=["hog", "haar", "yunet", "ssd"])
+    serve.add_argument('--encoder-workers', type=int, default=0)
+    serve.add_argument('--max-batch', type=int, default=16)
+    serve.add_argument('--max-wait-ms', type=float, default=10, help="longest a request waits for its batch to fill")
+
+    sim = commands.add_parser('simulate', help="load-test a running service with concurrent clients")
+    sim.add_argument('--url', default="http://127.0.0.1:8765")
+    sim.add_argument('--clients', type=int, default=4)
+    sim.add_argument('--requests', type=int, default=50, help="requests per client")
+    sim.add_argument('--video', help="frames to send (default: synthetic)")
+    sim.add_argument('--kind', default="frame", choices=["frame", "face"])
+    sim.add_argument('--interval', type=float, default=0.0, help="seconds between a client's requests")
+    args = parser.parse_args()
+
+    if args.command == 'simulate':
+        print(json.dumps(simulate(args.url, load_frames(args.video), args.clients, args.requests,
+                                  args.kind, args.interval), indent=2))
+        return
+
+    from attendance_system import FaceAttendanceSystem
+
+    system = FaceAttendanceSystem(data_dir=args.data_dir, index=args.index, backend=args.backend,
+                                  encoder_workers=args.encoder_workers, detector=args.detector)
+    service = RecognitionService(system, args.max_batch, args.max_wait_ms / 1000)
+    server = make_server(service, args.host, args.port)
+    print(f"Recognition service on http://{args.host}:{args.port} "
+          f"({len(system.users)} users, batches of up to {args.max_batch})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        system.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Columnar Attendance Records
+Keeps punches in typed NumPy columns instead of one dict per record:
+
+- time        datetime64[us]   (date and time are derived from it)
+- user, name  int32 codes into interned user_ids / names
+- action      int8 code into interned actions
+- confidence  float64, NaN when absent
+
+Columns grow geometrically, so appends are amortized O(1). Fields the
+columns cannot reproduce (extra keys, UTC offsets, missing fields) are
+kept per record in a sparse dict, so records come back equal to the ones
+stored. Dicts are built only when records leave the store (indexing,
+iteration, query).
+
+Two indexes are maintained as records are appended, in any time order:
+- all offsets sorted by time, for date ranges
+- per user_id, that user's offsets sorted by time
+so day, range and per-user queries cost O(log n + result size). With
+the indexes, about 41 bytes per record instead of a dict with seven
+strings.
+"""
+
+from datetime import date as date_type, datetime, timedelta
+
+import numpy as np
+
+# Fields rebuilt from the columns; anything else is kept per record in `extra`
+COLUMN_FIELDS = ('user_id', 'name', 'action', 'timestamp', 'confidence', 'date', 'time')
+# Key in `extra` listing the rebuilt fields the original record did not have
+ABSENT = '_absent'
+DAY = np.timedelta64(1, 'D')
+
+
+def record_timestamp(record):
+    """ISO timestamp of a record, rebuilt from date and time for records written without one"""
+    return record.get('timestamp') or f"{record['date']}T{record.get('time', '')}"
+
+
+class CalendarQueries:
+    """week() and month() for any class with query(start_date=..., end_date=..., **filters)"""
+
+    def week(self, day, **filters):
+        """Records of the Monday-Sunday week containing day (YYYY-MM-DD)"""
+        start = datetime.strptime(day, '%Y-%m-%d').date() if isinstance(day, str) else day
+        start -= timedelta(days=start.weekday())
+        end = start + timedelta(days=6)
+        return self.query(start_date=start.isoformat(), end_date=end.isoformat(), **filters)
+
+    def month(self, month, **filters):
+        """Records of a calendar month given as YYYY-MM"""
+        year, mon = map(int, month.split('-'))
+        start = date_type(year, mon, 1)
+        end = date_type(year + mon // 12, mon % 12 + 1, 1) - timedelta(days=1)
+        return self.query(start_date=start.isoformat(), end_date=end.isoformat(), **filters)
+
+
+class _Vocabulary:
+    """Interned strings <-> int codes"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _TimeOrder:
+    """Offsets into a time column, kept sorted by time (ties in insertion order)"""
+
+    def __init__(self, capacity=16):
+        self.offsets = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, offsets, time):
+        """Insert new offsets (ascending) given the store's time column"""
+        times = time[offsets]
+        order = np.argsort(times, kind='stable')
+        offsets, times = offsets[order], times[order]
+        size = self.size
+        if size and times[0] < time[self.offsets[size - 1]]:
+            # Out of order (a backfill, a clock step): merge, O(size) but rare
+            current = self.offsets[:size]
+            positions = np.searchsorted(time[current], times, side='right')
+            merged = np.insert(current, positions, offsets)
+        else:
+            merged = None
+        needed = size + len(offsets)
+        if needed > len(self.offsets):
+            grown = np.empty(max(needed, 2 * len(self.offsets)), dtype=np.int64)
+            grown[:size] = self.offsets[:size]
+            self.offsets = grown
+        if merged is None:
+            self.offsets[size:needed] = offsets
+        else:
+            self.offsets[:needed] = merged
+        self.size = needed
+
+    def _bisect(self, time, value):
+        """Position of the first offset whose time is >= value"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if time[self.offsets[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def between(self, time, low=None, high=None):
+        """Offsets with low <= time < high (either bound optional), in time order"""
+        lo = 0 if low is None else self._bisect(time, low)
+        hi = self.size if high is None else self._bisect(time, high)
+        return self.offsets[lo:max(lo, hi)]
+
+
+class RecordStore(CalendarQueries):
+    """List-like, append-only attendance records in typed columns"""
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self.time = np.empty(capacity, dtype='datetime64[us]')
+        self.user = np.empty(capacity, dtype=np.int32)
+        self.name = np.empty(capacity, dtype=np.int32)
+        self.action = np.empty(capacity, dtype=np.int8)
+        self.confidence = np.empty(capacity, dtype=np.float64)
+        self.user_ids = _Vocabulary()
+        self.names = _Vocabulary()
+        self.actions = _Vocabulary()
+        # offset -> fields the columns cannot rebuild (rare)
+        self.extra = {}
+        self.by_time = _TimeOrder()
+        # user code -> that user's offsets by time
+        self.by_user = {}
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from any iterable of record dicts without holding them all"""
+        store = cls()
+        store.extend(records)
+        return store
+
+    # --- list interface ---
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._materialize(np.arange(self._size)[index])
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("record index out of range")
+        return self._materialize(np.array([index]))[0]
+
+    def __iter__(self):
+        for start in range(0, self._size, 4096):
+            yield from self._materialize(np.arange(start, min(start + 4096, self._size)))
+
+    def _grow(self, needed):
+        capacity = len(self.time)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for column in ('time', 'user', 'name', 'action', 'confidence'):
+            old = getattr(self, column)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, column, new)
+
+    def append(self, record):
+        self._append_chunk([record])
+
+    def extend(self, records):
+        """Append records, converting them to columns a chunk at a time"""
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == 4096:
+                self._append_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._append_chunk(chunk)
+
+    def _append_chunk(self, records):
+        start, n = self._size, len(records)
+        self._grow(start + n)
+        user_code, name_code, action_code = self.user_ids.code, self.names.code, self.actions.code
+        stamps, users, names, actions, confidences = [], [], [], [], []
+        for offset, record in enumerate(records, start):
+            stamp = record_timestamp(record)
+            if len(stamp) in (19, 26) and stamp[10] == 'T':
+                column_stamp = stamp
+            else:
+                # e.g. a UTC offset: the column keeps the clock time, `extra` the original
+                column_stamp = datetime.fromisoformat(stamp).replace(tzinfo=None).isoformat()
+            stamps.append(column_stamp)
+            users.append(user_code(record['user_id']))
+            names.append(name_code(record.get('name', record['user_id'])))
+            actions.append(action_code(record['action']))
+            confidence = record.get('confidence')
+            confidences.append(np.nan if confidence is None else confidence)
+            if (len(record) != len(COLUMN_FIELDS) or confidence is None or column_stamp is not stamp
+                    or stamp.endswith('.000000')
+                    or record.get('date') != stamp[:10] or record.get('time') != stamp[11:19]):
+                extra = self._extra_fields(record, stamp, column_stamp)
+                if extra:
+                    self.extra[offset] = extra
+
+        self.time[start:start + n] = np.array(stamps, dtype='datetime64[us]')
+        self.user[start:start + n] = users
+        self.name[start:start + n] = names
+        self.action[start:start + n] = actions
+        self.confidence[start:start + n] = confidences
+        self._size = start + n
+        self._index(start, start + n)
+
+    def _index(self, start, end):
+        """Add offsets start..end to the time and per-user indexes"""
+        if end <= start:
+            return
+        offsets = np.arange(start, end)
+        self.by_time.add(offsets, self.time)
+        users = self.user[start:end]
+        order = np.argsort(users, kind='stable')
+        codes, first = np.unique(users[order], return_index=True)
+        for code, members in zip(codes.tolist(), np.split(offsets[order], first[1:])):
+            index = self.by_user.get(code)
+            if index is None:
+                index = self.by_user[code] = _TimeOrder(capacity=4)
+            index.add(members, self.time)
+
+    @staticmethod
+    def _extra_fields(record, stamp, column_stamp):
+        """Fields of a record that the columns would not reproduce exactly"""
+        extra = {key: value for key, value in record.items() if key not in COLUMN_FIELDS}
+        rebuilt = column_stamp[:19] if column_stamp.endswith('.000000') else column_stamp
+        if 'timestamp' in record and stamp != rebuilt:
+            extra['timestamp'] = stamp
+        if record.get('date', rebuilt[:10]) != rebuilt[:10]:
+            extra['date'] = record['date']
+        if record.get('time', rebuilt[11:19]) != rebuilt[11:19]:
+            extra['time'] = record['time']
+        if record.get('confidence', 0) is None:
+            extra['confidence'] = None
+        absent = tuple(field for field in ('name', 'timestamp', 'date', 'time') if field not in record)
+        if absent:
+            extra[ABSENT] = absent
+        return extra
+
+    def _materialize(self, offsets):
+        """Record dicts for the given offsets, in that order"""
+        times = self.time[offsets]
+        # datetime.isoformat() leaves out zero microseconds
+        whole = times.astype(np.int64) % 1000000 == 0
+        stamps = np.datetime_as_string(times, unit='us').tolist()
+        users, names = self.user_ids.values, self.names.values
+        actions = self.actions.values
+        records = []
+        for offset, stamp, whole_second, user, name, action, confidence in zip(
+                offsets.tolist(), stamps, whole.tolist(), self.user[offsets].tolist(),
+                self.name[offsets].tolist(), self.action[offsets].tolist(), self.confidence[offsets].tolist()):
+            record = {'user_id': users[user], 'name': names[name], 'action': actions[action],
+                      'timestamp': stamp[:19] if whole_second else stamp}
+            if confidence == confidence:
+                record['confidence'] = confidence
+            record['date'] = stamp[:10]
+            record['time'] = stamp[11:19]
+            extra = self.extra.get(offset)
+            if extra:
+                record.update(extra)
+                for field in record.pop(ABSENT, ()):
+                    del record[field]
+            records.append(record)
+        return records
+
+    # --- queries ---
+
+    def select(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """Offsets of matching records in insertion order, as an int array"""
+        if date is not None:
+            start_date = end_date = date
+        low = np.datetime64(start_date, 'D').astype('datetime64[us]') if start_date else None
+        high = (np.datetime64(end_date, 'D') + DAY).astype('datetime64[us]') if end_date else None
+        if since is not None:
+            since = np.datetime64(since, 'us')
+            low = since if low is None else max(low, since)
+
+        if user_id is not None:
+            code = self.user_ids.codes.get(user_id)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            offsets = self.by_user[code].between(self.time, low, high)
+        elif low is not None or high is not None:
+            offsets = self.by_time.between(self.time, low, high)
+        else:
+            offsets = np.arange(self._size)
+        if action is not None:
+            code = self.actions.codes.get(action)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            offsets = offsets[self.action[offsets] == code]
+        return np.sort(offsets)
+
+    def query(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """Matching records as dicts, in insertion order"""
+        return self._materialize(self.select(date, start_date, end_date, user_id, action, since))
+
+    def subset(self, **filters):
+        """Matching records as a new RecordStore (columns copied, vocabularies shared)"""
+        offsets = self.select(**filters)
+        store = RecordStore(capacity=max(len(offsets), 1))
+        for column in ('time', 'user', 'name', 'action', 'confidence'):
+            getattr(store, column)[:len(offsets)] = getattr(self, column)[offsets]
+        store._size = len(offsets)
+        store.user_ids, store.names, store.actions = self.user_ids, self.names, self.actions
+        store.extra = {new: self.extra[old] for new, old in enumerate(offsets.tolist()) if old in self.extra}
+        store._index(0, len(offsets))
+        return store
+
+    def nbytes(self):
+        """Bytes held by the columns and indexes (allocated capacity)"""
+        columns = sum(getattr(self, c).nbytes for c in ('time', 'user', 'name', 'action', 'confidence'))
+        return columns + self.by_time.offsets.nbytes + sum(i.offsets.nbytes for i in self.by_user.values())
@@ -0,0 +1,209 @@
+"""
+Report Export
+Streams attendance records from the store (journal segments or the SQLite
+cursor) into CSV or a compressed columnar NumPy archive, a chunk at a
+time, so exporting years of history needs memory for one chunk only.
+
+CSV: one header plus the RECORD_FIELDS columns, produced as text chunks
+(for HTTP responses or download buttons) or written to a file.
+
+Archive (.npz, deflate-compressed): the columns of every chunk are stored
+as separate members
+
+    timestamp/00000   datetime64[us]
+    user/00000        int32 code into user_ids
+    action/00000      int8 code into actions
+    confidence/00000  float32 (NaN when missing)
+
+plus the user_ids, names and actions vocabularies written at the end.
+load_archive() returns whole columns, ready for pandas or NumPy analytics.
+
+export_path() names export files after their filters plus a unique
+suffix, so concurrent exports never overwrite each other, and
+prune_exports() removes the ones older than EXPORT_TTL.
+
+Usage:
+    python report_export.py --start 2024-01-01 --end 2026-12-31 --csv attendance.csv
+    python report_export.py --user E042 --npz attendance.npz
+"""
+
+import argparse
+import csv
+import io
+import time
+import uuid
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from record_store import record_timestamp
+from sqlite_store import RECORD_FIELDS
+
+CHUNK_ROWS = 10000
+# Seconds an export file is kept for downloading
+EXPORT_TTL = 3600
+
+
+def chunked(records, size=CHUNK_ROWS):
+    """Lists of up to `size` records from any iterable"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(records, fields=RECORD_FIELDS, chunk_rows=CHUNK_ROWS):
+    """CSV text in chunks of `chunk_rows` records, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for chunk in chunked(records, chunk_rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_csv(records, path, fields=RECORD_FIELDS, chunk_rows=CHUNK_ROWS):
+    """Write records to a CSV file; returns the number of records written"""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    with open(path, 'w', newline='') as f:
+        for text in iter_csv(counted(), fields, chunk_rows):
+            f.write(text)
+    return count
+
+
+def _write_member(archive, name, array):
+    with archive.open(f"{name}.npy", 'w', force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asarray(array), allow_pickle=False)
+
+
+def write_archive(records, path, chunk_rows=CHUNK_ROWS):
+    """Write records to a compressed columnar .npz; returns the number of records written"""
+    user_codes, names, action_codes = {}, {}, {}
+    count = 0
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for n, chunk in enumerate(chunked(records, chunk_rows)):
+            suffix = f"{n:05d}"
+            _write_member(archive, f"timestamp/{suffix}",
+                          np.array([record_timestamp(r) for r in chunk], dtype='datetime64[us]'))
+            _write_member(archive, f"user/{suffix}",
+                          np.array([user_codes.setdefault(r['user_id'], len(user_codes)) for r in chunk],
+                                   dtype=np.int32))
+            _write_member(archive, f"action/{suffix}",
+                          np.array([action_codes.setdefault(r['action'], len(action_codes)) for r in chunk],
+                                   dtype=np.int8))
+            _write_member(archive, f"confidence/{suffix}",
+                          np.array([r.get('confidence', np.nan) for r in chunk], dtype=np.float32))
+            for r in chunk:
+                names[r['user_id']] = r.get('name', r['user_id'])
+            count += len(chunk)
+        _write_member(archive, "user_ids", np.array(list(user_codes), dtype=str))
+        _write_member(archive, "names", np.array([names[u] for u in user_codes], dtype=str))
+        _write_member(archive, "actions", np.array(list(action_codes), dtype=str))
+    return count
+
+
+def load_archive(path, decode=True):
+    """
+    {'timestamp', 'user_id', 'name', 'action', 'confidence'} arrays from an
+    archive; decode=False keeps 'user' and 'action' as integer codes and adds
+    the 'user_ids' / 'names' / 'actions' vocabularies instead
+    """
+    with np.load(path) as archive:
+        def column(name, dtype):
+            keys = sorted(key for key in archive.files if key.startswith(f"{name}/"))
+            return np.concatenate([archive[key] for key in keys]) if keys else np.empty(0, dtype=dtype)
+
+        columns = {
+            'timestamp': column('timestamp', 'datetime64[us]'),
+            'user': column('user', np.int32),
+            'action': column('action', np.int8),
+            'confidence': column('confidence', np.float32),
+        }
+        user_ids, names, actions = archive['user_ids'], archive['names'], archive['actions']
+    if not decode:
+        return dict(columns, user_ids=user_ids, names=names, actions=actions)
+    return {
+        'timestamp': columns['timestamp'],
+        'user_id': user_ids[columns['user']],
+        'name': names[columns['user']],
+        'action': actions[columns['action']],
+        'confidence': columns['confidence'],
+    }
+
+
+def export_path(directory, suffix, start_date=None, end_date=None, user_id=None):
+    """Unique path like attendance_2026-09-01_2026-09-30_E042_20261001-120000_1a2b3c4d.csv"""
+    parts = ['attendance', start_date or 'start', end_date or 'end']
+    if user_id:
+        parts.append("".join(c if c.isalnum() or c in '-_' else '_' for c in user_id))
+    parts += [time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8]]
+    return Path(directory) / f"{'_'.join(parts)}.{suffix}"
+
+
+def prune_exports(directory, max_age=EXPORT_TTL):
+    """Delete export files older than max_age seconds; returns how many were removed"""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(directory).glob('attendance_*'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Pruned by another session at the same time
+            pass
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export attendance records as CSV or a columnar archive")
+    parser.add_argument('--start', help="YYYY-MM-DD (default: beginning of history)")
+    parser.add_argument('--end', help="YYYY-MM-DD (default: end of history)")
+    parser.add_argument('--user', help="only this user_id")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--backend', default="files", choices=["files", "sqlite"])
+    parser.add_argument('--csv', help="CSV output path")
+    parser.add_argument('--npz', help="compressed columnar archive output path")
+    args = parser.parse_args()
+    if not args.csv and not args.npz:
+        parser.error("give --csv and/or --npz")
+
+    # Read the store directly: the full system would load the gallery and, for files, all history
+    if args.backend == 'sqlite':
+        from sqlite_store import SQLiteBackend
+        store = SQLiteBackend.open(args.data_dir)
+        journal = store.attendance
+    else:
+        from attendance_journal import AttendanceJournal
+        store = journal = AttendanceJournal(args.data_dir)
+
+    def records():
+        return journal.iter_query(start_date=args.start, end_date=args.end, user_id=args.user)
+
+    try:
+        if args.csv:
+            print(f"✓ {write_csv(records(), args.csv)} record(s) written to {args.csv}")
+        if args.npz:
+            print(f"✓ {write_archive(records(), args.npz)} record(s) written to {args.npz}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
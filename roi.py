@@ -0,0 +1,102 @@
+"""
+Detection Region
+Chooses where and at what scale to run face detection on each frame.
+
+- Without a recent face the search covers the kiosk zone (or the whole
+  frame) at the default 1/4 scale
+- Once a face is found, the next frames search only its box plus a margin,
+  scaled so the face comes out around `target_face` pixels high: far
+  less HOG work for a close face, and a far-away face is upscaled instead
+  of shrinking below the detector's minimum size
+- Every `full_scan_every` frames the whole zone is searched again so a
+  second person stepping in is not missed
+"""
+
+import threading
+
+import cv2
+
+
+def parse_zone(text):
+    """'left,top,right,bottom' as fractions of the frame, e.g. '0.25,0.1,0.75,0.9'"""
+    zone = tuple(float(v) for v in text.split(','))
+    if len(zone) != 4 or not (0 <= zone[0] < zone[2] <= 1 and 0 <= zone[1] < zone[3] <= 1):
+        raise ValueError(f"Invalid zone '{text}', expected left,top,right,bottom fractions")
+    return zone
+
+
+class DetectionRegion:
+    """Per-camera search window and downscale factor, updated from the last detections"""
+
+    def __init__(self, zone=None, margin=0.6, target_face=64, default_scale=0.25,
+                 min_scale=0.2, max_scale=1.0, lost_after=3, full_scan_every=10):
+        self.zone = zone
+        self.margin = margin
+        self.target_face = target_face
+        self.default_scale = default_scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.lost_after = lost_after
+        self.full_scan_every = full_scan_every
+        self.last_box = None
+        self.missed = 0
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.last_box = None
+            self.missed = 0
+
+    def _zone_box(self, height, width):
+        if self.zone is None:
+            return 0, width, height, 0
+        left, top, right, bottom = self.zone
+        return int(top * height), int(right * width), int(bottom * height), int(left * width)
+
+    def plan(self, frame_shape):
+        """(top, right, bottom, left) search window in frame pixels and the scale to detect at"""
+        height, width = frame_shape[:2]
+        z_top, z_right, z_bottom, z_left = self._zone_box(height, width)
+        with self._lock:
+            box = self.last_box
+            self.frames += 1
+            full_scan = self.full_scan_every and self.frames % self.full_scan_every == 0
+        if box is None or full_scan:
+            return (z_top, z_right, z_bottom, z_left), self.default_scale
+
+        top, right, bottom, left = box
+        face = max(bottom - top, right - left, 1)
+        pad = int(face * self.margin)
+        window = (max(top - pad, z_top), min(right + pad, z_right),
+                  min(bottom + pad, z_bottom), max(left - pad, z_left))
+        if window[2] <= window[0] or window[1] <= window[3]:
+            return (z_top, z_right, z_bottom, z_left), self.default_scale
+        scale = min(max(self.target_face / face, self.min_scale), self.max_scale)
+        return window, scale
+
+    def crop(self, frame):
+        """
+        RGB detection image for a BGR frame, plus a function mapping boxes
+        found in it back to frame coordinates
+        """
+        (top, right, bottom, left), scale = self.plan(frame.shape)
+        roi = frame[top:bottom, left:right]
+        small = cv2.resize(roi, (0, 0), fx=scale, fy=scale) if scale != 1 else roi
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+        def to_frame(box):
+            t, r, b, l = box
+            return (int(t / scale) + top, int(r / scale) + left, int(b / scale) + top, int(l / scale) + left)
+        return rgb, to_frame
+
+    def update(self, boxes):
+        """Record this frame's detections (frame coordinates); the largest face is followed"""
+        with self._lock:
+            if boxes:
+                self.last_box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+                self.missed = 0
+            else:
+                self.missed += 1
+                if self.missed >= self.lost_after:
+                    self.last_box = None
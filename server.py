@@ -0,0 +1,284 @@
+"""
+Multi-Camera Attendance Server
+Headless mode that watches many entrances from one process. All sources
+share one FaceAttendanceSystem (one gallery in memory) and one pool of
+recognition workers that round-robins over the newest frame of each
+camera. Confirmed identities are written to the attendance store.
+
+Usage:
+    python server.py --punch-in 0 --punch-out rtsp://door2/stream
+    python server.py --punch-in entrance.mp4 --workers 4 --encoder-workers 4
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import cv2
+
+from attendance_system import FaceAttendanceSystem
+from metrics import registry, serve_http, start_json_dump
+from pipeline import LatestFrameBuffer
+from roi import DetectionRegion, parse_zone
+from verifier import ACCEPTED, EMPTY_FRAMES_TO_RESET, PENDING, DecisionStats, make_verifier
+
+
+def parse_source(source):
+    """Device indices are given as digits; anything else is a file path or URL"""
+    return int(source) if str(source).isdigit() else source
+
+
+class CameraSource:
+    """One entrance: a capture thread keeping only the newest frame"""
+
+    def __init__(self, source, action, verifier=None, region=None):
+        self.source = parse_source(source)
+        self.action = action
+        self.capture = cv2.VideoCapture(self.source)
+        self.buffer = LatestFrameBuffer(capacity=1)
+        # Local files are paced to their own FPS so they behave like a live stream
+        self.is_file = isinstance(self.source, str) and "://" not in self.source
+        self.finished = False
+        self.busy = False
+
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.punches = 0
+        self.errors = 0
+        self.last_seq = -1
+
+        # Per-door confirmation, as in the interactive scanner
+        self.verifier = verifier
+        # Optional search window following the last face at this door
+        self.region = region
+        self.decisions = DecisionStats()
+        self.empty_frames = 0
+
+        self._thread = None
+
+    def start(self, running):
+        self._thread = threading.Thread(target=self._capture_loop, args=(running,),
+                                        name=f"capture-{self.source}", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self, running):
+        fps = self.capture.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0
+        next_at = time.monotonic()
+        while running.is_set():
+            ret, frame = self.capture.read()
+            if not ret:
+                break
+            self.buffer.put((self.frames_captured, time.monotonic(), frame))
+            self.frames_captured += 1
+            if interval:
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        self.finished = True
+        self.capture.release()
+
+    @property
+    def frames_dropped(self):
+        return self.buffer.dropped
+
+    def has_new_frame(self):
+        return self.frames_captured - 1 > self.last_seq
+
+    def stats(self):
+        return {
+            'source': str(self.source), 'action': self.action,
+            'frames_captured': self.frames_captured, 'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped, 'punches': self.punches, 'errors': self.errors,
+            'decisions': self.decisions.summary(),
+        }
+
+
+class MultiCameraServer:
+    """Shared scheduler running recognition for every source on one worker pool"""
+
+    def __init__(self, system, sources, workers=2, tolerance=0.5, required_frames=3, cooldown=None,
+                 reset_after=EMPTY_FRAMES_TO_RESET):
+        self.system = system
+        self.sources = sources
+        self.workers = workers
+        self.tolerance = tolerance
+        self.required_frames = required_frames
+        self.reset_after = reset_after
+        # Duplicate punches are dropped by the system's shared cooldown index; None keeps its window
+        if cooldown is not None:
+            system.cooldown.window = cooldown
+        for source in sources:
+            if source.verifier is None:
+                source.verifier = make_verifier('consecutive', required_frames)
+
+        self._running = threading.Event()
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        self._next = 0
+        self._threads = []
+
+    def start(self):
+        self._running.set()
+        for source in self.sources:
+            source.start(self._running)
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"recognition-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        self.system.metrics.inc('frames_dropped', sum(source.frames_dropped for source in self.sources))
+
+    def done(self):
+        return all(s.finished and not s.busy and not s.has_new_frame() for s in self.sources)
+
+    def run(self, duration=None):
+        """Block until every source has ended, duration elapses or Ctrl+C"""
+        self.start()
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self.done() and (deadline is None or time.monotonic() < deadline):
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def _next_job(self):
+        """Round-robin to the next idle source with an unprocessed frame"""
+        with self._lock:
+            count = len(self.sources)
+            for step in range(count):
+                source = self.sources[(self._next + step) % count]
+                if not source.busy and source.has_new_frame():
+                    item = source.buffer.get_latest(timeout=0)
+                    if item is None:
+                        continue
+                    source.busy = True
+                    self._next = (self._next + step + 1) % count
+                    return source, item
+        return None, None
+
+    def _worker_loop(self):
+        while self._running.is_set():
+            source, item = self._next_job()
+            if source is None:
+                time.sleep(0.005)
+                continue
+            seq, _, frame = item
+            try:
+                faces = self.system._recognize_frame(frame, self.tolerance, region=source.region,
+                                                     source=source.source)
+                self.system.metrics.inc('frames')
+                self.system.metrics.observe('faces_per_frame', len(faces))
+                self._update(source, faces)
+            except Exception as e:
+                # e.g. a corrupt frame or an encoder worker that died: drop the frame, keep serving
+                source.errors += 1
+                self.system.metrics.inc('worker_errors')
+                print(f"✗ [{source.source}] frame {seq} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            finally:
+                source.last_seq = seq
+                source.frames_processed += 1
+                source.busy = False
+
+    def _update(self, source, faces):
+        verifier = source.verifier
+        # A short gap keeps the evidence; a longer one ends the attempt, so the next person is judged afresh
+        if not faces:
+            source.empty_frames += 1
+            if source.empty_frames >= self.reset_after:
+                verifier.reset()
+            return
+        source.empty_frames = 0
+        status, user_id, confidence = verifier.update(faces)
+        if status == PENDING:
+            return
+        source.decisions.record(status, verifier.frames)
+        verifier.reset()
+        if status != ACCEPTED:
+            return
+
+        # One punch per person and action within the cooldown window, across all doors
+        with self._store_lock:
+            record = self.system.record_attendance(user_id, confidence, source.action)
+        if record is None:
+            return
+        source.punches += 1
+        print(f"✓ [{source.source}] {source.action.upper()}: {record['name']} @ {record['time']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-camera attendance server")
+    parser.add_argument('--punch-in', action='append', default=[], metavar='SOURCE',
+                        help="camera index, video file or stream URL logging punch-ins (repeatable)")
+    parser.add_argument('--punch-out', action='append', default=[], metavar='SOURCE',
+                        help="camera index, video file or stream URL logging punch-outs (repeatable)")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--backend', default="files", choices=["files", "sqlite"])
+    parser.add_argument('--index', default="exact", choices=["exact", "ivf"])
+    parser.add_argument('--detector', default="hog", choices=["hog", "haar", "yunet", "ssd"],
+                        help="face detector backend; encodings always come from dlib")
+    parser.add_argument('--workers', type=int, default=2, help="recognition threads shared by all sources")
+    parser.add_argument('--encoder-workers', type=int, default=0, help="encoding processes (0 = in-process)")
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--required-frames', type=int, default=3)
+    parser.add_argument('--verifier', default="consecutive", choices=["consecutive", "sprt"],
+                        help="fixed run of matching frames, or a sequential test that stops on enough evidence")
+    parser.add_argument('--reset-after', type=int, default=EMPTY_FRAMES_TO_RESET,
+                        help="faceless frames in a row before a door's pending evidence is dropped")
+    parser.add_argument('--roi', action='store_true', help="detect only around the last face, at an adaptive scale")
+    parser.add_argument('--zone', type=parse_zone, default=None, metavar='L,T,R,B',
+                        help="kiosk zone as frame fractions, e.g. 0.25,0.1,0.75,0.9 (implies --roi)")
+    parser.add_argument('--cooldown', type=float, default=60, help="seconds before the same person can punch again")
+    parser.add_argument('--cache-encodings', action='store_true',
+                        help="reuse encodings of near-identical face crops for a few seconds")
+    parser.add_argument('--metrics-port', type=int, default=None, help="serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-file', default=None, help="periodically dump JSON metrics to this file")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    def source(spec, action):
+        region = DetectionRegion(zone=args.zone) if args.roi or args.zone else None
+        return CameraSource(spec, action, make_verifier(args.verifier, args.required_frames), region)
+
+    sources = ([source(s, 'punch_in') for s in args.punch_in] +
+               [source(s, 'punch_out') for s in args.punch_out])
+    if not sources:
+        parser.error("at least one --punch-in or --punch-out source is required")
+
+    metrics = registry() if args.metrics_port or args.metrics_file else None
+    if args.metrics_port:
+        serve_http(metrics, args.metrics_port)
+    if args.metrics_file:
+        start_json_dump(metrics, args.metrics_file)
+    system = FaceAttendanceSystem(data_dir=args.data_dir, index=args.index, backend=args.backend,
+                                  encoder_workers=args.encoder_workers, detector=args.detector, metrics=metrics,
+                                  embedding_cache=True if args.cache_encodings else None, cooldown=args.cooldown)
+    server = MultiCameraServer(system, sources, workers=args.workers, tolerance=args.tolerance,
+                               required_frames=args.required_frames, reset_after=args.reset_after)
+    print(f"Serving {len(sources)} source(s) with {args.workers} recognition worker(s)...")
+    server.run(duration=args.duration)
+    system.close()
+
+    for source in sources:
+        stats = source.stats()
+        print(f"{stats['source']:<30} {stats['action']:<10} captured={stats['frames_captured']} "
+              f"processed={stats['frames_processed']} dropped={stats['frames_dropped']} punches={stats['punches']} "
+              f"errors={stats['errors']}")
+        for status, summary in stats['decisions'].items():
+            print(f"{'':<30} {status:<10} n={summary['count']} median_frames={summary['median_frames']:.1f} "
+                  f"p95_frames={summary['p95_frames']:.1f}")
+    print(f"Duplicate punches suppressed: {system.cooldown.suppressed}")
+    if system.embedding_cache is not None:
+        cache = system.embedding_cache.stats()
+        print(f"Encoding cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)")
+
+
+if __name__ == "__main__":
+    main()
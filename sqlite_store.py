@@ -0,0 +1,283 @@
+"""
+SQLite Storage Backend
+Optional replacement for the flat files (users.json, embedding store,
+attendance journal) backed by one SQLite database in WAL mode.
+
+Attendance is indexed on (date), (user_id, timestamp) and (action) so
+reports filter inside SQLite instead of scanning the full history.
+
+The connection is shared by the threads of a process (server workers,
+Streamlit sessions); every statement and transaction runs under one lock.
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS encodings (
+    row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    vector BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT,
+    action TEXT NOT NULL,
+    timestamp TEXT,
+    confidence REAL,
+    date TEXT NOT NULL,
+    time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date);
+CREATE INDEX IF NOT EXISTS idx_attendance_user_ts ON attendance (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_attendance_action ON attendance (action);
+CREATE INDEX IF NOT EXISTS idx_encodings_user ON encodings (user_id);
+"""
+
+RECORD_FIELDS = ('user_id', 'name', 'action', 'timestamp', 'confidence', 'date', 'time')
+
+UPSERT_USER = ("INSERT INTO users (user_id, name, info) VALUES (?, ?, ?) "
+               "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, info = excluded.info")
+INSERT_ENCODING = "INSERT INTO encodings (user_id, vector) VALUES (?, ?)"
+
+
+class SQLiteBackend:
+    """One database holding users, face encodings and attendance"""
+
+    def __init__(self, path, dim=128):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # Reentrant: enroll() runs the embeddings' statements inside its transaction
+        self.lock = threading.RLock()
+        self.embeddings = SQLiteEmbeddings(self.conn, dim, self.lock)
+        self.attendance = SQLiteAttendance(self.conn, self.lock)
+
+    @classmethod
+    def open(cls, data_dir, dim=128):
+        """
+        Open data_dir/attendance.db, importing the flat-file data
+        the first time the database is created
+        """
+        data_dir = Path(data_dir)
+        path = data_dir / "attendance.db"
+        fresh = not path.exists()
+        backend = cls(path, dim=dim)
+        if fresh:
+            backend.import_files(data_dir)
+        return backend
+
+    def import_files(self, data_dir):
+        """Copy users.json, the embedding store and the attendance journal into the database"""
+        from attendance_journal import AttendanceJournal
+        from embedding_store import EmbeddingStore
+
+        data_dir = Path(data_dir)
+        users_file = data_dir / "users.json"
+        if users_file.exists():
+            with open(users_file, 'r') as f:
+                self.save_users(json.load(f))
+        if (data_dir / "face_encodings.f32").exists() or (data_dir / "face_encodings.pkl").exists():
+            store = EmbeddingStore.open(data_dir, dim=self.embeddings.dim)
+            self.embeddings.append(store.ids, store.matrix)
+        if (data_dir / "attendance").exists() or (data_dir / "attendance.json").exists():
+            journal = AttendanceJournal(data_dir)
+            self.attendance.append_many(journal.iter_records())
+            journal.close()
+
+    # --- users ---
+
+    def data_version(self):
+        """Changes only when another connection commits"""
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, info FROM users").fetchall()
+        return {user_id: json.loads(info) for user_id, info in rows}
+
+    def save_users(self, users):
+        """
+        Insert or update the given users; users missing from `users` are kept,
+        since other processes may have registered them (see delete_user)
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(UPSERT_USER, [(user_id, user['name'], json.dumps(user))
+                                                for user_id, user in users.items()])
+
+    def delete_user(self, user_id):
+        """Remove a user and their encodings in one transaction; False if unknown"""
+        with self.lock, self.conn:
+            removed = self.conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,)).rowcount
+            self.conn.execute("DELETE FROM encodings WHERE user_id = ?", (user_id,))
+        self.embeddings.refresh()
+        return bool(removed)
+
+    def enroll(self, users, ids, encodings, replace=()):
+        """Add users and their encodings in one transaction, dropping the old encodings of `replace`"""
+        rows = self.embeddings._rows(ids, encodings)
+        with self.lock, self.conn:
+            self.embeddings._delete(replace)
+            self.conn.executemany(INSERT_ENCODING, [(user_id, row.tobytes()) for user_id, row in zip(ids, rows)])
+            self.conn.executemany(UPSERT_USER, [(user_id, user['name'], json.dumps(user))
+                                                for user_id, user in users.items()])
+        self.embeddings.refresh()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SQLiteEmbeddings:
+    """Encoding rows with the same interface as EmbeddingStore"""
+
+    def __init__(self, conn, dim=128, lock=None):
+        self.conn = conn
+        self.lock = lock or threading.RLock()
+        self.dim = dim
+        self.ids = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        # Bumped whenever rows were removed and everything was re-read (as in EmbeddingStore)
+        self.generation = 0
+        self._last_row_id = 0
+        self.refresh()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def refresh(self):
+        """Read rows added since the last call; re-read everything when rows were deleted"""
+        with self.lock:
+            rows = self.conn.execute("SELECT row_id, user_id, vector FROM encodings WHERE row_id > ? ORDER BY row_id",
+                                     (self._last_row_id,)).fetchall()
+            count = self.conn.execute("SELECT COUNT(*) FROM encodings").fetchone()[0]
+            if count != len(self.ids) + len(rows):
+                self.generation += 1
+                self.ids, self._last_row_id = [], 0
+                self.matrix = np.empty((0, self.dim), dtype=np.float32)
+                rows = self.conn.execute("SELECT row_id, user_id, vector FROM encodings ORDER BY row_id").fetchall()
+            if rows:
+                blob = b"".join(vector for _, _, vector in rows)
+                self._extend([user_id for _, user_id, _ in rows],
+                             np.frombuffer(blob, dtype=np.float32).reshape(-1, self.dim))
+                self._last_row_id = rows[-1][0]
+
+    def _rows(self, ids, encodings):
+        rows = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(rows) != len(ids):
+            raise ValueError("encodings and ids must have the same length")
+        return rows
+
+    def _extend(self, ids, rows):
+        self.ids.extend(ids)
+        self.matrix = np.concatenate([self.matrix, rows])
+
+    def append(self, ids, encodings):
+        """Insert rows; rows other connections inserted meanwhile are picked up too"""
+        rows = self._rows(ids, encodings)
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(INSERT_ENCODING, [(user_id, row.tobytes()) for user_id, row in zip(ids, rows)])
+            self.refresh()
+
+    def delete(self, user_ids):
+        with self.lock:
+            with self.conn:
+                removed = self._delete(user_ids)
+            self.refresh()
+        return removed
+
+    def replace(self, user_ids, ids, encodings):
+        """Remove the rows of user_ids and insert the given rows in one transaction"""
+        rows = self._rows(ids, encodings)
+        with self.lock:
+            with self.conn:
+                removed = self._delete(user_ids)
+                self.conn.executemany(INSERT_ENCODING, [(user_id, row.tobytes()) for user_id, row in zip(ids, rows)])
+            self.refresh()
+        return removed
+
+    def _delete(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        placeholders = ",".join("?" * len(user_ids))
+        return self.conn.execute(f"DELETE FROM encodings WHERE user_id IN ({placeholders})", user_ids).rowcount
+
+
+class SQLiteAttendance:
+    """Attendance table with the same interface as AttendanceJournal"""
+
+    def __init__(self, conn, lock=None):
+        self.conn = conn
+        self.lock = lock or threading.RLock()
+
+    def append(self, record):
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT INTO attendance ({', '.join(RECORD_FIELDS)}) VALUES ({', '.join('?' * len(RECORD_FIELDS))})",
+                [record.get(field) for field in RECORD_FIELDS])
+
+    def append_many(self, records):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO attendance ({', '.join(RECORD_FIELDS)}) VALUES ({', '.join('?' * len(RECORD_FIELDS))})",
+                ([record.get(field) for field in RECORD_FIELDS] for record in records))
+
+    def sync(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+
+    @staticmethod
+    def _to_record(row):
+        return {field: value for field, value in zip(RECORD_FIELDS, row) if value is not None}
+
+    def iter_records(self, start_date=None, end_date=None):
+        return self.iter_query(start_date=start_date, end_date=end_date)
+
+    def load_records(self, start_date=None, end_date=None):
+        return self.query(start_date=start_date, end_date=end_date)
+
+    def query(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """Filtered records in insertion order, answered from the indexes"""
+        return list(self.iter_query(date, start_date, end_date, user_id, action, since))
+
+    def iter_query(self, date=None, start_date=None, end_date=None, user_id=None, action=None, since=None):
+        """query() streamed from the cursor, for exports that must not hold the result in memory"""
+        if date is not None:
+            start_date = end_date = date
+        clauses, params = [], []
+        for clause, value in (("date >= ?", start_date), ("date <= ?", end_date),
+                              ("user_id = ?", user_id), ("action = ?", action),
+                              ("timestamp >= ?", since)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            cursor = self.conn.execute(f"SELECT {', '.join(RECORD_FIELDS)} FROM attendance{where} ORDER BY id", params)
+        while True:
+            # The lock is held per batch, so a long export does not block the other threads
+            with self.lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                yield self._to_record(row)
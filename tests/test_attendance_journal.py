@@ -0,0 +1,51 @@
+import os
+import time
+
+from attendance_journal import AttendanceJournal
+
+
+def punch(n):
+    return {'user_id': 'alice', 'name': 'Alice', 'action': 'punch_in', 'timestamp': f"2026-09-01T09:00:{n:02d}",
+            'date': '2026-09-01', 'time': f"09:00:{n:02d}"}
+
+
+def test_quiet_journal_is_synced_by_the_timer(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, 'fsync', synced.append)
+    journal = AttendanceJournal(tmp_path, fsync_every=32, fsync_interval=0.05)
+    journal.append(punch(0))
+    journal.append(punch(1))
+    assert not synced
+
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(synced) == 1
+    assert journal._unsynced == 0
+    journal.close()
+
+
+def test_records_read_back_in_order(tmp_path):
+    journal = AttendanceJournal(tmp_path)
+    for n in range(5):
+        journal.append(punch(n))
+    journal.close()
+
+    assert AttendanceJournal(tmp_path).load_records() == [punch(n) for n in range(5)]
+
+
+def test_tail_returns_only_records_appended_since_the_last_call(tmp_path):
+    reader = AttendanceJournal(tmp_path)
+    writer = AttendanceJournal(tmp_path)
+    writer.append(punch(0))
+    assert list(reader.iter_new_records()) == [punch(0)]
+
+    writer.append(punch(1))
+    writer.append(dict(punch(2), date='2026-09-02'))
+    assert list(reader.iter_new_records()) == [punch(1), dict(punch(2), date='2026-09-02')]
+    assert list(reader.iter_new_records()) == []
+
+    with open(writer.segment_path('2026-09-02'), 'a') as f:
+        f.write('{"user_id": "bo')
+    assert list(reader.iter_new_records()) == []
+    writer.close()
@@ -0,0 +1,69 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def frame(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, size=(120, 160, 3), dtype=np.uint8)
+
+
+class Encoder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image, locations):
+        self.calls += len(locations)
+        return [np.full(128, self.calls, dtype=np.float32) for _ in locations]
+
+
+BOX = (10, 70, 70, 10)
+
+
+def test_same_face_on_same_source_is_reused():
+    cache, encode = EmbeddingCache(), Encoder()
+    image = frame()
+    first = cache.encode(image, [BOX], encode, source='door-1')
+    second = cache.encode(image, [BOX], encode, source='door-1')
+
+    assert encode.calls == 1
+    assert second[0] is first[0]
+    assert cache.hits == 1
+
+
+def test_other_source_does_not_reuse_encoding():
+    cache, encode = EmbeddingCache(), Encoder()
+    image = frame()
+    cache.encode(image, [BOX], encode, source='door-1')
+    cache.encode(image, [BOX], encode, source='door-2')
+
+    assert encode.calls == 2
+    assert cache.hits == 0
+
+
+def test_changed_crop_is_encoded_again():
+    cache, encode = EmbeddingCache(), Encoder()
+    cache.encode(frame(0), [BOX], encode)
+    cache.encode(frame(1), [BOX], encode)
+
+    assert encode.calls == 2
+
+
+def test_faces_keep_their_own_entries():
+    cache, encode = EmbeddingCache(), Encoder()
+    image = frame()
+    boxes = [BOX, (10, 150, 70, 90)]
+    first = cache.encode(image, boxes, encode)
+    second = cache.encode(image, boxes[::-1], encode)
+
+    assert encode.calls == 2
+    assert second[0] is first[1] and second[1] is first[0]
+
+
+def test_entries_expire():
+    cache = EmbeddingCache(ttl=2.0)
+    key = (None, 0)
+    cache.put(key, BOX, 123, np.zeros(128), now=0.0)
+
+    assert cache.get(key, BOX, 123, now=1.0) is not None
+    assert cache.get(key, BOX, 123, now=2.5) is None
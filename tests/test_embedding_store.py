@@ -0,0 +1,140 @@
+import json
+
+import numpy as np
+
+import embedding_store
+from embedding_store import EmbeddingStore
+
+
+def rows(value, n=1):
+    return np.full((n, 128), value, dtype=np.float32)
+
+
+def test_two_instances_append_to_the_same_store(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    a = EmbeddingStore(path)
+    b = EmbeddingStore(path)
+
+    a.append(['alice'], rows(1.0))
+    # b has not refreshed since alice was added
+    b.append(['bob', 'bob'], rows(2.0, 2))
+    a.append(['carol'], rows(3.0))
+
+    for store in (a, b, EmbeddingStore(path)):
+        store.refresh()
+        assert store.ids == ['alice', 'bob', 'bob', 'carol']
+        assert store.matrix[:, 0].tolist() == [1.0, 2.0, 2.0, 3.0]
+
+
+def test_opening_does_not_truncate_rows_of_other_instances(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    a = EmbeddingStore(path)
+    a.append(['alice'], rows(1.0))
+    b = EmbeddingStore(path)
+    a.append(['bob'], rows(2.0))
+    EmbeddingStore(path)
+    b.append(['carol'], rows(3.0))
+
+    b.refresh()
+    assert b.ids == ['alice', 'bob', 'carol']
+    assert b.matrix[:, 0].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_delete_keeps_rows_added_by_another_instance(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    a = EmbeddingStore(path)
+    b = EmbeddingStore(path)
+    a.append(['alice'], rows(1.0))
+    b.append(['bob'], rows(2.0))
+
+    assert a.delete(['alice']) == 1
+    assert a.ids == ['bob']
+    assert a.matrix[:, 0].tolist() == [2.0]
+
+
+def test_torn_append_is_repaired(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    store = EmbeddingStore(path)
+    store.append(['alice'], rows(1.0))
+    # Crash after the matrix row landed but before its id
+    with open(path, 'ab') as f:
+        f.write(rows(9.0).tobytes()[:100])
+
+    store = EmbeddingStore(path)
+    store.append(['bob'], rows(2.0))
+    assert store.ids == ['alice', 'bob']
+    assert store.matrix[:, 0].tolist() == [1.0, 2.0]
+
+
+def test_concurrent_appends_keep_ids_and_rows_aligned(tmp_path):
+    import threading
+
+    path = tmp_path / "face_encodings.f32"
+    EmbeddingStore(path)
+
+    def writer(name, value):
+        store = EmbeddingStore(path)
+        for _ in range(20):
+            store.append([name], rows(value))
+
+    threads = [threading.Thread(target=writer, args=(name, value))
+               for name, value in (('alice', 1.0), ('bob', 2.0), ('carol', 3.0))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = EmbeddingStore(path)
+    assert len(store) == 60
+    expected = {'alice': 1.0, 'bob': 2.0, 'carol': 3.0}
+    assert all(expected[user_id] == row[0] for user_id, row in zip(store.ids, store.matrix))
+
+
+def test_append_and_refresh_read_only_new_rows(tmp_path, monkeypatch):
+    path = tmp_path / "face_encodings.f32"
+    a, b = EmbeddingStore(path), EmbeddingStore(path)
+    a.append(['alice'] * 3, rows(1.0, 3))
+    ids = a.ids
+    read = []
+    loads = json.loads
+    # Count the id lines parsed from the sidecar
+    monkeypatch.setattr(embedding_store.json, 'loads', lambda line: read.append(line) or loads(line))
+    b.append(['bob'], rows(2.0))
+    a.append(['carol'], rows(3.0))
+
+    # b read alice's three rows plus its own; a only bob's and carol's
+    assert len(read) == 4 + 2
+    assert a.ids is ids and a.ids == ['alice'] * 3 + ['bob', 'carol']
+    assert a.matrix[:, 0].tolist() == [1.0, 1.0, 1.0, 2.0, 3.0]
+
+
+def test_refresh_rereads_after_another_instance_compacts(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    a, b = EmbeddingStore(path), EmbeddingStore(path)
+    a.append(['alice', 'bob', 'carol'], np.stack([rows(1.0)[0], rows(2.0)[0], rows(3.0)[0]]))
+    b.refresh()
+    a.delete(['bob'])
+    b.refresh()
+
+    assert b.ids == ['alice', 'carol']
+    assert b.matrix[:, 0].tolist() == [1.0, 3.0]
+
+
+def test_replace_swaps_templates_in_one_compaction(tmp_path):
+    path = tmp_path / "face_encodings.f32"
+    store = EmbeddingStore(path)
+    store.append(['alice', 'bob', 'alice'], rows(1.0, 3))
+    reader = EmbeddingStore(path)
+
+    assert store.replace(['alice'], ['alice'], rows(2.0)) == 2
+    assert store.generation == reader.generation + 1
+
+    reader.refresh()
+    assert reader.ids == ['bob', 'alice']
+    assert reader.matrix[:, 0].tolist() == [1.0, 2.0]
+
+    # A user with no rows yet is a plain append
+    generation = store.generation
+    assert store.replace(['carol'], ['carol'], rows(3.0)) == 0
+    assert store.generation == generation
+    assert store.ids == ['bob', 'alice', 'carol']
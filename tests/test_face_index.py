@@ -0,0 +1,52 @@
+import numpy as np
+
+from face_index import IVFIndex, build_index
+
+
+def gallery(n_users, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n_users, 128)).astype(np.float32), [f"u{i}" for i in range(n_users)]
+
+
+def templates(center, k=3, seed=1):
+    rng = np.random.default_rng(seed)
+    return center + rng.normal(scale=0.01, size=(k, 128)).astype(np.float32)
+
+
+def test_add_template_set_untrained():
+    index = IVFIndex(nlist=4, min_points_per_list=1000)
+    vectors, ids = gallery(5)
+    index.add_many(vectors, ids)
+    index.add('multi', templates(np.full(128, 3.0, np.float32)))
+
+    assert not index.is_trained
+    assert len(index) == 8
+    assert index.best_match(np.full((1, 128), 3.0))[0][0] == 'multi'
+
+
+def test_add_template_set_trained():
+    index = IVFIndex(nlist=4, min_points_per_list=2)
+    vectors, ids = gallery(40)
+    index.add_many(vectors, ids)
+    assert index.is_trained
+    index.add('multi', templates(np.full(128, 3.0, np.float32)))
+
+    assert len(index) == 43
+    assert index.best_match(np.full((1, 128), 3.0))[0][0] == 'multi'
+
+
+def test_remove_matches_a_rebuilt_index():
+    vectors, ids = gallery(40)
+    ids = ids[:20] + ids[:20]
+    queries = vectors + 0.01
+    for kind, options in (('exact', {}), ('ivf', {'nlist': 4, 'min_points_per_list': 2})):
+        stored = vectors.copy()
+        index = build_index(stored, ids, kind=kind, **options)
+        assert index.remove(['u3', 'u7', 'nobody']) == 4
+
+        kept = [i for i, user_id in enumerate(ids) if user_id not in ('u3', 'u7')]
+        rebuilt = build_index(vectors[kept], [ids[i] for i in kept], kind=kind, **options)
+        assert len(index) == 36
+        assert index.search(queries, k=3)[0] == rebuilt.search(queries, k=3)[0]
+        # The exact index adopts the store's matrix; removing must not write into it
+        assert np.array_equal(stored, vectors)
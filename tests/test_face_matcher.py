@@ -0,0 +1,85 @@
+import numpy as np
+
+from face_matcher import FaceMatcher, enrollment_templates
+
+
+def gallery(seed=0):
+    """Identities with one to four templates each, rows interleaved across identities"""
+    rng = np.random.default_rng(seed)
+    ids = [f"u{i}" for i in range(12) for _ in range(i % 4 + 1)]
+    rng.shuffle(ids)
+    return rng.normal(size=(len(ids), 128)).astype(np.float32), ids
+
+
+def brute_force(encodings, ids, queries):
+    """Per-identity minimum distance, computed row by row"""
+    identities = sorted(set(ids))
+    dist = np.full((len(queries), len(identities)), np.inf)
+    for qi, query in enumerate(queries):
+        for row, user_id in zip(encodings, ids):
+            column = identities.index(user_id)
+            dist[qi, column] = min(dist[qi, column], np.linalg.norm(query - row))
+    return identities, dist
+
+
+def test_identity_distances_take_the_closest_template():
+    encodings, ids = gallery()
+    queries = np.random.default_rng(1).normal(size=(5, 128)).astype(np.float32)
+    matcher = FaceMatcher.from_encodings(encodings, ids)
+
+    identities, expected = brute_force(encodings, ids, queries)
+    got = matcher.identity_distances(queries)
+    order = [matcher.identities.index(user_id) for user_id in identities]
+    np.testing.assert_allclose(got[:, order], expected, rtol=1e-4)
+
+
+def test_search_top_k_matches_brute_force():
+    encodings, ids = gallery()
+    rng = np.random.default_rng(2)
+    # Half the queries are near a stored template
+    queries = np.concatenate([encodings[:4] + rng.normal(scale=0.05, size=(4, 128)),
+                              rng.normal(size=(4, 128))]).astype(np.float32)
+    matcher = FaceMatcher.from_encodings(encodings, ids)
+    identities, expected = brute_force(encodings, ids, queries)
+
+    for k in (1, 3, 12, 20):
+        top_ids, top_dist = matcher.search(queries, k=k)
+        assert top_dist.shape == (len(queries), min(k, 12))
+        for qi in range(len(queries)):
+            best = np.argsort(expected[qi])[:k]
+            assert top_ids[qi] == [identities[j] for j in best]
+            np.testing.assert_allclose(top_dist[qi], expected[qi, best], rtol=1e-4)
+    assert [row[0] for row in matcher.search(queries[:4])[0]] == ids[:4]
+
+
+def test_grouping_follows_later_inserts():
+    encodings, ids = gallery()
+    matcher = FaceMatcher.from_encodings(encodings[:10], ids[:10])
+    query = encodings[20:21]
+    matcher.search(query)
+    matcher.add_many(encodings[10:], ids[10:])
+    assert matcher.search(query)[0] == [[ids[20]]]
+
+
+def test_empty_gallery():
+    matcher = FaceMatcher()
+    queries = np.ones((2, 128), dtype=np.float32)
+    ids, dist = matcher.search(queries, k=3)
+    assert ids == [[], []]
+    assert dist.shape == (2, 0)
+    assert matcher.best_match(queries) == [(None, None), (None, None)]
+
+
+def test_best_match_tolerance():
+    matcher = FaceMatcher.from_encodings(np.zeros((1, 128)), ['alice'])
+    query = np.full((1, 128), 0.05, dtype=np.float32)
+    (user_id, distance), = matcher.best_match(query, tolerance=1.0)
+    assert user_id == 'alice' and np.isclose(distance, np.sqrt(128) * 0.05)
+    assert matcher.best_match(query, tolerance=0.5) == [(None, distance)]
+
+
+def test_enrollment_templates():
+    samples = np.random.default_rng(3).normal(size=(6, 128))
+    assert enrollment_templates(samples).shape == (1, 128)
+    assert enrollment_templates(samples, 'all').shape == (6, 128)
+    assert enrollment_templates(samples, 2).shape == (2, 128)
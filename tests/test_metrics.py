@@ -0,0 +1,37 @@
+import pytest
+
+from metrics import COUNT_BUCKETS, LATENCY_BUCKETS, Histogram, Metrics
+
+
+def test_count_quantiles_are_observed_values():
+    histogram = Histogram(COUNT_BUCKETS)
+    for _ in range(10):
+        histogram.observe(1)
+
+    assert histogram.summary()['p50'] == 1.0
+    assert histogram.summary()['p99'] == 1.0
+
+
+def test_count_quantiles_pick_the_bucket_of_the_rank():
+    histogram = Histogram(COUNT_BUCKETS)
+    for value in (0, 1, 1, 2, 3):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(0.95) == 3.0
+
+
+def test_metrics_observe_uses_count_buckets():
+    metrics = Metrics()
+    metrics.observe('faces_per_frame', 1)
+
+    assert metrics.to_dict()['values']['faces_per_frame']['p50'] == 1.0
+
+
+def test_latency_quantiles_interpolate():
+    histogram = Histogram(LATENCY_BUCKETS)
+    for _ in range(100):
+        histogram.observe(0.05)
+
+    assert histogram.quantile(0.5) == pytest.approx(0.05, rel=0.12)
+    assert histogram.quantile(0.5) < 0.05
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import FramePipeline, LatestFrameBuffer
+
+
+class FakeCapture:
+    """Yields `count` frames (their index), then reports the camera closed"""
+
+    def __init__(self, count, delay=0.001):
+        self.count = count
+        self.delay = delay
+        self.reads = 0
+
+    def read(self):
+        time.sleep(self.delay)
+        if self.reads >= self.count:
+            return False, None
+        self.reads += 1
+        return True, self.reads - 1
+
+
+def drain(pipeline, timeout=5):
+    """Display frames and results until the capture ends"""
+    frames, results = [], []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        item = pipeline.next_frame(timeout=0.05)
+        if item is not None:
+            frames.append(item[0])
+        result = pipeline.poll_result()
+        if result is not None:
+            results.append(result)
+        if item is None and not pipeline.running:
+            break
+    return frames, results
+
+
+def test_buffer_drops_oldest_when_full():
+    buffer = LatestFrameBuffer(capacity=2)
+    for n in range(5):
+        buffer.put(n)
+    assert buffer.dropped == 3
+    assert buffer.get(timeout=0) == 3
+    assert buffer.get_latest(timeout=0) == 4
+    assert buffer.get(timeout=0) is None
+
+
+def test_close_wakes_waiting_reader():
+    buffer = LatestFrameBuffer()
+    got = []
+    reader = threading.Thread(target=lambda: got.append(buffer.get(timeout=5)))
+    reader.start()
+    buffer.close()
+    reader.join(timeout=1)
+    assert not reader.is_alive()
+    assert got == [None]
+
+
+def test_pipeline_drains_and_stops_cleanly():
+    pipeline = FramePipeline(FakeCapture(50), lambda frame: frame * 10, workers=3).start()
+    frames, results = drain(pipeline)
+    pipeline.stop()
+
+    assert not pipeline.running
+    assert pipeline._threads == []
+    assert pipeline.error is None
+    assert pipeline.frames_captured == 50
+    assert frames == sorted(frames) and frames[-1] == 49
+    # Results are published in frame order and carry the recognizer's output
+    seqs = [seq for seq, _ in results]
+    assert seqs == sorted(set(seqs))
+    assert all(result == seq * 10 for seq, result in results)
+    assert pipeline.frames_recognized + pipeline.frames_dropped <= 50
+
+
+def test_recognizer_error_stops_the_pipeline():
+    def recognize(frame):
+        raise RuntimeError("encoder died")
+
+    pipeline = FramePipeline(FakeCapture(1000), recognize, workers=2).start()
+    drain(pipeline)
+    pipeline.stop()
+
+    assert isinstance(pipeline.error, RuntimeError)
+    assert pipeline.frames_captured < 1000
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_stop_while_capturing_joins_all_threads(workers):
+    pipeline = FramePipeline(FakeCapture(10 ** 6), lambda frame: frame, workers=workers).start()
+    time.sleep(0.05)
+    pipeline.stop()
+
+    assert not pipeline.running
+    names = [thread.name for thread in threading.enumerate()]
+    assert not [name for name in names if name == 'capture' or name.startswith('recognition-')]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from punch_cooldown import PunchCooldown
+
+NINE = datetime(2026, 9, 1, 9, 0)
+
+
+def punch(user_id, action, when):
+    return {'user_id': user_id, 'action': action, 'timestamp': when.isoformat(), 'date': when.strftime('%Y-%m-%d')}
+
+
+def test_duplicate_inside_the_window_is_rejected():
+    cooldown = PunchCooldown(window=60)
+    assert cooldown.claim('alice', 'punch_in', NINE)
+    assert not cooldown.claim('alice', 'punch_in', NINE + timedelta(seconds=30))
+    assert cooldown.suppressed == 1
+    assert cooldown.remaining('alice', 'punch_in', NINE + timedelta(seconds=45)) == 15
+
+    assert cooldown.claim('alice', 'punch_out', NINE + timedelta(seconds=30))
+    assert cooldown.claim('bob', 'punch_in', NINE + timedelta(seconds=30))
+    assert cooldown.claim('alice', 'punch_in', NINE + timedelta(seconds=60))
+
+
+def test_backfilled_punch_near_a_later_one_is_rejected():
+    cooldown = PunchCooldown(window=60)
+    assert cooldown.claim('alice', 'punch_in', NINE)
+    assert not cooldown.claim('alice', 'punch_in', NINE - timedelta(seconds=20))
+    # The older punch does not move the window back
+    assert cooldown.claim('alice', 'punch_in', NINE - timedelta(seconds=90))
+    assert not cooldown.claim('alice', 'punch_in', NINE + timedelta(seconds=30))
+
+
+def test_zero_window_disables_suppression():
+    cooldown = PunchCooldown(window=0)
+    assert cooldown.claim('alice', 'punch_in', NINE)
+    assert cooldown.claim('alice', 'punch_in', NINE)
+
+
+def test_rebuild_and_update_from_stored_punches():
+    cooldown = PunchCooldown(window=60)
+    queried = {}
+
+    def query(**filters):
+        queried.update(filters)
+        return [punch('alice', 'punch_in', NINE - timedelta(seconds=30))]
+
+    cooldown.rebuild_from(query, now=NINE)
+    assert queried == {'start_date': '2026-09-01', 'since': (NINE - timedelta(seconds=60)).isoformat()}
+    assert not cooldown.claim('alice', 'punch_in', NINE)
+
+    # A punch written by another process
+    cooldown.update([punch('bob', 'punch_in', NINE)])
+    assert not cooldown.claim('bob', 'punch_in', NINE + timedelta(seconds=10))
+    assert len(cooldown) == 2
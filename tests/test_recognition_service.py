@@ -0,0 +1,50 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+from recognition_service import RecognitionService, make_server
+
+
+class BrokenSystem:
+    users = {}
+    encoder = None
+
+    def detector(self, rgb):
+        raise RuntimeError("detector crashed")
+
+
+@pytest.fixture
+def url():
+    server = make_server(RecognitionService(BrokenSystem()), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(f"{url}/recognize", data=body, headers={'Content-Type': 'image/jpeg'})
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=5)
+    return error.value.code, json.load(error.value)
+
+
+def test_undecodable_body_is_a_client_error(url):
+    status, body = post(url, b"not an image")
+
+    assert status == 400
+    assert 'error' in body
+
+
+def test_internal_failure_returns_json_500(url):
+    image = cv2.imencode('.jpg', np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+    status, body = post(url, image)
+
+    assert status == 500
+    assert body['error'] == "RuntimeError: detector crashed"
@@ -0,0 +1,55 @@
+from record_store import RecordStore
+
+
+def punch(user_id, timestamp, **fields):
+    record = {'user_id': user_id, 'name': user_id.title(), 'action': 'punch_in', 'timestamp': timestamp,
+              'confidence': 0.6123456789, 'date': timestamp[:10], 'time': timestamp[11:19]}
+    record.update(fields)
+    return record
+
+
+def test_records_round_trip_exactly():
+    records = [
+        punch('alice', '2026-09-01T09:00:00'),
+        punch('alice', '2026-09-01T09:00:00.123456', confidence=0.1 + 0.2),
+        punch('bob', '2026-09-01T10:00:00+02:00'),
+        punch('bob', '2026-09-01T11:00:00', source='door-2'),
+        punch('carol', '2026-09-01T12:00:00', confidence=None),
+        {'user_id': 'dave', 'action': 'punch_out', 'date': '2026-09-01', 'time': '17:00:00'},
+        {'user_id': 'erin', 'name': 'Erin', 'action': 'punch_out', 'timestamp': '2026-09-01T18:00:00'},
+    ]
+    store = RecordStore.from_records(records)
+
+    assert list(store) == records
+    assert store[5] == records[5]
+    assert store.query(user_id='bob') == records[2:4]
+
+
+def test_date_queries_and_subset():
+    records = [punch('alice', f"2026-09-{day:02d}T09:00:00") for day in range(1, 31)]
+    store = RecordStore.from_records(records)
+
+    assert store.query(start_date='2026-09-10', end_date='2026-09-12') == records[9:12]
+    assert store.week('2026-09-16') == records[13:20]
+    assert list(store.subset(date='2026-09-05')) == [records[4]]
+
+
+def test_indexes_stay_correct_after_out_of_order_appends():
+    records = [punch(user, f"2026-09-{day:02d}T09:00:00") for day in range(10, 20) for user in ('alice', 'bob')]
+    store = RecordStore.from_records(records)
+    # A backfill of older punches, then live punches again
+    backfill = [punch('alice', '2026-09-01T08:00:00'), punch('bob', '2026-09-15T07:00:00')]
+    live = [punch('alice', '2026-09-20T09:00:00')]
+    for record in backfill + live:
+        store.append(record)
+    everything = records + backfill + live
+
+    def expected(keep):
+        return [record for record in everything if keep(record)]
+
+    assert store.query(date='2026-09-01') == [backfill[0]]
+    assert store.query(date='2026-09-15') == expected(lambda r: r['date'] == '2026-09-15')
+    assert store.query(user_id='alice') == expected(lambda r: r['user_id'] == 'alice')
+    assert store.query(user_id='bob', start_date='2026-09-15', end_date='2026-09-15') == [records[11], backfill[1]]
+    assert store.query(since='2026-09-19T00:00:00') == expected(lambda r: r['timestamp'] >= '2026-09-19')
+    assert store.query(user_id='carol') == []
@@ -0,0 +1,40 @@
+import os
+import time
+
+from report_export import export_path, load_archive, prune_exports, write_archive, write_csv
+
+
+def records(n):
+    return [{'user_id': f"E{i % 3}", 'name': f"User {i % 3}", 'action': 'punch_in',
+             'timestamp': f"2026-09-01T09:00:{i:02d}", 'date': '2026-09-01', 'time': f"09:00:{i:02d}",
+             'confidence': 0.5} for i in range(n)]
+
+
+def test_export_paths_are_unique_and_name_the_filters(tmp_path):
+    first = export_path(tmp_path, 'csv', '2026-09-01', '2026-09-30', 'E042')
+    second = export_path(tmp_path, 'csv', '2026-09-01', '2026-09-30', 'E042')
+
+    assert first != second
+    assert first.name.startswith('attendance_2026-09-01_2026-09-30_E042_')
+    assert export_path(tmp_path, 'npz', user_id='../x').parent == tmp_path
+
+
+def test_prune_exports_removes_old_files(tmp_path):
+    old, new = tmp_path / 'attendance_old.csv', tmp_path / 'attendance_new.csv'
+    old.write_text('x')
+    new.write_text('x')
+    stale = time.time() - 7200
+    os.utime(old, (stale, stale))
+
+    assert prune_exports(tmp_path, max_age=3600) == 1
+    assert not old.exists() and new.exists()
+
+
+def test_csv_and_archive_round_trip(tmp_path):
+    assert write_csv(records(25), tmp_path / 'a.csv', chunk_rows=10) == 25
+    assert len((tmp_path / 'a.csv').read_text().splitlines()) == 26
+
+    assert write_archive(records(25), tmp_path / 'a.npz', chunk_rows=10) == 25
+    columns = load_archive(tmp_path / 'a.npz')
+    assert len(columns['timestamp']) == 25
+    assert list(columns['user_id'][:3]) == ['E0', 'E1', 'E2']
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from roi import DetectionRegion, parse_zone
+
+SHAPE = (480, 640, 3)
+
+
+def test_parse_zone():
+    assert parse_zone("0.25,0.1,0.75,0.9") == (0.25, 0.1, 0.75, 0.9)
+    for text in ("0.5,0.1,0.25,0.9", "0,0,1", "0,0,1.5,1"):
+        with pytest.raises(ValueError):
+            parse_zone(text)
+
+
+def test_without_a_face_the_zone_is_searched_at_default_scale():
+    assert DetectionRegion().plan(SHAPE) == ((0, 640, 480, 0), 0.25)
+    region = DetectionRegion(zone=(0.25, 0.1, 0.75, 0.9))
+    assert region.plan(SHAPE) == ((48, 480, 432, 160), 0.25)
+
+
+def test_window_follows_the_largest_face_with_adaptive_scale():
+    region = DetectionRegion(margin=0.5, target_face=64)
+    region.update([(100, 300, 200, 200), (10, 30, 30, 10)])
+    # 100px face: 50px margin, downscaled so it comes out 64px high
+    assert region.plan(SHAPE) == ((50, 350, 250, 150), 0.64)
+
+    region.update([(200, 340, 240, 300)])
+    # 40px face is upscaled, capped at max_scale
+    assert region.plan(SHAPE)[1] == 1.0
+
+
+def test_window_is_clipped_to_the_zone():
+    region = DetectionRegion(zone=(0.5, 0, 1, 1), margin=1.0)
+    region.update([(0, 400, 100, 300)])
+    assert region.plan(SHAPE)[0] == (0, 500, 200, 320)
+
+
+def test_face_lost_and_periodic_full_scan():
+    region = DetectionRegion(lost_after=2, full_scan_every=3)
+    region.update([(100, 300, 200, 200)])
+    windows = [region.plan(SHAPE)[0] for _ in range(3)]
+    assert windows[2] == (0, 640, 480, 0)
+    assert windows[0] != windows[2]
+
+    region.update([])
+    assert region.last_box is not None
+    region.update([])
+    assert region.plan(SHAPE) == ((0, 640, 480, 0), 0.25)
+
+
+def test_crop_maps_boxes_back_to_frame_coordinates():
+    region = DetectionRegion(margin=0.5, target_face=50)
+    region.update([(100, 300, 200, 200)])
+    frame = np.zeros(SHAPE, dtype=np.uint8)
+    rgb, to_frame = region.crop(frame)
+
+    assert rgb.shape == (100, 100, 3)
+    assert to_frame((25, 75, 75, 25)) == (100, 300, 200, 200)
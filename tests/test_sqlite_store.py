@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+
+from sqlite_store import SQLiteBackend
+
+
+def user(user_id):
+    return {'name': user_id.title(), 'user_id': user_id}
+
+
+def test_save_users_keeps_users_registered_elsewhere(tmp_path):
+    kiosk = SQLiteBackend.open(tmp_path)
+    app = SQLiteBackend.open(tmp_path)
+    kiosk.enroll({'alice': user('alice')}, ['alice'], np.ones((1, 128)))
+    # The app has not seen alice and saves its own view of the users
+    app.save_users({'bob': user('bob')})
+
+    assert set(kiosk.load_users()) == {'alice', 'bob'}
+
+
+def test_delete_user_removes_user_and_encodings(tmp_path):
+    db = SQLiteBackend.open(tmp_path)
+    db.enroll({'alice': user('alice'), 'bob': user('bob')}, ['alice', 'alice', 'bob'], np.ones((3, 128)))
+
+    assert db.delete_user('alice')
+    assert not db.delete_user('alice')
+    assert set(db.load_users()) == {'bob'}
+    assert db.embeddings.ids == ['bob']
+    assert SQLiteBackend.open(tmp_path).embeddings.ids == ['bob']
+
+
+def test_enroll_replace_swaps_encodings_in_one_transaction(tmp_path):
+    db = SQLiteBackend.open(tmp_path)
+    db.enroll({'alice': user('alice'), 'bob': user('bob')}, ['alice', 'alice', 'bob'], np.ones((3, 128)))
+    reader = SQLiteBackend.open(tmp_path)
+
+    db.enroll({'alice': user('alice')}, ['alice'], np.full((1, 128), 2.0), replace=['alice'])
+
+    reader.embeddings.refresh()
+    assert reader.embeddings.ids == ['bob', 'alice']
+    assert reader.embeddings.matrix[:, 0].tolist() == [1.0, 2.0]
+
+
+def test_threads_share_one_connection(tmp_path):
+    db = SQLiteBackend.open(tmp_path)
+    errors = []
+
+    def punch(worker):
+        try:
+            for n in range(50):
+                db.attendance.append({'user_id': f"w{worker}", 'action': 'punch_in', 'date': '2026-09-01',
+                                      'timestamp': f"2026-09-01T09:00:{n:02d}"})
+                db.embeddings.append([f"w{worker}"], np.full((1, 128), n))
+                assert sum(1 for _ in db.attendance.iter_query(user_id=f"w{worker}")) == n + 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=punch, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(db.attendance.query()) == 400
+    assert len(db.embeddings) == 400
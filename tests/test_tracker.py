@@ -0,0 +1,57 @@
+import numpy as np
+
+from tracker import FaceTracker, iou
+
+IMAGE = np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def walk(steps, start=(20, 60, 60, 20), dx=2):
+    """One face box moving right by dx pixels per frame"""
+    top, right, bottom, left = start
+    return [[(top, right + i * dx, bottom, left + i * dx)] for i in range(steps)]
+
+
+def run(tracker, frames):
+    encoded = []
+
+    def identify(image, boxes):
+        encoded.append(len(boxes))
+        return [('alice', 0.3)] * len(boxes)
+
+    ids = []
+    for boxes in frames:
+        tracks = tracker.step(IMAGE, lambda image: boxes, identify)
+        ids.append([track.track_id for track in tracks])
+    return ids, encoded
+
+
+def test_iou():
+    assert iou((0, 10, 10, 0), (0, 10, 10, 0)) == 1.0
+    assert iou((0, 10, 10, 0), (0, 20, 10, 10)) == 0.0
+    assert iou((0, 10, 10, 0), (0, 15, 10, 5)) == 50 / 150
+
+
+def test_moving_face_keeps_its_track_id():
+    tracker = FaceTracker(redetect_every=1)
+    ids, _ = run(tracker, walk(10))
+    assert ids == [[0]] * 10
+
+
+def test_confirmed_track_stops_encoding():
+    tracker = FaceTracker(redetect_every=1, confirm_hits=3, reencode_iou=0.5)
+    _, encoded = run(tracker, walk(10, dx=0))
+    assert tracker.encodings_run == 3
+    assert len(encoded) == 3
+
+
+def test_second_face_gets_a_new_track():
+    tracker = FaceTracker(redetect_every=1)
+    frames = [boxes + [(20, 150, 60, 110)] if i >= 2 else boxes for i, boxes in enumerate(walk(4))]
+    ids, _ = run(tracker, frames)
+    assert ids == [[0], [0], [0, 1], [0, 1]]
+
+
+def test_lost_track_is_dropped_after_max_missed():
+    tracker = FaceTracker(redetect_every=1, max_missed=2)
+    ids, _ = run(tracker, walk(2) + [[], [], []] + walk(1))
+    assert ids == [[0], [0], [0], [0], [], [1]]
@@ -0,0 +1,55 @@
+from verifier import ACCEPTED, PENDING, REJECTED, DecisionStats, make_verifier
+
+BOX = (0, 10, 10, 0)
+ALICE = [(BOX, 'alice', 0.3)]
+STRANGER = [(BOX, None, 0.8)]
+
+
+def run(verifier, frames):
+    """Feed frames until a decision; returns (status, user_id, frames used)"""
+    for faces in frames:
+        status, user_id, _ = verifier.update(faces)
+        if status != PENDING:
+            return status, user_id, verifier.frames
+    return PENDING, None, verifier.frames
+
+
+def test_consecutive_accepts_after_required_run():
+    verifier = make_verifier('consecutive', required_frames=3)
+    assert run(verifier, [ALICE] * 10) == (ACCEPTED, 'alice', 4)
+
+
+def test_consecutive_restarts_on_another_face():
+    verifier = make_verifier('consecutive', required_frames=3)
+    assert run(verifier, [ALICE, ALICE, STRANGER, ALICE, ALICE, ALICE]) == (PENDING, None, 6)
+
+
+def test_sprt_accepts_a_clear_match_in_two_frames():
+    assert run(make_verifier('sprt'), [ALICE] * 10) == (ACCEPTED, 'alice', 2)
+
+
+def test_sprt_rejects_an_unknown_face_in_two_frames():
+    assert run(make_verifier('sprt'), [STRANGER] * 10) == (REJECTED, None, 2)
+
+
+def test_sprt_keeps_evidence_over_faceless_frames():
+    verifier = make_verifier('sprt')
+    assert run(verifier, [ALICE, [], [], ALICE]) == (ACCEPTED, 'alice', 4)
+    assert verifier.progress == 1.0
+
+
+def test_sprt_gives_up_after_max_frames():
+    borderline = [(BOX, 'alice', 0.525)]
+    assert run(make_verifier('sprt', max_frames=5), [borderline] * 10) == (REJECTED, None, 5)
+
+
+def test_decision_stats_summary():
+    stats = DecisionStats()
+    for frames in (2, 2, 4):
+        stats.record(ACCEPTED, frames)
+    stats.record(PENDING, 9)
+
+    summary = stats.summary()
+    assert list(summary) == [ACCEPTED]
+    assert summary[ACCEPTED]['count'] == 3
+    assert summary[ACCEPTED]['median_frames'] == 2.0
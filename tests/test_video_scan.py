@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import video_scan
+from verifier import make_verifier
+
+BOX = (0, 10, 10, 0)
+
+
+class FakeSystem:
+    """Plays back one recognition result per frame"""
+
+    def __init__(self, results):
+        self.results = iter(results)
+        self.users = {'alice': {'name': 'Alice'}}
+
+    def _recognize_frame(self, frame, tolerance):
+        return next(self.results)
+
+
+def scan(monkeypatch, results, **options):
+    frames = [(i, float(i), None) for i in range(len(results))]
+    monkeypatch.setattr(video_scan, 'read_frames', lambda path, stride: iter(frames))
+    events, _ = video_scan.scan_video(FakeSystem(results), 'door.mp4', start=datetime(2026, 9, 1, 9),
+                                      verifier=make_verifier('consecutive', 2), record=False, **options)
+    return events
+
+
+def test_short_gap_keeps_the_pending_evidence(monkeypatch):
+    alice = [(BOX, 'alice', 0.3)]
+    assert [e['user_id'] for e in scan(monkeypatch, [alice, alice, [], alice])] == ['alice']
+
+
+def test_long_gap_starts_afresh(monkeypatch):
+    alice = [(BOX, 'alice', 0.3)]
+    assert scan(monkeypatch, [alice, alice, [], [], alice], reset_after=2) == []
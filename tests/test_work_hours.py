@@ -0,0 +1,58 @@
+from work_hours import sessionize
+
+
+def punch(user_id, action, timestamp):
+    return {'user_id': user_id, 'name': user_id, 'action': action, 'timestamp': timestamp,
+            'date': timestamp[:10], 'time': timestamp[11:19]}
+
+
+def test_double_scans_count_once():
+    sessions = sessionize([
+        punch('alice', 'punch_in', '2026-09-01T09:00:00'),
+        punch('alice', 'punch_in', '2026-09-01T09:00:20'),
+        punch('alice', 'punch_out', '2026-09-01T17:00:00'),
+        punch('alice', 'punch_out', '2026-09-01T17:01:00'),
+    ])
+
+    assert sessions.daily() == [{'user_id': 'alice', 'date': '2026-09-01', 'hours': 8.02, 'sessions': 1}]
+    assert sessions.exceptions() == []
+
+
+def test_missing_out_is_not_merged_into_next_session():
+    sessions = sessionize([
+        punch('alice', 'punch_in', '2026-09-01T09:00:00'),
+        # punch_out at 12:00 never recorded
+        punch('alice', 'punch_in', '2026-09-01T13:00:00'),
+        punch('alice', 'punch_out', '2026-09-01T17:00:00'),
+    ])
+
+    assert sessions.daily() == [{'user_id': 'alice', 'date': '2026-09-01', 'hours': 4.0, 'sessions': 1}]
+    assert sessions.exceptions() == [
+        {'user_id': 'alice', 'timestamp': '2026-09-01T09:00:00', 'kind': 'missing_out'}]
+
+
+def test_missing_in_is_reported():
+    sessions = sessionize([
+        punch('alice', 'punch_in', '2026-09-01T09:00:00'),
+        punch('alice', 'punch_out', '2026-09-01T12:00:00'),
+        # punch_in at 13:00 never recorded
+        punch('alice', 'punch_out', '2026-09-01T17:00:00'),
+    ])
+
+    assert sessions.daily() == [{'user_id': 'alice', 'date': '2026-09-01', 'hours': 3.0, 'sessions': 1}]
+    assert sessions.exceptions() == [
+        {'user_id': 'alice', 'timestamp': '2026-09-01T17:00:00', 'kind': 'missing_in'}]
+
+
+def test_overnight_shift_split_at_midnight():
+    records = [
+        punch('bob', 'punch_in', '2026-09-01T22:00:00'),
+        punch('bob', 'punch_out', '2026-09-02T06:00:00'),
+    ]
+
+    assert sessionize(records).daily() == [
+        {'user_id': 'bob', 'date': '2026-09-01', 'hours': 8.0, 'sessions': 1}]
+    assert sessionize(records, split_midnight=True).daily() == [
+        {'user_id': 'bob', 'date': '2026-09-01', 'hours': 2.0, 'sessions': 1},
+        {'user_id': 'bob', 'date': '2026-09-02', 'hours': 6.0, 'sessions': 1},
+    ]
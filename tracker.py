@@ -0,0 +1,153 @@
+"""
+Face Tracker
+Carries identities across frames so the scanner does not re-run HOG
+detection and dlib encoding on a face that has barely moved.
+
+- Detection runs every `redetect_every` frames (or when nothing is tracked);
+  in between, boxes are kept or moved with optional Lucas-Kanade optical flow
+- Detections are associated with tracks by greedy IoU matching
+- A track is (re-)encoded while its identity is still unconfirmed, or when
+  its box has drifted from where it was last encoded
+"""
+
+import itertools
+
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One face followed across frames"""
+
+    __slots__ = ('track_id', 'box', 'user_id', 'distance', 'hits', 'missed', 'encoded_box')
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.user_id = None
+        self.distance = None
+        self.hits = 0
+        self.missed = 0
+        self.encoded_box = None
+
+
+class FaceTracker:
+    """IoU tracker deciding per frame which faces need detection and encoding"""
+
+    def __init__(self, redetect_every=5, match_iou=0.3, reencode_iou=0.7, confirm_hits=4,
+                 max_missed=2, optical_flow=False):
+        self.redetect_every = redetect_every
+        self.match_iou = match_iou
+        self.reencode_iou = reencode_iou
+        self.confirm_hits = confirm_hits
+        self.max_missed = max_missed
+        self.optical_flow = optical_flow
+
+        self.tracks = []
+        self.frames_since_detection = 0
+        self.encoded = 0
+        self.detections_run = 0
+        self.encodings_run = 0
+        self.frames = 0
+        self._ids = itertools.count()
+        self._prev_gray = None
+
+    def reset(self):
+        self.tracks = []
+        self._prev_gray = None
+        self.frames_since_detection = 0
+
+    def step(self, image, detect, identify):
+        """
+        Advance one frame
+        detect(image) -> list of boxes
+        identify(image, boxes) -> list of (user_id, distance), one per box
+        Returns the current tracks; self.encoded is the number of faces
+        encoded on this frame.
+        """
+        self.frames += 1
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if self.optical_flow else None
+        if gray is not None and self._prev_gray is not None and self.tracks:
+            self._propagate(self._prev_gray, gray)
+        self._prev_gray = gray
+
+        if not self.tracks or self.frames_since_detection + 1 >= self.redetect_every:
+            self._associate(detect(image))
+            self.detections_run += 1
+            self.frames_since_detection = 0
+        else:
+            self.frames_since_detection += 1
+
+        pending = [track for track in self.tracks if self._needs_encoding(track)]
+        if pending:
+            for track, (user_id, distance) in zip(pending, identify(image, [t.box for t in pending])):
+                track.hits = track.hits + 1 if user_id is not None and user_id == track.user_id else 1
+                track.user_id, track.distance = user_id, distance
+                track.encoded_box = track.box
+        self.encoded = len(pending)
+        self.encodings_run += len(pending)
+        return list(self.tracks)
+
+    def _needs_encoding(self, track):
+        if track.encoded_box is None or track.user_id is None:
+            return True
+        if track.hits < self.confirm_hits:
+            return True
+        return iou(track.box, track.encoded_box) < self.reencode_iou
+
+    def _associate(self, boxes):
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        pairs = sorted(((iou(track.box, box), ti, bi)
+                        for ti, track in enumerate(self.tracks)
+                        for bi, box in enumerate(boxes)), reverse=True)
+        used_tracks, used_boxes = set(), set()
+        for score, ti, bi in pairs:
+            if score < self.match_iou:
+                break
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            self.tracks[ti].box = boxes[bi]
+            self.tracks[ti].missed = 0
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        survivors += [Track(next(self._ids), box) for bi, box in enumerate(boxes) if bi not in used_boxes]
+        self.tracks = survivors
+
+    def _propagate(self, prev_gray, gray):
+        """Shift each box by the median optical flow of corner features inside it"""
+        height, width = gray.shape
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            mask = np.zeros_like(prev_gray)
+            mask[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 255
+            points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=30, qualityLevel=0.01,
+                                             minDistance=3, mask=mask)
+            if points is None:
+                continue
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+            good = status.reshape(-1) == 1
+            if good.sum() < 3:
+                continue
+            dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+            dx, dy = int(round(dx)), int(round(dy))
+            track.box = (min(max(top + dy, 0), height), min(max(right + dx, 0), width),
+                         min(max(bottom + dy, 0), height), min(max(left + dx, 0), width))
@@ -0,0 +1,164 @@
+"""
+Identity Verifiers
+Decide when enough per-frame evidence has been seen to confirm a punch.
+
+- ConsecutiveFrameVerifier: N identical matches in a row (original rule)
+- SPRTVerifier: sequential probability ratio test over per-frame match
+  distances; confirms as soon as the evidence crosses the acceptance bound
+  and rejects early when the face is clearly not enrolled
+
+Both take the scanner's per-frame face list [(box, user_id, distance)] and
+return (status, user_id, confidence) with status 'pending', 'accepted' or
+'rejected'.
+"""
+
+import math
+
+import numpy as np
+
+PENDING, ACCEPTED, REJECTED = 'pending', 'accepted', 'rejected'
+# Continuous scanners keep the evidence over this many faceless frames in a
+# row (blinks, turned heads, missed detections) before starting afresh
+EMPTY_FRAMES_TO_RESET = 5
+
+
+def best_face(faces):
+    """Closest face of a frame as (user_id, distance); user_id None if unmatched"""
+    best = (None, None)
+    for _, user_id, distance in faces:
+        if distance is None:
+            continue
+        if best[1] is None or distance < best[1]:
+            best = (user_id, distance)
+    return best
+
+
+class ConsecutiveFrameVerifier:
+    """Accept after `required_frames` consecutive frames matching the same user"""
+
+    def __init__(self, required_frames=3):
+        self.required_frames = required_frames
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.candidate = None
+        self.count = 0
+        self.distance = None
+
+    @property
+    def progress(self):
+        return min(self.count / self.required_frames, 1.0)
+
+    def update(self, faces):
+        self.frames += 1
+        user_id, distance = best_face(faces)
+        if user_id and user_id == self.candidate:
+            self.count += 1
+        else:
+            self.count = 0
+            self.candidate = user_id
+        self.distance = distance
+        if self.candidate and self.count >= self.required_frames:
+            return ACCEPTED, self.candidate, 1 - distance
+        return PENDING, None, 0
+
+
+class SPRTVerifier:
+    """
+    Wald's SPRT on match distances
+    Distances are modelled as N(genuine_mean, sigma) for the claimed user
+    and N(impostor_mean, sigma) otherwise. Each frame adds its log-likelihood
+    ratio (clipped so no single frame decides) to the nearest user's total;
+    frames without a face add nothing, so one bad frame no longer resets
+    progress.
+    """
+
+    def __init__(self, genuine_mean=0.35, impostor_mean=0.7, sigma=0.1,
+                 false_accept=0.001, false_reject=0.05, max_frame_llr=None, max_frames=60):
+        self.genuine_mean = genuine_mean
+        self.impostor_mean = impostor_mean
+        self.sigma = sigma
+        self.accept_bound = math.log((1 - false_reject) / false_accept)
+        self.reject_bound = math.log(false_reject / (1 - false_accept))
+        # At least two frames are needed to accept or reject by default
+        self.max_frame_llr = max_frame_llr or self.accept_bound / 2
+        self.min_frame_llr = self.reject_bound / 2
+        self.max_frames = max_frames
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.llr = {}
+        self.distances = {}
+        self.unmatched_llr = 0.0
+
+    @property
+    def progress(self):
+        if not self.llr:
+            return 0.0
+        return min(max(max(self.llr.values()) / self.accept_bound, 0.0), 1.0)
+
+    def _frame_llr(self, distance):
+        llr = ((distance - self.impostor_mean) ** 2 - (distance - self.genuine_mean) ** 2) / (2 * self.sigma ** 2)
+        return float(np.clip(llr, self.min_frame_llr, self.max_frame_llr))
+
+    def update(self, faces):
+        self.frames += 1
+        user_id, distance = best_face(faces)
+        if distance is not None:
+            llr = self._frame_llr(distance)
+            if user_id is not None:
+                self.llr[user_id] = self.llr.get(user_id, self.unmatched_llr) + llr
+                self.distances.setdefault(user_id, []).append(distance)
+            else:
+                # Nobody within tolerance: evidence against every candidate
+                self.unmatched_llr += llr
+                for candidate in self.llr:
+                    self.llr[candidate] += llr
+
+        if self.llr:
+            candidate, score = max(self.llr.items(), key=lambda item: item[1])
+            if score >= self.accept_bound:
+                return ACCEPTED, candidate, 1 - float(np.mean(self.distances[candidate]))
+        if max(self.llr.values(), default=self.unmatched_llr) <= self.reject_bound:
+            return REJECTED, None, 0
+        if self.frames >= self.max_frames and (self.llr or self.unmatched_llr):
+            return REJECTED, None, 0
+        return PENDING, None, 0
+
+
+VERIFIERS = {
+    'consecutive': ConsecutiveFrameVerifier,
+    'sprt': SPRTVerifier,
+}
+
+
+def make_verifier(kind='consecutive', required_frames=3, **options):
+    if kind == 'consecutive':
+        return ConsecutiveFrameVerifier(required_frames=required_frames)
+    if kind not in VERIFIERS:
+        raise ValueError(f"Unknown verifier '{kind}', expected one of {sorted(VERIFIERS)}")
+    return VERIFIERS[kind](**options)
+
+
+class DecisionStats:
+    """Frames-to-decision metrics per outcome"""
+
+    def __init__(self):
+        self.frames = {ACCEPTED: [], REJECTED: []}
+
+    def record(self, status, frames):
+        if status in self.frames:
+            self.frames[status].append(frames)
+
+    def summary(self):
+        out = {}
+        for status, counts in self.frames.items():
+            if counts:
+                out[status] = {
+                    'count': len(counts),
+                    'median_frames': float(np.median(counts)),
+                    'p95_frames': float(np.percentile(counts, 95)),
+                }
+        return out
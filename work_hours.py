@@ -0,0 +1,225 @@
+"""
+Work Hours
+Pairs punch_in / punch_out events into work sessions and totals them per
+user and day, with sorted NumPy array operations instead of per-record
+loops.
+
+Rules:
+- Repeated punch_ins within `repeat_window` seconds keep the first,
+  repeated punch_outs keep the last (a double scan at the door does not
+  split or shorten a session). Repeats further apart are separate punches:
+  a punch_out pairs with the latest punch_in before it, so an earlier
+  punch_in whose punch_out was never recorded stays unpaired
+- A punch_in followed by the same user's punch_out within `max_shift`
+  hours is a session; overnight shifts count towards the day they started
+  (or are split at midnight with split_midnight=True)
+- A punch_in with no matching punch_out is reported as 'missing_out', a
+  punch_out with no punch_in as 'missing_in'
+
+Usage:
+    python work_hours.py --month 2026-09
+    python work_hours.py --start 2026-09-01 --end 2026-09-15 --csv hours.csv
+"""
+
+import argparse
+import csv
+from datetime import date as date_type, timedelta
+
+import numpy as np
+
+from record_store import RecordStore, record_timestamp
+
+DAY = np.timedelta64(1, 'D')
+
+
+def records_to_arrays(records):
+    """(user_ids, user codes, times as datetime64[s], is_in) from attendance records"""
+    if isinstance(records, RecordStore):
+        # Already columnar: no per-record work
+        n = len(records)
+        is_in = records.action[:n] == records.actions.codes.get('punch_in', -1)
+        return (np.array(records.user_ids.values, dtype=object), records.user[:n].astype(np.intp),
+                records.time[:n].astype('datetime64[s]'), is_in)
+    records = list(records)
+    users = np.array([r['user_id'] for r in records], dtype=object)
+    times = np.array([record_timestamp(r) for r in records], dtype='datetime64[us]').astype('datetime64[s]')
+    is_in = np.array([r['action'] == 'punch_in' for r in records], dtype=bool)
+    user_ids, codes = np.unique(users, return_inverse=True) if len(users) else (users, np.empty(0, dtype=np.int64))
+    return user_ids, codes, times, is_in
+
+
+class WorkSessions:
+    """Sessions and exceptions as parallel arrays; user columns are codes into user_ids"""
+
+    def __init__(self, user_ids, user, start, end, exception_user, exception_time, exception_kind):
+        self.user_ids = user_ids
+        self.user = user
+        self.start = start
+        self.end = end
+        self.seconds = (end - start).astype(np.int64)
+        self.exception_user = exception_user
+        self.exception_time = exception_time
+        self.exception_kind = exception_kind
+
+    def __len__(self):
+        return len(self.user)
+
+    def _window(self, start_date=None, end_date=None):
+        day = self.start.astype('datetime64[D]')
+        keep = np.ones(len(day), dtype=bool)
+        if start_date:
+            keep &= day >= np.datetime64(start_date, 'D')
+        if end_date:
+            keep &= day <= np.datetime64(end_date, 'D')
+        return keep, day
+
+    def daily(self, start_date=None, end_date=None):
+        """[{'user_id', 'date', 'hours', 'sessions'}] per user and day, sorted"""
+        keep, day = self._window(start_date, end_date)
+        user, day, seconds = self.user[keep], day[keep], self.seconds[keep]
+        if not len(user):
+            return []
+        day_index = (day - day.min()).astype(np.int64)
+        key = user.astype(np.int64) * (int(day_index.max()) + 1) + day_index
+        groups, first, inverse, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+        totals = np.bincount(inverse.ravel(), weights=seconds, minlength=len(groups))
+        return [{'user_id': self.user_ids[user[i]], 'date': str(day[i]),
+                 'hours': round(float(total) / 3600, 2), 'sessions': int(n)}
+                for i, total, n in zip(first, totals, counts)]
+
+    def totals(self, start_date=None, end_date=None):
+        """{user_id: {'hours', 'days', 'sessions'}} for payroll"""
+        keep, day = self._window(start_date, end_date)
+        user, day = self.user[keep], day[keep]
+        hours = np.bincount(user, weights=self.seconds[keep], minlength=len(self.user_ids)) / 3600
+        sessions = np.bincount(user, minlength=len(self.user_ids))
+        pairs = np.unique(np.stack([user.astype(np.int64), day.astype(np.int64)]), axis=1) if len(user) \
+            else np.empty((2, 0), dtype=np.int64)
+        days = np.bincount(pairs[0], minlength=len(self.user_ids))
+        return {self.user_ids[i]: {'hours': round(float(hours[i]), 2), 'days': int(days[i]),
+                                   'sessions': int(sessions[i])}
+                for i in np.flatnonzero(sessions)}
+
+    def exceptions(self, start_date=None, end_date=None):
+        """[{'user_id', 'timestamp', 'kind'}] for punches that could not be paired"""
+        day = self.exception_time.astype('datetime64[D]')
+        keep = np.ones(len(day), dtype=bool)
+        if start_date:
+            keep &= day >= np.datetime64(start_date, 'D')
+        if end_date:
+            keep &= day <= np.datetime64(end_date, 'D')
+        return [{'user_id': self.user_ids[u], 'timestamp': str(t), 'kind': str(k)}
+                for u, t, k in zip(self.exception_user[keep], self.exception_time[keep],
+                                   self.exception_kind[keep])]
+
+
+def sessionize(records, max_shift=16, split_midnight=False, repeat_window=300):
+    """Pair punches into WorkSessions (see module docstring for the rules)"""
+    user_ids, user, time, is_in = records_to_arrays(records)
+    order = np.lexsort((time, user))
+    user, time, is_in = user[order], time[order], is_in[order]
+
+    # Collapse repeated scans of the same action: first punch_in, last punch_out
+    window = np.timedelta64(int(repeat_window), 's')
+    same_prev = np.zeros(len(user), dtype=bool)
+    same_prev[1:] = ((user[1:] == user[:-1]) & (is_in[1:] == is_in[:-1]) &
+                     (time[1:] - time[:-1] <= window))
+    same_next = np.zeros(len(user), dtype=bool)
+    same_next[:-1] = same_prev[1:]
+    keep = np.where(is_in, ~same_prev, ~same_next)
+    user, time, is_in = user[keep], time[keep], is_in[keep]
+
+    # After collapsing, a session is an in immediately followed by an out
+    limit = np.timedelta64(int(max_shift * 3600), 's')
+    pair = np.zeros(len(user), dtype=bool)
+    if len(user) > 1:
+        pair[:-1] = (is_in[:-1] & ~is_in[1:] & (user[:-1] == user[1:]) &
+                     (time[1:] - time[:-1] <= limit))
+    closes = np.zeros(len(user), dtype=bool)
+    closes[1:] = pair[:-1]
+    starts = np.flatnonzero(pair)
+    session_user, start, end = user[starts], time[starts], time[starts + 1]
+
+    unmatched = ~pair & ~closes
+    kind = np.where(is_in[unmatched], 'missing_out', 'missing_in')
+
+    if split_midnight:
+        # Shifts longer than a day are not split further
+        midnight = start.astype('datetime64[D]') + DAY
+        cross = end > midnight.astype('datetime64[s]')
+        session_user = np.concatenate([session_user, session_user[cross]])
+        start, end = (np.concatenate([start, midnight[cross].astype('datetime64[s]')]),
+                      np.concatenate([np.where(cross, midnight.astype('datetime64[s]'), end), end[cross]]))
+        order = np.lexsort((start, session_user))
+        session_user, start, end = session_user[order], start[order], end[order]
+
+    return WorkSessions(user_ids, session_user, start, end, user[unmatched], time[unmatched], kind)
+
+
+def work_hours(query, start_date, end_date, max_shift=16, split_midnight=False, repeat_window=300):
+    """
+    Sessions starting between start_date and end_date (inclusive)
+    query(start_date=..., end_date=...) returns attendance records (or a
+    RecordStore, e.g. system.select_attendance); one
+    extra day is read on each side so shifts across the window edges pair up.
+    """
+    start, end = date_type.fromisoformat(start_date), date_type.fromisoformat(end_date)
+    records = query(start_date=(start - timedelta(days=1)).isoformat(),
+                    end_date=(end + timedelta(days=1)).isoformat())
+    return sessionize(records, max_shift=max_shift, split_midnight=split_midnight, repeat_window=repeat_window)
+
+
+def month_range(month):
+    """('YYYY-MM-01', 'YYYY-MM-last') for 'YYYY-MM'"""
+    first = date_type.fromisoformat(f"{month}-01")
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work hours per user from punch records")
+    parser.add_argument('--month', help="YYYY-MM (default: current month)")
+    parser.add_argument('--start', help="YYYY-MM-DD, with --end instead of --month")
+    parser.add_argument('--end')
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--backend', default="files", choices=["files", "sqlite"])
+    parser.add_argument('--max-shift', type=float, default=16, help="longest plausible session in hours")
+    parser.add_argument('--repeat-window', type=float, default=300,
+                        help="seconds within which repeated scans of the same action count once")
+    parser.add_argument('--split-midnight', action='store_true', help="count overnight hours on each calendar day")
+    parser.add_argument('--csv', help="write per-day totals to this CSV file")
+    args = parser.parse_args()
+
+    from attendance_system import FaceAttendanceSystem
+
+    if args.start and args.end:
+        start_date, end_date = args.start, args.end
+    else:
+        start_date, end_date = month_range(args.month or date_type.today().strftime('%Y-%m'))
+
+    system = FaceAttendanceSystem(data_dir=args.data_dir, backend=args.backend)
+    sessions = work_hours(system.select_attendance, start_date, end_date, args.max_shift, args.split_midnight,
+                          args.repeat_window)
+    totals = sessions.totals(start_date, end_date)
+
+    print(f"\n--- WORK HOURS {start_date} .. {end_date} ---")
+    for user_id, total in sorted(totals.items()):
+        name = system.users.get(user_id, {}).get('name', user_id)
+        print(f"{user_id:<12} {name:<24} {total['hours']:8.2f} h  {total['days']:3d} days  {total['sessions']:3d} sessions")
+    exceptions = sessions.exceptions(start_date, end_date)
+    if exceptions:
+        print(f"\n{len(exceptions)} unpaired punch(es):")
+        for e in exceptions:
+            print(f"  {e['user_id']:<12} {e['timestamp']}  {e['kind']}")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['user_id', 'date', 'hours', 'sessions'])
+            writer.writeheader()
+            writer.writerows(sessions.daily(start_date, end_date))
+        print(f"✓ Daily totals written to {args.csv}")
+    system.close()
+
+
+if __name__ == "__main__":
+    main()